@@ -0,0 +1,178 @@
+"""
+Attendance analytics over a students x sessions matrix.
+
+Attendance is held as a dense boolean NumPy matrix whose rows and columns are
+interned student and session IDs, so rates, absence streaks and at-risk
+lists are vectorised operations. Refreshes only read rows added since the
+last refresh, plus a window of IDs below it: on PostgreSQL a row can commit
+after one with a higher ID was already read, and re-adding a pair is
+harmless.
+"""
+import threading
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Rows per block when computing streaks, to bound temporary memory
+STREAK_CHUNK_ROWS = 8192
+
+# IDs below the watermark read again on every refresh, for rows that committed late
+REREAD_WINDOW_IDS = 1000
+
+class AttendanceMatrix:
+    """Dense students x sessions attendance matrix with interned IDs."""
+
+    def __init__(self, student_capacity: int = 1024, session_capacity: int = 64):
+        self.lock = threading.Lock()
+        self.reset(student_capacity, session_capacity)
+
+    def reset(self, student_capacity: int = 1024, session_capacity: int = 64):
+        self.student_index = {}  # student_id -> row
+        self.student_ids = []
+        self.session_index = {}  # session_id -> column, in session order
+        self.session_ids = []
+        self.present = np.zeros((student_capacity, session_capacity), dtype=bool)
+        self.last_attendance_id = 0
+        self.last_session_id = 0
+        self.known_student_count = 0
+        self.max_ids = {}  # database URL -> (max session ID, max attendance ID) seen there
+
+    def _grow(self, rows: int, cols: int):
+        old_rows, old_cols = self.present.shape
+        if rows <= old_rows and cols <= old_cols:
+            return
+        # Double the exhausted dimension so appends stay amortised O(1)
+        new_rows = max(rows, old_rows * 2) if rows > old_rows else old_rows
+        new_cols = max(cols, old_cols * 2) if cols > old_cols else old_cols
+        grown = np.zeros((new_rows, new_cols), dtype=bool)
+        grown[:old_rows, :old_cols] = self.present
+        self.present = grown
+
+    def intern_student(self, student_id: str) -> int:
+        row = self.student_index.get(student_id)
+        if row is None:
+            row = self.student_index[student_id] = len(self.student_ids)
+            self.student_ids.append(student_id)
+            self._grow(row + 1, len(self.session_ids))
+        return row
+
+    def intern_session(self, session_id: int) -> int:
+        col = self.session_index.get(session_id)
+        if col is None:
+            col = self.session_index[session_id] = len(self.session_ids)
+            self.session_ids.append(session_id)
+            self._grow(len(self.student_ids), col + 1)
+        return col
+
+    def add(self, pairs: Iterable[Tuple[str, int]]):
+        """Record (student_id, session_id) attendance pairs."""
+        rows, cols = [], []
+        for student_id, session_id in pairs:
+            rows.append(self.intern_student(student_id))
+            cols.append(self.intern_session(session_id))
+        if rows:
+            self.present[np.array(rows), np.array(cols)] = True
+
+    def refresh(self, db: Session):
+        """Pull sessions, students and attendance rows added since the last refresh."""
+        source = str(db.get_bind().url)
+        max_session_id = db.execute(select(func.max(models.BeaconSession.id))).scalar() or 0
+        max_attendance_id = db.execute(select(func.max(models.Attendance.id))).scalar() or 0
+        seen_session_id, seen_attendance_id = self.max_ids.get(source, (0, 0))
+        if max_session_id < seen_session_id or max_attendance_id < seen_attendance_id:
+            # IDs went backwards on the same database: the tables were rebuilt, so start over.
+            # A replica trailing the primary is not compared, so lag never triggers this.
+            self.reset()
+        self.max_ids[source] = (max_session_id, max_attendance_id)
+
+        for (session_id,) in db.execute(
+            select(models.BeaconSession.id)
+            .where(models.BeaconSession.id > self.last_session_id - REREAD_WINDOW_IDS)
+            .order_by(models.BeaconSession.id)
+        ):
+            self.intern_session(session_id)
+            self.last_session_id = max(self.last_session_id, session_id)
+
+        student_count = db.execute(select(func.count(models.Student.id))).scalar()
+        if student_count != self.known_student_count:
+            for (student_id,) in db.execute(select(models.Student.id)):
+                self.intern_student(student_id)
+            self.known_student_count = student_count
+
+        rows = db.execute(
+            select(models.Attendance.id, models.Attendance.student_id, models.Attendance.session_id)
+            .where(models.Attendance.id > self.last_attendance_id - REREAD_WINDOW_IDS)
+            .order_by(models.Attendance.id)
+        ).all()
+        if rows:
+            self.add((row.student_id, row.session_id) for row in rows)
+            self.last_attendance_id = max(self.last_attendance_id, rows[-1].id)
+
+    def view(self, last_n: Optional[int] = None) -> np.ndarray:
+        """The populated matrix, optionally limited to the most recent sessions."""
+        present = self.present[:len(self.student_ids), :len(self.session_ids)]
+        if last_n is not None:
+            present = present[:, max(present.shape[1] - last_n, 0):]
+        return present
+
+def attendance_rates(present: np.ndarray) -> np.ndarray:
+    """Fraction of sessions attended, per student."""
+    if present.shape[1] == 0:
+        return np.zeros(present.shape[0])
+    return present.mean(axis=1)
+
+def absence_streaks(present: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Current and longest runs of consecutive absences, per student."""
+    students, sessions = present.shape
+    current = np.zeros(students, dtype=np.int32)
+    longest = np.zeros(students, dtype=np.int32)
+    if sessions == 0:
+        return current, longest
+
+    positions = np.arange(1, sessions + 1, dtype=np.int32)
+    for start in range(0, students, STREAK_CHUNK_ROWS):
+        block = present[start:start + STREAK_CHUNK_ROWS]
+        # 1-based position of the latest attended session at or before each column
+        last_present = np.maximum.accumulate(np.where(block, positions, 0), axis=1)
+        runs = positions - last_present
+        current[start:start + len(block)] = runs[:, -1]
+        longest[start:start + len(block)] = runs.max(axis=1)
+    return current, longest
+
+def student_stats(matrix: AttendanceMatrix, last_n: Optional[int] = None, rows: Optional[Sequence[int]] = None):
+    """Per-student statistics as dicts, for all students or the given rows."""
+    present = matrix.view(last_n)
+    if rows is None:
+        rows = np.arange(present.shape[0])
+    rows = np.asarray(rows, dtype=np.intp)
+    present = present[rows]
+    attended = present.sum(axis=1)
+    rates = attendance_rates(present)
+    current, longest = absence_streaks(present)
+    held = present.shape[1]
+    return [
+        {
+            "student_id": matrix.student_ids[row],
+            "sessions_attended": int(attended[i]),
+            "sessions_held": held,
+            "attendance_rate": float(rates[i]),
+            "current_absence_streak": int(current[i]),
+            "longest_absence_streak": int(longest[i]),
+        }
+        for i, row in enumerate(rows.tolist())
+    ]
+
+def at_risk_rows(matrix: AttendanceMatrix, min_rate: float, min_streak: int, last_n: Optional[int] = None) -> np.ndarray:
+    """Rows of students below `min_rate` or currently absent `min_streak` times in a row, worst first."""
+    present = matrix.view(last_n)
+    rates = attendance_rates(present)
+    current, _ = absence_streaks(present)
+    rows = np.flatnonzero((rates < min_rate) | (current >= min_streak))
+    return rows[np.argsort(rates[rows], kind="stable")]
+
+# Shared per-process matrix; hold its lock while refreshing and reading it
+attendance_matrix = AttendanceMatrix()
\ No newline at end of file
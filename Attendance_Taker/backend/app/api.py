@@ -1,16 +1,30 @@
 """
 API routes for the attendance system.
 """
-from fastapi import APIRouter, HTTPException, Depends, Header
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+from datetime import datetime
+from typing import List, Literal, Optional
+import base64
+import binascii
+import json
 import logging
+import uuid
 
-from . import models, schemas, crud, beacon
-from .database import get_db
+from . import models, schemas, crud, beacon, edge
+from .bitmap_index import session_bitmap_index
+from .roster import roster_filter
+from .idempotency import idempotent
+from .live import live_feed, session_events
+from .reports import report_runner
+from .database import get_db, get_read_db
 from .config import settings
 
 logger = logging.getLogger(__name__)
+# One record per accepted check-in: high volume, sampled through LOG_SAMPLING
+checkin_logger = logging.getLogger("attendance.checkins")
 router = APIRouter()
 
 def verify_professor_token(authorization: str = Header(...)):
@@ -24,54 +38,122 @@ def verify_professor_token(authorization: str = Header(...)):
     
     return token
 
+def _json_default(value):
+    if isinstance(value, datetime):
+        text = value.isoformat()
+        # Same form as pydantic's serialisation of UTC datetimes
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+def _json_response(content) -> Response:
+    """Serialise projected rows straight to a response, skipping response_model validation."""
+    return Response(
+        content=json.dumps(content, default=_json_default, separators=(",", ":")),
+        media_type="application/json"
+    )
+
+def _encode_cursor(sort: str, descending: bool, row: dict) -> str:
+    """Opaque page cursor: the sort key of the last row served."""
+    key = [row[name] for name in crud.ATTENDANCE_SORT_KEYS[sort]]
+    payload = [sort, descending, [value.isoformat() if isinstance(value, datetime) else value for value in key]]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def _decode_cursor(cursor: str, sort: str, descending: bool) -> list:
+    try:
+        cursor_sort, cursor_descending, key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if cursor_sort != sort or cursor_descending != descending:
+            raise ValueError("cursor belongs to a different sort order")
+        names = crud.ATTENDANCE_SORT_KEYS[sort]
+        if len(key) != len(names):
+            raise ValueError("cursor does not match the sort key")
+        return [datetime.fromisoformat(value) if name == "timestamp" else value for name, value in zip(names, key)]
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+
 @router.post("/start_attendance", response_model=schemas.BeaconSession)
 def start_attendance(
     session_data: schemas.BeaconSessionCreate,
+    response: Response,
     db: Session = Depends(get_db),
-    token: str = Depends(verify_professor_token)
+    token: str = Depends(verify_professor_token),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """Start a new attendance session and emit BLE beacon."""
+    return idempotent(
+        idempotency_key, "start_attendance", session_data.model_dump(), response,
+        lambda: _start_attendance(db, session_data), db=db
+    )
+
+def _start_attendance(db: Session, session_data: schemas.BeaconSessionCreate):
     try:
         # Create session in database
         db_session = crud.create_beacon_session(db, session_data)
         
         # Start beacon emission (or fallback)
-        beacon.start_beacon_emission(db_session.id)
+        beacon.start_beacon_emission(db, db_session.id)
         
-        return db_session
+        return schemas.BeaconSession.model_validate(db_session)
     except Exception as e:
-        logger.error(f"Error starting attendance: {e}")
+        logger.error("Error starting attendance: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/stop_attendance", response_model=schemas.BeaconSession)
 def stop_attendance(
     session_id: int,
+    response: Response,
     db: Session = Depends(get_db),
-    token: str = Depends(verify_professor_token)
+    token: str = Depends(verify_professor_token),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """Stop an active attendance session."""
+    return idempotent(
+        idempotency_key, "stop_attendance", {"session_id": session_id}, response,
+        lambda: _stop_attendance(db, session_id), db=db
+    )
+
+def _stop_attendance(db: Session, session_id: int):
     try:
+        # Update session in database first: an active session without a lease would be adopted
+        db_session = crud.update_beacon_session_status(db, session_id, False)
+        if not db_session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        
         # Stop beacon emission
-        beacon.stop_beacon_emission()
+        beacon.stop_beacon_emission(db, session_id)
         
-        # Update session in database
-        db_session = crud.update_beacon_session_status(db, session_id, False)
+        # Freeze the attendee bitmap for cohort queries
+        session_bitmap_index.close(db, session_id)
+        live_feed.notify(session_id)
         
-        return db_session
+        return schemas.BeaconSession.model_validate(db_session)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error stopping attendance: {e}")
+        logger.error("Error stopping attendance: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/mark_attendance", response_model=schemas.Attendance)
 def mark_attendance(
     attendance_data: schemas.AttendanceCreate,
-    db: Session = Depends(get_db)
+    response: Response,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """Mark attendance for a student."""
+    return idempotent(
+        idempotency_key, "mark_attendance", attendance_data.model_dump(), response,
+        lambda: _mark_attendance(db, attendance_data), db=db
+    )
+
+def _mark_attendance(db: Session, attendance_data: schemas.AttendanceCreate):
     try:
+        # Reject unknown students before touching the database
+        if not roster_filter.might_contain(db, attendance_data.student_id):
+            raise HTTPException(status_code=404, detail="Unknown student")
+        
         # Check if session is active
         session = crud.get_beacon_session(db, attendance_data.session_id)
-        if not session or not session.is_active:
+        if not session or not crud.is_session_open(session):
             raise HTTPException(status_code=400, detail="Session is not active")
         
         # Check for duplicate attendance
@@ -81,30 +163,114 @@ def mark_attendance(
         if existing:
             raise HTTPException(status_code=400, detail="Attendance already marked for this session")
         
-        # Create attendance record
-        attendance = crud.create_attendance(db, attendance_data)
-        return attendance
+        # Create attendance record; the unique index catches a racing duplicate
+        try:
+            attendance = crud.create_attendance(db, attendance_data)
+        except IntegrityError as e:
+            db.rollback()
+            if crud.is_duplicate_attendance(e):
+                raise HTTPException(status_code=400, detail="Attendance already marked for this session")
+            if crud.is_foreign_key_violation(e):
+                # The student or session was deleted since the checks above
+                raise HTTPException(status_code=404, detail="Unknown student or session")
+            raise
+        session_bitmap_index.record(db, attendance)
+        live_feed.notify(attendance.session_id)
+        checkin_logger.info(
+            "Attendance marked for student %s in session %s", attendance.student_id, attendance.session_id
+        )
+        return schemas.Attendance.model_validate(attendance)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error marking attendance: {e}")
+        logger.error("Error marking attendance: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/attendance", response_model=List[schemas.Attendance])
 def get_attendance(
     session_id: Optional[int] = None,
     student_id: Optional[str] = None,
-    db: Session = Depends(get_db),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_read_db),
+    token: str = Depends(verify_professor_token)
+):
+    """Get attendance records with optional filtering; `start` is inclusive, `end` exclusive."""
+    try:
+        return _json_response(crud.get_attendance_rows(db, session_id, student_id, start, end))
+    except Exception as e:
+        logger.error("Error fetching attendance: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/attendance/page", response_model=schemas.AttendancePage)
+def get_attendance_page(
+    session_id: Optional[int] = None,
+    student_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    sort: Literal["timestamp", "student_id", "session_id"] = "timestamp",
+    order: Literal["asc", "desc"] = "desc",
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: Session = Depends(get_read_db),
     token: str = Depends(verify_professor_token)
 ):
-    """Get attendance records with optional filtering."""
+    """One page of attendance records, sorted and filtered on the server; follow `next_cursor` for more."""
+    descending = order == "desc"
+    after = _decode_cursor(cursor, sort, descending) if cursor else None
     try:
-        attendance = crud.get_attendance(db, session_id, student_id)
-        return attendance
+        filters = crud.attendance_filters(session_id, student_id, start, end)
+        # One extra row tells whether another page follows
+        rows = crud.get_attendance_page(db, filters, sort, descending, after, limit + 1)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(sort, descending, rows[-1])
+        return _json_response({
+            "items": rows,
+            "next_cursor": next_cursor,
+            "total": crud.count_attendance(db, filters) if include_total else None,
+        })
     except Exception as e:
-        logger.error(f"Error fetching attendance: {e}")
+        logger.error("Error fetching attendance page: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/attendance/summary", response_model=schemas.AttendanceSummary)
+def get_attendance_summary(
+    session_id: Optional[int] = None,
+    student_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    top_students: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_read_db),
+    token: str = Depends(verify_professor_token)
+):
+    """Totals, check-ins per day and the most frequent attendees, with the same filters as /attendance."""
+    try:
+        filters = crud.attendance_filters(session_id, student_id, start, end)
+        return crud.get_attendance_summary(db, filters, top_students)
+    except Exception as e:
+        logger.error("Error summarising attendance: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/sessions/{session_id}/stream")
+def stream_session(
+    session_id: int,
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_professor_token)
+):
+    """Server-Sent Events: check-ins and the running headcount as they happen."""
+    if not crud.get_beacon_session(db, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    # The stream outlives this request's session; it opens its own per wake-up
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    return StreamingResponse(
+        session_events(session_factory, session_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/current_session", response_model=Optional[schemas.BeaconSession])
 def get_current_session(db: Session = Depends(get_db)):
     """Get the current active session, if any."""
@@ -112,20 +278,213 @@ def get_current_session(db: Session = Depends(get_db)):
         session = crud.get_active_beacon_session(db)
         return session
     except Exception as e:
-        logger.error(f"Error getting current session: {e}")
+        logger.error("Error getting current session: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/client_config", response_model=schemas.ClientConfig)
+def get_client_config():
+    """Beacon settings for student clients; they cache it, so this is read once per launch at most."""
+    return schemas.ClientConfig(
+        beacon_service_uuid=settings.BEACON_UUID,
+        multicast_group=settings.MULTICAST_GROUP,
+        multicast_port=settings.MULTICAST_PORT,
+    )
+
 @router.get("/sessions", response_model=List[schemas.BeaconSession])
 def get_sessions(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     token: str = Depends(verify_professor_token)
 ):
     """Get all beacon sessions."""
     try:
-        sessions = crud.get_beacon_sessions(db, skip=skip, limit=limit)
-        return sessions
+        return _json_response(crud.get_beacon_session_rows(db, skip=skip, limit=limit))
     except Exception as e:
-        logger.error(f"Error fetching sessions: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error("Error fetching sessions: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _analytics():
+    # Imported on demand so NumPy stays off the startup path
+    from . import analytics
+    return analytics
+
+@router.get("/analytics/students", response_model=List[schemas.StudentAttendanceStats])
+def get_student_stats(
+    last_n: Optional[int] = Query(None, ge=1),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
+    token: str = Depends(verify_professor_token)
+):
+    """Attendance rate and absence streaks per student, optionally over the last N sessions."""
+    try:
+        analytics = _analytics()
+        matrix = analytics.attendance_matrix
+        with matrix.lock:
+            matrix.refresh(db)
+            rows = range(skip, min(skip + limit, len(matrix.student_ids)))
+            return analytics.student_stats(matrix, last_n, rows)
+    except Exception as e:
+        logger.error("Error computing student stats: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analytics/students/{student_id}", response_model=schemas.StudentAttendanceStats)
+def get_student_stats_by_id(
+    student_id: str,
+    last_n: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_read_db),
+    token: str = Depends(verify_professor_token)
+):
+    """Attendance rate and absence streaks for one student."""
+    analytics = _analytics()
+    matrix = analytics.attendance_matrix
+    with matrix.lock:
+        matrix.refresh(db)
+        row = matrix.student_index.get(student_id)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Student not found")
+        return analytics.student_stats(matrix, last_n, [row])[0]
+
+@router.get("/analytics/at_risk", response_model=List[schemas.StudentAttendanceStats])
+def get_at_risk_students(
+    min_rate: float = Query(0.75, ge=0, le=1),
+    min_streak: int = Query(3, ge=1),
+    last_n: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_read_db),
+    token: str = Depends(verify_professor_token)
+):
+    """Students below `min_rate` or with `min_streak` consecutive absences, worst first."""
+    try:
+        analytics = _analytics()
+        matrix = analytics.attendance_matrix
+        with matrix.lock:
+            matrix.refresh(db)
+            rows = analytics.at_risk_rows(matrix, min_rate, min_streak, last_n)
+            return analytics.student_stats(matrix, last_n, rows)
+    except Exception as e:
+        logger.error("Error computing at-risk students: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/cohorts/query", response_model=schemas.CohortResult)
+def query_cohort(
+    query: schemas.CohortQuery,
+    db: Session = Depends(get_read_db),
+    token: str = Depends(verify_professor_token)
+):
+    """Set algebra over session attendees, e.g. attended A but not B."""
+    try:
+        bitmap = session_bitmap_index.evaluate(db, query.expression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if query.count_only:
+        return {"count": len(bitmap)}
+    return {"count": len(bitmap), "student_ids": session_bitmap_index.resolve(db, bitmap)}
+
+@router.post("/students", response_model=schemas.Student)
+def create_student(
+    student: schemas.StudentCreate,
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_professor_token)
+):
+    """Add a student to the roster."""
+    if crud.get_student(db, student.id):
+        raise HTTPException(status_code=400, detail="Student already exists")
+    try:
+        db_student = crud.create_student(db, student)
+        session_bitmap_index.ordinal(db, db_student.id)
+        roster_filter.add([db_student.id])
+        return db_student
+    except Exception as e:
+        logger.error("Error creating student: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/students/bulk")
+def create_students_bulk(
+    students: List[schemas.StudentCreate],
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_professor_token)
+):
+    """Import many students in one request."""
+    try:
+        created = crud.create_students_bulk(db, students)
+        crud.assign_missing_student_ordinals(db)
+        roster_filter.add(student.id for student in students)
+        return {"created": created}
+    except Exception as e:
+        logger.error("Error importing students: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/roster/stats", response_model=schemas.RosterStats)
+def get_roster_stats(token: str = Depends(verify_professor_token)):
+    """Size, memory footprint and false-positive rate of the roster filter."""
+    return roster_filter.stats()
+
+@router.post("/sync/push", response_model=schemas.EdgeSyncResult)
+def sync_push(
+    batch: schemas.EdgeSyncBatch,
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_professor_token)
+):
+    """Merge sessions and check-ins recorded on an edge node."""
+    try:
+        return edge.merge_batch(db, batch)
+    except Exception as e:
+        logger.error("Error merging sync from %s: %s", batch.node_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/sync/students", response_model=schemas.RosterPage)
+def sync_students(
+    after: int = 0,
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_professor_token)
+):
+    """Page through the roster by ordinal, for edge nodes mirroring it."""
+    return edge.roster_page(db, after, limit)
+
+@router.post("/reports", response_model=schemas.ReportJob, status_code=202)
+def submit_report(
+    request: schemas.ReportRequest,
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_professor_token)
+):
+    """Queue a report; poll its status and download it when done."""
+    try:
+        job = crud.create_report_job(db, uuid.uuid4().hex, request)
+        # The job outlives this request's session; it opens its own
+        report_runner.submit(job.id, sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind()))
+        return job
+    except Exception as e:
+        logger.error("Error submitting report: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/reports/{job_id}", response_model=schemas.ReportJob)
+def get_report(
+    job_id: str,
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_professor_token)
+):
+    """Status and progress of a report job."""
+    job = crud.get_report_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return job
+
+@router.get("/reports/{job_id}/download")
+def download_report(
+    job_id: str,
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_professor_token)
+):
+    """The finished report file."""
+    job = crud.get_report_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if job.status == "expired":
+        raise HTTPException(status_code=410, detail="Report has expired; submit it again")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Report is {job.status}")
+    media_type = "text/csv" if job.format == "csv" else "application/json"
+    return FileResponse(job.artifact_path, media_type=media_type, filename=f"{job.kind}.{job.format}")
\ No newline at end of file
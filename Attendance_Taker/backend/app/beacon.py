@@ -1,82 +1,142 @@
 """
 BLE beacon emission and fallback mechanisms.
+
+Emitter ownership lives in the shared coordinator rather than in this
+module, so any worker can start or stop a session's beacon.
 """
 import asyncio
 import logging
-from bleak import BleakScanner, BleakClient
-from bleak.backends.device import BLEDevice
-from bleak.backends.scanner import AdvertisementData
 import threading
 import time
+from typing import List
 
-logger = logging.getLogger(__name__)
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import crud
+from .coordinator import get_coordinator
+from .config import settings
+from .multicast import MulticastAnnouncer
 
-# Global variables for beacon management
-_beacon_emission_thread = None
-_beacon_active = False
-_current_session_id = None
+logger = logging.getLogger(__name__)
 
 # BLE service UUID for our beacon
 BEACON_SERVICE_UUID = "0000ffff-0000-1000-8000-00805f9b34fb"
 BEACON_CHARACTERISTIC_UUID = "0000fffe-0000-1000-8000-00805f9b34fb"
 
-async def emit_ble_beacon(session_id: int):
-    """Emit BLE beacon with session ID."""
+def load_ble_stack():
+    """Import the BLE stack on first use, so servers without Bluetooth never load it."""
+    import bleak
+    return bleak
+
+async def emit_ble_beacon(session_id: int, token: str, session_factory):
+    """Emit BLE beacon with session ID for as long as we hold its lease."""
+    coordinator = get_coordinator()
     try:
+        load_ble_stack()
+
         # This is a simplified implementation
         # In a real scenario, you'd use a proper BLE beacon library
         # or implement the Bluetooth advertising properly
-        
-        logger.info(f"Starting BLE beacon emission for session {session_id}")
-        
+
+        logger.info("Starting BLE beacon emission for session %s", session_id)
+
         # Simulate beacon emission
-        while _beacon_active and _current_session_id == session_id:
-            await asyncio.sleep(1)
-            
+        while True:
+            with session_factory() as db:
+                if not coordinator.renew(db, session_id, token):
+                    break
+            await asyncio.sleep(coordinator.heartbeat_interval)
+
     except Exception as e:
-        logger.error(f"Error emitting BLE beacon: {e}")
-        # Fallback to other methods
-        start_fallback_beacon(session_id)
-
-def start_fallback_beacon(session_id: int):
-    """Start fallback beacon mechanism (WebSocket/HTTP)."""
-    logger.info(f"Starting fallback beacon for session {session_id}")
-    # Implement WebSocket or HTTP polling fallback here
-    # For now, we'll just log it
-    pass
-
-def beacon_emission_worker(session_id: int):
+        logger.error("Error emitting BLE beacon: %s", e)
+        # Fallback to LAN announcements, still under the same lease
+        await emit_fallback_beacon(session_id, token, session_factory)
+
+async def emit_fallback_beacon(session_id: int, token: str, session_factory):
+    """Multicast signed session announcements on the LAN for as long as we hold the lease."""
+    coordinator = get_coordinator()
+    announcer = MulticastAnnouncer(
+        settings.MULTICAST_GROUP, settings.MULTICAST_PORT, settings.MULTICAST_KEY,
+        ttl=settings.MULTICAST_TTL, interface=settings.MULTICAST_INTERFACE
+    )
+    logger.info("Starting fallback beacon for session %s on %s:%s",
+                session_id, settings.MULTICAST_GROUP, settings.MULTICAST_PORT)
+    try:
+        renew_at = 0.0
+        while True:
+            # Announce often for fast discovery, renew only at the coordinator's pace
+            now = time.monotonic()
+            if now >= renew_at:
+                with session_factory() as db:
+                    if not coordinator.renew(db, session_id, token):
+                        break
+                renew_at = now + coordinator.heartbeat_interval
+            try:
+                announcer.announce(session_id)
+            except OSError as e:
+                # No route to the group yet (e.g. network down): keep the lease and retry
+                logger.error("Error sending session announcement: %s", e)
+            await asyncio.sleep(settings.MULTICAST_INTERVAL)
+    finally:
+        announcer.close()
+
+def beacon_emission_worker(session_id: int, token: str, session_factory):
     """Worker thread for beacon emission."""
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    
+
     try:
-        loop.run_until_complete(emit_ble_beacon(session_id))
+        if settings.BEACON_EMITTER == "ble":
+            loop.run_until_complete(emit_ble_beacon(session_id, token, session_factory))
+        else:
+            loop.run_until_complete(emit_fallback_beacon(session_id, token, session_factory))
     finally:
         loop.close()
+        with session_factory() as db:
+            get_coordinator().release(db, session_id, token)
+        logger.info("Beacon emitter for session %s exited", session_id)
+
+def start_beacon_emission(db: Session, session_id: int) -> bool:
+    """
+    Start beacon emission for the given session.
+
+    Returns False if another worker already runs the session's emitter.
+    """
+    token = get_coordinator().claim(db, session_id)
+    if token is None:
+        logger.info("Beacon for session %s is already emitted elsewhere", session_id)
+        return False
 
-def start_beacon_emission(session_id: int):
-    """Start beacon emission for the given session."""
-    global _beacon_emission_thread, _beacon_active, _current_session_id
-    
-    _current_session_id = session_id
-    _beacon_active = True
-    
-    # Start beacon emission in a separate thread
-    _beacon_emission_thread = threading.Thread(
-        target=beacon_emission_worker, 
-        args=(session_id,)
+    # Start beacon emission in a separate thread, with its own DB sessions
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    emission_thread = threading.Thread(
+        target=beacon_emission_worker,
+        args=(session_id, token, session_factory)
     )
-    _beacon_emission_thread.daemon = True
-    _beacon_emission_thread.start()
-    
-    logger.info(f"Started beacon emission for session {session_id}")
-
-def stop_beacon_emission():
-    """Stop any active beacon emission."""
-    global _beacon_active, _current_session_id
-    
-    _beacon_active = False
-    _current_session_id = None
-    
-    logger.info("Stopped beacon emission")
\ No newline at end of file
+    emission_thread.daemon = True
+    emission_thread.start()
+
+    logger.info("Started beacon emission for session %s", session_id)
+    return True
+
+def adopt_orphaned_sessions(db: Session) -> List[int]:
+    """
+    Start emitters for open sessions that have none, e.g. because their worker crashed.
+
+    Claiming is race-free, so every worker may run this; returns the IDs of
+    the sessions this worker took over.
+    """
+    coordinator = get_coordinator()
+    adopted = []
+    for session_id in crud.get_open_session_ids(db):
+        if not coordinator.is_emitting(db, session_id) and start_beacon_emission(db, session_id):
+            adopted.append(session_id)
+    if adopted:
+        logger.warning("Took over beacon emitters of sessions %s", adopted)
+    return adopted
+
+def stop_beacon_emission(db: Session, session_id: int):
+    """Stop beacon emission for the given session, on whichever worker runs it."""
+    get_coordinator().end(db, session_id)
+
+    logger.info("Stopped beacon emission for session %s", session_id)
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+Compressed bitmaps of integer ordinals, in the style of Roaring bitmaps.
+
+Ordinals are split by their high 16 bits into containers of up to 65536
+values. In memory each container is a Python int used as a bitset, so set
+algebra runs in C over machine words. Serialised, sparse containers are
+stored as sorted uint16 arrays and dense ones as raw 8 KiB bitsets.
+"""
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator
+
+# Containers holding more values than this are serialised as bitsets
+ARRAY_CONTAINER_MAX = 4096
+BITSET_BYTES = 65536 // 8
+
+_HEADER = struct.Struct("<I")
+_CONTAINER = struct.Struct("<HBI")  # key, kind, cardinality
+_ARRAY, _BITSET = 0, 1
+
+# Positions of the set bits of every byte value
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+def _bits(word: int) -> Iterator[int]:
+    """Yield the positions of the set bits of `word`, in ascending order."""
+    data = word.to_bytes((word.bit_length() + 7) // 8, "little")
+    for index, byte in enumerate(data):
+        if byte:
+            base = index * 8
+            for bit in _BYTE_BITS[byte]:
+                yield base + bit
+
+def _word(lows: Iterable[int]) -> int:
+    """Build a container bitset from 16-bit values."""
+    bitset = bytearray(BITSET_BYTES)
+    for low in lows:
+        bitset[low >> 3] |= 1 << (low & 7)
+    return int.from_bytes(bitset, "little")
+
+class RoaringBitmap:
+    """A set of non-negative integers below 2**32."""
+
+    __slots__ = ("containers",)
+
+    def __init__(self, values: Iterable[int] = ()):
+        self.containers: Dict[int, int] = {}
+        lows = {}
+        for value in values:
+            lows.setdefault(value >> 16, []).append(value & 0xFFFF)
+        for key, container_lows in lows.items():
+            self.containers[key] = _word(container_lows)
+
+    def add(self, value: int):
+        key = value >> 16
+        self.containers[key] = self.containers.get(key, 0) | (1 << (value & 0xFFFF))
+
+    def copy(self) -> "RoaringBitmap":
+        result = RoaringBitmap()
+        result.containers = dict(self.containers)
+        return result
+
+    def update(self, other: "RoaringBitmap"):
+        """In-place union."""
+        for key, word in other.containers.items():
+            self.containers[key] = self.containers.get(key, 0) | word
+
+    def __contains__(self, value: int) -> bool:
+        return bool(self.containers.get(value >> 16, 0) >> (value & 0xFFFF) & 1)
+
+    def __len__(self) -> int:
+        return sum(word.bit_count() for word in self.containers.values())
+
+    def __iter__(self) -> Iterator[int]:
+        for key in sorted(self.containers):
+            base = key << 16
+            for low in _bits(self.containers[key]):
+                yield base | low
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, RoaringBitmap) and self.containers == other.containers
+
+    def __or__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        result = RoaringBitmap()
+        result.containers = dict(self.containers)
+        for key, word in other.containers.items():
+            result.containers[key] = result.containers.get(key, 0) | word
+        return result
+
+    def __and__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        result = RoaringBitmap()
+        for key, word in self.containers.items():
+            word &= other.containers.get(key, 0)
+            if word:
+                result.containers[key] = word
+        return result
+
+    def __sub__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        result = RoaringBitmap()
+        for key, word in self.containers.items():
+            word &= ~other.containers.get(key, 0)
+            if word:
+                result.containers[key] = word
+        return result
+
+    def to_bytes(self) -> bytes:
+        """Serialise, choosing the smaller encoding per container."""
+        parts = [_HEADER.pack(len(self.containers))]
+        for key in sorted(self.containers):
+            word = self.containers[key]
+            cardinality = word.bit_count()
+            if cardinality <= ARRAY_CONTAINER_MAX:
+                values = array("H", _bits(word))
+                if sys.byteorder == "big":
+                    values.byteswap()
+                parts.append(_CONTAINER.pack(key, _ARRAY, cardinality))
+                parts.append(values.tobytes())
+            else:
+                parts.append(_CONTAINER.pack(key, _BITSET, cardinality))
+                parts.append(word.to_bytes(BITSET_BYTES, "little"))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "RoaringBitmap":
+        result = cls()
+        (count,), offset = _HEADER.unpack_from(data), _HEADER.size
+        for _ in range(count):
+            key, kind, cardinality = _CONTAINER.unpack_from(data, offset)
+            offset += _CONTAINER.size
+            if kind == _ARRAY:
+                values = array("H")
+                values.frombytes(data[offset:offset + 2 * cardinality])
+                if sys.byteorder == "big":
+                    values.byteswap()
+                offset += 2 * cardinality
+                word = _word(values)
+            else:
+                word = int.from_bytes(data[offset:offset + BITSET_BYTES], "little")
+                offset += BITSET_BYTES
+            result.containers[key] = word
+        return result
\ No newline at end of file
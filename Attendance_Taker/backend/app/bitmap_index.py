@@ -0,0 +1,151 @@
+"""
+Per-session bitmap index of attendees, for cohort set queries.
+
+Each session maps to a RoaringBitmap of the ordinals of the students who
+attended it. Bitmaps are built and stored when a session closes and updated
+in memory as check-ins arrive, so questions like "attended A but not B"
+are answered with set algebra instead of scanning the attendance table.
+
+The lock only guards the in-memory maps: database reads happen outside
+it, so a cohort query or a session close never holds up check-ins.
+Queries only read (their session may be on a replica); bitmaps are stored
+by `close`, which runs on the primary when a session stops.
+Callers get bitmaps nobody mutates: frozen ones are replaced, never
+changed, and open ones are handed out as copies.
+"""
+import threading
+from typing import Dict, List
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models, crud, schemas
+from .bitmap import RoaringBitmap
+
+class SessionBitmapIndex:
+    """Process-wide cache of session bitmaps and student ordinals."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.bitmaps: Dict[int, RoaringBitmap] = {}
+        self.watermarks: Dict[int, int] = {}  # session_id -> newest attendance id read
+        self.closed = set()  # Sessions whose bitmap is complete
+        self.ordinals: Dict[str, int] = {}  # student_id -> ordinal
+        self.student_ids: Dict[int, str] = {}  # ordinal -> student_id
+        self.roster_bitmap = RoaringBitmap()
+        self.roster_size = 0
+
+    def ordinal(self, db: Session, student_id: str) -> int:
+        ordinal = self.ordinals.get(student_id)
+        if ordinal is None:
+            ordinal = crud.get_or_create_student_ordinal(db, student_id)
+            with self.lock:
+                self.ordinals[student_id] = ordinal
+                self.student_ids[ordinal] = student_id
+        return ordinal
+
+    def record(self, db: Session, attendance: models.Attendance):
+        """Update the session's bitmap after a check-in."""
+        ordinal = self.ordinal(db, attendance.student_id)
+        with self.lock:
+            bitmap = self.bitmaps.get(attendance.session_id)
+            if bitmap is not None and attendance.session_id not in self.closed:
+                bitmap.add(ordinal)
+
+    def _read_since(self, db: Session, session_id: int, watermark: int):
+        """Attendees of a session with attendance id above `watermark`, and the new watermark."""
+        rows = db.execute(
+            select(models.Attendance.id, models.StudentOrdinal.ordinal)
+            .join(models.StudentOrdinal, models.StudentOrdinal.student_id == models.Attendance.student_id)
+            .where(models.Attendance.session_id == session_id, models.Attendance.id > watermark)
+        ).all()
+        if rows:
+            watermark = max(watermark, max(row.id for row in rows))
+        return RoaringBitmap(row.ordinal for row in rows), watermark
+
+    def session(self, db: Session, session_id: int) -> RoaringBitmap:
+        """Bitmap of the attendees of a session."""
+        with self.lock:
+            if session_id in self.closed:
+                return self.bitmaps[session_id]
+            watermark = self.watermarks.get(session_id, 0)
+
+        stored = crud.get_session_bitmap(db, session_id)
+        if stored is not None:
+            bitmap = RoaringBitmap.from_bytes(stored.bitmap)
+            with self.lock:
+                self.bitmaps[session_id] = bitmap
+                self.closed.add(session_id)
+                self.watermarks.pop(session_id, None)
+            return bitmap
+
+        # Still open, or closed without a stored bitmap: pick up check-ins handled by other
+        # workers. Never stored from here, as `db` may be a replica; only `close` freezes.
+        fresh, watermark = self._read_since(db, session_id, watermark)
+        with self.lock:
+            if session_id in self.closed:
+                return self.bitmaps[session_id]
+            bitmap = self.bitmaps.setdefault(session_id, RoaringBitmap())
+            # Unions are idempotent, so overlapping catch-ups merge harmlessly
+            bitmap.update(fresh)
+            self.watermarks[session_id] = max(self.watermarks.get(session_id, 0), watermark)
+            return bitmap.copy()
+
+    def close(self, db: Session, session_id: int) -> RoaringBitmap:
+        """Build the complete bitmap of a closed session and store it."""
+        bitmap, watermark = self._read_since(db, session_id, 0)
+        crud.save_session_bitmap(db, session_id, bitmap.to_bytes(), len(bitmap), watermark)
+        with self.lock:
+            self.bitmaps[session_id] = bitmap
+            self.closed.add(session_id)
+            self.watermarks.pop(session_id, None)
+        return bitmap
+
+    def roster(self, db: Session) -> RoaringBitmap:
+        """Bitmap of every student with an ordinal."""
+        size = db.execute(select(func.count(models.StudentOrdinal.ordinal))).scalar()
+        with self.lock:
+            if size == self.roster_size:
+                return self.roster_bitmap
+        bitmap = RoaringBitmap(db.execute(select(models.StudentOrdinal.ordinal)).scalars())
+        with self.lock:
+            self.roster_bitmap = bitmap
+            self.roster_size = size
+        return bitmap
+
+    def resolve(self, db: Session, bitmap: RoaringBitmap) -> List[str]:
+        """Student IDs for the ordinals in a bitmap (one from this index, so nobody mutates it)."""
+        ordinals = list(bitmap)
+        missing = [ordinal for ordinal in ordinals if ordinal not in self.student_ids]
+        for start in range(0, len(missing), 1000):
+            found = crud.get_student_ids_by_ordinal(db, missing[start:start + 1000])
+            with self.lock:
+                self.student_ids.update(found)
+        return [self.student_ids[ordinal] for ordinal in ordinals if ordinal in self.student_ids]
+
+    def evaluate(self, db: Session, expression: schemas.CohortExpression) -> RoaringBitmap:
+        """Evaluate a cohort expression tree to a bitmap."""
+        if expression.op is None:
+            if expression.roster:
+                return self.roster(db)
+            if expression.session_id is not None:
+                return self.session(db, expression.session_id)
+            raise ValueError("A leaf needs either session_id or roster")
+
+        if not expression.operands:
+            raise ValueError(f"'{expression.op}' needs at least one operand")
+        result, *rest = [self.evaluate(db, operand) for operand in expression.operands]
+        for operand in rest:
+            if expression.op == "union":
+                result = result | operand
+            elif expression.op == "intersection":
+                result = result & operand
+            else:
+                result = result - operand
+        return result
+
+# Shared per-process index
+session_bitmap_index = SessionBitmapIndex()
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+Shared coordination of beacon emitters across workers and hosts.
+
+Every worker asks the coordinator before running an emitter, so exactly one
+emitter runs per session no matter which worker handled `start_attendance`,
+and `stop_attendance` takes effect no matter which worker receives it.
+"""
+import threading
+import time
+import uuid
+import logging
+from functools import lru_cache
+
+from sqlalchemy import update, delete, exists, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+class LocalCoordinator:
+    """In-process coordinator for single-worker deployments and tests."""
+
+    # How often emitters check whether they should keep running (seconds)
+    heartbeat_interval = 1.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._owners = {}
+
+    def claim(self, db: Session, session_id: int):
+        """Claim the emitter of a session. Returns an owner token, or None."""
+        with self._lock:
+            if session_id in self._owners:
+                return None
+            token = uuid.uuid4().hex
+            self._owners[session_id] = token
+            return token
+
+    def renew(self, db: Session, session_id: int, token: str) -> bool:
+        """Return True while the holder of `token` should keep emitting and the session is active."""
+        with self._lock:
+            if self._owners.get(session_id) != token:
+                return False
+        return bool(db.execute(
+            select(models.BeaconSession.is_active).where(models.BeaconSession.id == session_id)
+        ).scalar())
+
+    def release(self, db: Session, session_id: int, token: str):
+        """Give up the emitter, if `token` still holds it."""
+        with self._lock:
+            if self._owners.get(session_id) == token:
+                del self._owners[session_id]
+
+    def end(self, db: Session, session_id: int):
+        """Signal whichever emitter holds the session to stop."""
+        with self._lock:
+            self._owners.pop(session_id, None)
+
+    def is_emitting(self, db: Session, session_id: int) -> bool:
+        with self._lock:
+            return session_id in self._owners
+
+class DatabaseCoordinator:
+    """
+    Coordinator backed by lease rows in the shared database.
+
+    A lease is a row in `beacon_leases` that the owning worker renews on
+    every heartbeat. Leases of crashed workers expire after the TTL and are
+    claimed again by the next scheduler tick on any worker (see
+    `beacon.adopt_orphaned_sessions`); `end` deletes the lease so the owner
+    notices on its next heartbeat.
+    Works on any database SQLAlchemy supports, including SQLite.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.heartbeat_interval = ttl / 3
+
+    def claim(self, db: Session, session_id: int):
+        """Claim the emitter of a session. Returns an owner token, or None."""
+        token = uuid.uuid4().hex
+        now = time.time()
+
+        # Take over an expired lease...
+        result = db.execute(
+            update(models.BeaconLease)
+            .where(
+                models.BeaconLease.session_id == session_id,
+                models.BeaconLease.expires_at < now,
+            )
+            .values(owner=token, expires_at=now + self.ttl)
+        )
+        if result.rowcount == 1:
+            db.commit()
+            return token
+
+        # ...or create a new one; the primary key makes this race-free
+        try:
+            db.add(models.BeaconLease(session_id=session_id, owner=token, expires_at=now + self.ttl))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return None
+        return token
+
+    def renew(self, db: Session, session_id: int, token: str) -> bool:
+        """Extend the lease. Returns False once it was lost or the session ended."""
+        session_active = exists().where(
+            models.BeaconSession.id == session_id,
+            models.BeaconSession.is_active == True,
+        )
+        result = db.execute(
+            update(models.BeaconLease)
+            .where(
+                models.BeaconLease.session_id == session_id,
+                models.BeaconLease.owner == token,
+                session_active,
+            )
+            .values(expires_at=time.time() + self.ttl)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    def release(self, db: Session, session_id: int, token: str):
+        """Give up the emitter, if `token` still holds it."""
+        db.execute(
+            delete(models.BeaconLease).where(
+                models.BeaconLease.session_id == session_id,
+                models.BeaconLease.owner == token,
+            )
+        )
+        db.commit()
+
+    def end(self, db: Session, session_id: int):
+        """Signal whichever emitter holds the session to stop."""
+        db.execute(delete(models.BeaconLease).where(models.BeaconLease.session_id == session_id))
+        db.commit()
+
+    def is_emitting(self, db: Session, session_id: int) -> bool:
+        expires_at = db.execute(
+            select(models.BeaconLease.expires_at).where(models.BeaconLease.session_id == session_id)
+        ).scalar()
+        return expires_at is not None and expires_at >= time.time()
+
+@lru_cache()
+def get_coordinator():
+    """Return the coordinator selected by `COORDINATOR_BACKEND`."""
+    backend = settings.COORDINATOR_BACKEND
+    if backend == "local":
+        return LocalCoordinator()
+    if backend == "database":
+        return DatabaseCoordinator(ttl=settings.BEACON_LEASE_TTL)
+    raise ValueError(f"Unknown COORDINATOR_BACKEND: {backend}")
\ No newline at end of file
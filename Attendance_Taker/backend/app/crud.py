@@ -1,8 +1,12 @@
 """
 CRUD operations for database models.
 """
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, func, insert, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 from . import models, schemas
 
 # Student operations
@@ -16,18 +20,55 @@ def create_student(db: Session, student: schemas.StudentCreate):
     db.refresh(db_student)
     return db_student
 
+def create_students_bulk(db: Session, students: List[schemas.StudentCreate]):
+    db.bulk_insert_mappings(models.Student, [student.dict() for student in students])
+    db.commit()
+    return len(students)
+
 # BeaconSession operations
 def get_beacon_session(db: Session, session_id: int):
     return db.query(models.BeaconSession).filter(models.BeaconSession.id == session_id).first()
 
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive datetimes; they are stored as UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def is_session_open(session: models.BeaconSession, now: Optional[datetime] = None) -> bool:
+    """Active and not past its expiry, even if the scheduler hasn't closed it yet."""
+    if not session.is_active:
+        return False
+    expires_at = as_utc(session.expires_at)
+    return expires_at is None or expires_at > (now or datetime.now(timezone.utc))
+
 def get_active_beacon_session(db: Session):
-    return db.query(models.BeaconSession).filter(models.BeaconSession.is_active == True).first()
+    now = datetime.now(timezone.utc)
+    return db.query(models.BeaconSession).filter(
+        models.BeaconSession.is_active == True,
+        or_(models.BeaconSession.expires_at.is_(None), models.BeaconSession.expires_at > now)
+    ).first()
+
+def get_open_session_ids(db: Session) -> List[int]:
+    """Open sessions this server emits beacons for; edge-synced ones have their own emitter."""
+    now = datetime.now(timezone.utc)
+    return db.execute(
+        select(models.BeaconSession.id).where(
+            models.BeaconSession.is_active == True,
+            models.BeaconSession.origin.is_(None),
+            or_(models.BeaconSession.expires_at.is_(None), models.BeaconSession.expires_at > now)
+        )
+    ).scalars().all()
 
 def get_beacon_sessions(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.BeaconSession).offset(skip).limit(limit).all()
 
 def create_beacon_session(db: Session, session: schemas.BeaconSessionCreate):
-    db_session = models.BeaconSession(**session.dict())
+    data = session.dict()
+    duration = data.pop("duration_minutes", None)
+    if duration:
+        data["expires_at"] = datetime.now(timezone.utc) + timedelta(minutes=duration)
+    db_session = models.BeaconSession(**data)
     db.add(db_session)
     db.commit()
     db.refresh(db_session)
@@ -37,10 +78,30 @@ def update_beacon_session_status(db: Session, session_id: int, is_active: bool):
     db_session = db.query(models.BeaconSession).filter(models.BeaconSession.id == session_id).first()
     if db_session:
         db_session.is_active = is_active
+        db_session.ended_at = None if is_active else datetime.now(timezone.utc)
         db.commit()
         db.refresh(db_session)
     return db_session
 
+def expire_sessions(db: Session, now: Optional[datetime] = None) -> List[int]:
+    """Close every active session past its expiry in one update; returns their IDs."""
+    now = now or datetime.now(timezone.utc)
+    expired = db.execute(
+        select(models.BeaconSession.id).where(
+            models.BeaconSession.is_active == True,
+            models.BeaconSession.expires_at <= now
+        )
+    ).scalars().all()
+    if expired:
+        db.execute(
+            update(models.BeaconSession)
+            .where(models.BeaconSession.id.in_(expired), models.BeaconSession.is_active == True)
+            .values(is_active=False, ended_at=models.BeaconSession.expires_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    return expired
+
 # Attendance operations
 def get_attendance(db: Session, session_id: Optional[int] = None, student_id: Optional[str] = None):
     query = db.query(models.Attendance)
@@ -52,15 +113,430 @@ def get_attendance(db: Session, session_id: Optional[int] = None, student_id: Op
     
     return query.all()
 
+# Column projections for read-only listings: plain dicts, no ORM instances
+# in the identity map and no re-validation on the way out
+ATTENDANCE_COLUMNS = (
+    models.Attendance.id,
+    models.Attendance.student_id,
+    models.Attendance.session_id,
+    models.Attendance.device_id,
+    models.Attendance.timestamp,
+)
+
+SESSION_COLUMNS = (
+    models.BeaconSession.id,
+    models.BeaconSession.name,
+    models.BeaconSession.description,
+    models.BeaconSession.is_active,
+    models.BeaconSession.created_at,
+    models.BeaconSession.ended_at,
+    models.BeaconSession.expires_at,
+)
+
+def attendance_filters(session_id: Optional[int] = None, student_id: Optional[str] = None,
+                       start: Optional[datetime] = None, end: Optional[datetime] = None) -> list:
+    """WHERE clauses for one session and/or student, with `start` <= timestamp < `end`."""
+    filters = []
+    if session_id:
+        filters.append(models.Attendance.session_id == session_id)
+    if student_id:
+        filters.append(models.Attendance.student_id == student_id)
+    if start:
+        filters.append(models.Attendance.timestamp >= start)
+    if end:
+        filters.append(models.Attendance.timestamp < end)
+    return filters
+
+def get_attendance_rows(db: Session, session_id: Optional[int] = None, student_id: Optional[str] = None,
+                        start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[dict]:
+    """Check-ins, optionally for one session and/or student, with `start` <= timestamp < `end`."""
+    query = select(*ATTENDANCE_COLUMNS).where(*attendance_filters(session_id, student_id, start, end))
+    return [dict(row) for row in db.execute(query).mappings()]
+
+# Keyset pagination: each sort is a unique key matching one of the attendance indexes,
+# so every page is an index range read however deep into the history it is
+ATTENDANCE_SORT_KEYS = {
+    "timestamp": ("timestamp", "id"),
+    "student_id": ("student_id", "timestamp", "id"),
+    "session_id": ("session_id", "student_id"),
+}
+
+def get_attendance_page(db: Session, filters: list, sort: str = "timestamp", descending: bool = True,
+                        after: Optional[list] = None, limit: int = 100) -> List[dict]:
+    """Up to `limit` check-ins in `sort` order, starting after the sort key values `after`."""
+    key = [getattr(models.Attendance, name) for name in ATTENDANCE_SORT_KEYS[sort]]
+    query = select(*ATTENDANCE_COLUMNS).where(*filters)
+    if after is not None:
+        query = query.where(tuple_(*key) < tuple_(*after) if descending else tuple_(*key) > tuple_(*after))
+    query = query.order_by(*[column.desc() if descending else column for column in key]).limit(limit)
+    return [dict(row) for row in db.execute(query).mappings()]
+
+def count_attendance(db: Session, filters: list) -> int:
+    return db.execute(select(func.count(models.Attendance.id)).where(*filters)).scalar()
+
+def get_attendance_summary(db: Session, filters: list, top_students: int = 20) -> dict:
+    """Totals, check-ins per day and the most frequent attendees for the filtered check-ins."""
+    total, students, first, latest = db.execute(
+        select(
+            func.count(models.Attendance.id),
+            func.count(models.Attendance.student_id.distinct()),
+            func.min(models.Attendance.timestamp),
+            func.max(models.Attendance.timestamp),
+        ).where(*filters)
+    ).one()
+    day = func.date(models.Attendance.timestamp)
+    daily = db.execute(select(day, func.count()).where(*filters).group_by(day).order_by(day)).all()
+    count = func.count().label("count")
+    top = db.execute(
+        select(models.Attendance.student_id, count).where(*filters)
+        .group_by(models.Attendance.student_id).order_by(count.desc(), models.Attendance.student_id)
+        .limit(top_students)
+    ).all()
+    return {
+        "total": total,
+        "unique_students": students,
+        "first_check_in": first,
+        "latest_check_in": latest,
+        "daily": [{"date": str(date), "count": n} for date, n in daily],
+        "top_students": [{"student_id": student_id, "count": n} for student_id, n in top],
+    }
+
+def get_beacon_session_rows(db: Session, skip: int = 0, limit: int = 100) -> List[dict]:
+    query = select(*SESSION_COLUMNS).offset(skip).limit(limit)
+    return [dict(row) for row in db.execute(query).mappings()]
+
 def get_attendance_by_student_and_session(db: Session, student_id: str, session_id: int):
     return db.query(models.Attendance).filter(
         models.Attendance.student_id == student_id,
         models.Attendance.session_id == session_id
     ).first()
 
+def get_session_attendance_summary(db: Session, session_id: int):
+    """(number of check-ins, newest attendance id) for a session."""
+    count, last_id = db.query(func.count(models.Attendance.id), func.max(models.Attendance.id)).filter(
+        models.Attendance.session_id == session_id
+    ).one()
+    return count, last_id or 0
+
+def get_attendance_since(db: Session, session_id: int, after_id: int):
+    return db.query(models.Attendance).filter(
+        models.Attendance.session_id == session_id,
+        models.Attendance.id > after_id
+    ).order_by(models.Attendance.id).all()
+
 def create_attendance(db: Session, attendance: schemas.AttendanceCreate):
     db_attendance = models.Attendance(**attendance.dict())
     db.add(db_attendance)
     db.commit()
     db.refresh(db_attendance)
-    return db_attendance
\ No newline at end of file
+    return db_attendance
+
+def is_duplicate_attendance(error: IntegrityError) -> bool:
+    """True if `error` came from the one-check-in-per-session index, not another constraint."""
+    constraint = getattr(getattr(error.orig, "diag", None), "constraint_name", None)  # PostgreSQL
+    if constraint:
+        return constraint == "uq_attendance_session_student"
+    # SQLite names the columns instead of the index
+    return "attendance.session_id, attendance.student_id" in str(error.orig)
+
+def is_foreign_key_violation(error: IntegrityError) -> bool:
+    code = getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+    if code:
+        return code == "23503"
+    return "FOREIGN KEY constraint failed" in str(error.orig)
+
+# StudentOrdinal operations
+def get_or_create_student_ordinal(db: Session, student_id: str) -> int:
+    ordinal = db.query(models.StudentOrdinal.ordinal).filter(
+        models.StudentOrdinal.student_id == student_id
+    ).scalar()
+    if ordinal is not None:
+        return ordinal
+    
+    db_ordinal = models.StudentOrdinal(student_id=student_id)
+    try:
+        db.add(db_ordinal)
+        db.commit()
+        return db_ordinal.ordinal
+    except IntegrityError:
+        # Another request assigned it first
+        db.rollback()
+        return get_or_create_student_ordinal(db, student_id)
+
+def get_student_ids_by_ordinal(db: Session, ordinals: Iterable[int]) -> Dict[int, str]:
+    return dict(
+        db.query(models.StudentOrdinal.ordinal, models.StudentOrdinal.student_id)
+        .filter(models.StudentOrdinal.ordinal.in_(list(ordinals)))
+        .all()
+    )
+
+# SessionBitmap operations
+def get_session_bitmap(db: Session, session_id: int):
+    return db.query(models.SessionBitmap).filter(models.SessionBitmap.session_id == session_id).first()
+
+def save_session_bitmap(db: Session, session_id: int, bitmap: bytes, cardinality: int, last_attendance_id: int):
+    db_bitmap = db.merge(models.SessionBitmap(
+        session_id=session_id,
+        bitmap=bitmap,
+        cardinality=cardinality,
+        last_attendance_id=last_attendance_id
+    ))
+    db.commit()
+    return db_bitmap
+
+def assign_missing_student_ordinals(db: Session):
+    """Give every student without an ordinal one, in one statement."""
+    assigned = db.query(models.StudentOrdinal.student_id)
+    db.execute(
+        insert(models.StudentOrdinal).from_select(
+            ["student_id"],
+            select(models.Student.id)
+            .where(models.Student.id.not_in(assigned))
+            .order_by(models.Student.created_at, models.Student.id)
+        )
+    )
+    db.commit()
+
+# Edge sync operations
+def insert_ignoring_duplicates(
+    db: Session, model, rows: List[dict], conflict_columns: Optional[List[str]] = None
+) -> int:
+    """
+    Insert rows, skipping any that collide on `conflict_columns` (or on any
+    unique constraint when None); returns how many were new.
+    """
+    if not rows:
+        return 0
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = dialect_insert(model).values(rows).on_conflict_do_nothing(index_elements=conflict_columns)
+        return db.execute(statement).rowcount
+    inserted = 0
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.execute(insert(model).values(**row))
+            inserted += 1
+        except IntegrityError:
+            pass
+    return inserted
+
+def get_sync_state(db: Session, name: str, default: str) -> str:
+    value = db.query(models.SyncState.value).filter(models.SyncState.name == name).scalar()
+    return default if value is None else value
+
+def set_sync_state(db: Session, values: Dict[str, str]):
+    for name, value in values.items():
+        db.merge(models.SyncState(name=name, value=value))
+    db.commit()
+
+def get_attendance_rows_after(db: Session, after_id: int, limit: int) -> List[dict]:
+    query = select(*ATTENDANCE_COLUMNS).where(models.Attendance.id > after_id).order_by(models.Attendance.id).limit(limit)
+    return [dict(row) for row in db.execute(query).mappings()]
+
+def get_attendance_rows_by_id(db: Session, attendance_ids: Iterable[int]) -> List[dict]:
+    query = select(*ATTENDANCE_COLUMNS).where(models.Attendance.id.in_(list(attendance_ids))).order_by(models.Attendance.id)
+    return [dict(row) for row in db.execute(query).mappings()]
+
+def get_beacon_session_rows_for_sync(db: Session, after_id: int, include: Iterable[int]) -> List[dict]:
+    """Sessions newer than `after_id`, plus the `include` ones whose state may have changed."""
+    query = select(*SESSION_COLUMNS).where(
+        or_(models.BeaconSession.id > after_id, models.BeaconSession.id.in_(list(include)))
+    ).order_by(models.BeaconSession.id)
+    return [dict(row) for row in db.execute(query).mappings()]
+
+def get_origin_session_ids(db: Session, origin: str, origin_session_ids: Iterable[int]) -> Dict[int, int]:
+    """Edge session ID -> central session ID for one edge node."""
+    return dict(
+        db.query(models.BeaconSession.origin_session_id, models.BeaconSession.id)
+        .filter(
+            models.BeaconSession.origin == origin,
+            models.BeaconSession.origin_session_id.in_(list(origin_session_ids))
+        )
+        .all()
+    )
+
+def upsert_origin_sessions(db: Session, origin: str, sessions: List[dict]) -> Dict[int, int]:
+    """Create or update an edge node's sessions; returns edge ID -> central ID."""
+    existing = {
+        session.origin_session_id: session
+        for session in db.query(models.BeaconSession).filter(
+            models.BeaconSession.origin == origin,
+            models.BeaconSession.origin_session_id.in_([s["id"] for s in sessions])
+        )
+    }
+    for data in sessions:
+        fields = {key: value for key, value in data.items() if key != "id"}
+        db_session = existing.get(data["id"])
+        if db_session is None:
+            db_session = existing[data["id"]] = models.BeaconSession(
+                origin=origin, origin_session_id=data["id"], **fields
+            )
+            db.add(db_session)
+        else:
+            for key, value in fields.items():
+                setattr(db_session, key, value)
+    db.flush()
+    return {origin_id: session.id for origin_id, session in existing.items()}
+
+def get_existing_student_ids(db: Session, student_ids: Iterable[str]) -> set:
+    return set(db.execute(select(models.Student.id).where(models.Student.id.in_(list(student_ids)))).scalars())
+
+def get_students_after_ordinal(db: Session, after: int, limit: int):
+    """(ordinal, student) pairs in ordinal order, for paging through the roster."""
+    return (
+        db.query(models.StudentOrdinal.ordinal, models.Student)
+        .join(models.Student, models.Student.id == models.StudentOrdinal.student_id)
+        .filter(models.StudentOrdinal.ordinal > after)
+        .order_by(models.StudentOrdinal.ordinal)
+        .limit(limit)
+        .all()
+    )
+
+# IdempotencyKey operations
+def claim_idempotency_key(db: Session, scope: str, key: str, fingerprint: str, now: float) -> bool:
+    """Record a key as in progress; False if another request already holds it."""
+    row = {"scope": scope, "key": key, "fingerprint": fingerprint, "created_at": now}
+    claimed = insert_ignoring_duplicates(db, models.IdempotencyKey, [row], ["scope", "key"])
+    db.commit()
+    return claimed == 1
+
+def get_idempotency_key(db: Session, scope: str, key: str):
+    return db.execute(select(
+        models.IdempotencyKey.fingerprint, models.IdempotencyKey.created_at,
+        models.IdempotencyKey.status_code, models.IdempotencyKey.body
+    ).where(models.IdempotencyKey.scope == scope, models.IdempotencyKey.key == key)).first()
+
+def finish_idempotency_key(db: Session, scope: str, key: str, status_code: int, body: str):
+    db.execute(
+        update(models.IdempotencyKey)
+        .where(models.IdempotencyKey.scope == scope, models.IdempotencyKey.key == key)
+        .values(status_code=status_code, body=body)
+    )
+    db.commit()
+
+def delete_idempotency_keys(db: Session, before: float, scope: Optional[str] = None, key: Optional[str] = None) -> int:
+    """Delete keys created before `before`: one key, or every expired one when `scope` is None."""
+    statement = delete(models.IdempotencyKey).where(models.IdempotencyKey.created_at < before)
+    if scope is not None:
+        statement = statement.where(models.IdempotencyKey.scope == scope, models.IdempotencyKey.key == key)
+    deleted = db.execute(statement).rowcount
+    db.commit()
+    return deleted
+
+# ReportJob operations
+def create_report_job(db: Session, job_id: str, request: schemas.ReportRequest):
+    db_job = models.ReportJob(
+        id=job_id,
+        kind=request.kind,
+        format=request.format,
+        params=request.model_dump_json(exclude={"kind", "format"}),
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def get_report_job(db: Session, job_id: str):
+    return db.query(models.ReportJob).filter(models.ReportJob.id == job_id).first()
+
+def update_report_job(db: Session, job_id: str, **fields):
+    fields["updated_at"] = datetime.now(timezone.utc)
+    db.query(models.ReportJob).filter(models.ReportJob.id == job_id).update(fields, synchronize_session=False)
+    db.commit()
+
+def claim_report_job(db: Session, job_id: str) -> bool:
+    """Move a queued job to running; False if it is no longer queued (e.g. failed as stale)."""
+    claimed = db.execute(
+        update(models.ReportJob)
+        .where(models.ReportJob.id == job_id, models.ReportJob.status == "queued")
+        .values(status="running", updated_at=datetime.now(timezone.utc))
+    ).rowcount
+    db.commit()
+    return claimed == 1
+
+def fail_stale_report_jobs(db: Session, before: datetime, error: str, exclude: Iterable[str] = ()) -> List[str]:
+    """Mark queued or running jobs with no progress since `before` failed, except `exclude`; returns their IDs."""
+    conditions = (
+        models.ReportJob.status.in_(["queued", "running"]),
+        func.coalesce(models.ReportJob.updated_at, models.ReportJob.created_at) < before,
+        models.ReportJob.id.notin_(list(exclude)),
+    )
+    stale = list(db.execute(select(models.ReportJob.id).where(*conditions)).scalars())
+    if stale:
+        now = datetime.now(timezone.utc)
+        # Conditions repeated: a job that reported progress in between is left alone
+        db.execute(
+            update(models.ReportJob).where(models.ReportJob.id.in_(stale), *conditions)
+            .values(status="failed", error=error, finished_at=now, updated_at=now)
+        )
+        db.commit()
+    return stale
+
+def expire_report_jobs(db: Session, before: datetime) -> List[tuple]:
+    """Mark jobs that finished before `before` and still have an artifact expired; returns (id, path) pairs."""
+    expired = db.execute(select(models.ReportJob.id, models.ReportJob.artifact_path).where(
+        models.ReportJob.artifact_path.isnot(None),
+        models.ReportJob.finished_at < before
+    )).all()
+    if expired:
+        db.execute(
+            update(models.ReportJob).where(models.ReportJob.id.in_([job_id for job_id, _ in expired]))
+            .values(status="expired", artifact_path=None, updated_at=datetime.now(timezone.utc))
+        )
+        db.commit()
+    return [tuple(row) for row in expired]
+
+# Report queries
+def report_session_scope(session_ids: Optional[List[int]], start: Optional[datetime], end: Optional[datetime]):
+    """SELECT of the IDs of the sessions a report covers."""
+    query = select(models.BeaconSession.id)
+    if session_ids:
+        query = query.where(models.BeaconSession.id.in_(session_ids))
+    if start:
+        query = query.where(models.BeaconSession.created_at >= start)
+    if end:
+        query = query.where(models.BeaconSession.created_at < end)
+    return query
+
+def count_query(db: Session, query) -> int:
+    return db.execute(select(func.count()).select_from(query.subquery())).scalar()
+
+def count_attendance_in_scope(db: Session, scope) -> int:
+    return db.execute(
+        select(func.count(models.Attendance.id)).where(models.Attendance.session_id.in_(scope))
+    ).scalar()
+
+def count_students(db: Session) -> int:
+    return db.execute(select(func.count(models.Student.id))).scalar()
+
+def get_attendance_export_page(db: Session, scope, after_id: int, limit: int):
+    return db.execute(
+        select(*ATTENDANCE_COLUMNS)
+        .where(models.Attendance.session_id.in_(scope), models.Attendance.id > after_id)
+        .order_by(models.Attendance.id)
+        .limit(limit)
+    ).all()
+
+def get_students_page(db: Session, after_id: str, limit: int):
+    return db.execute(
+        select(models.Student.id, models.Student.name, models.Student.email)
+        .where(models.Student.id > after_id)
+        .order_by(models.Student.id)
+        .limit(limit)
+    ).all()
+
+def get_attendance_totals(db: Session, scope, student_ids: List[str]):
+    """student_id -> (sessions attended, first check-in, last check-in) within `scope`."""
+    rows = db.execute(
+        select(
+            models.Attendance.student_id,
+            func.count(models.Attendance.id),
+            func.min(models.Attendance.timestamp),
+            func.max(models.Attendance.timestamp),
+        )
+        .where(models.Attendance.session_id.in_(scope), models.Attendance.student_id.in_(student_ids))
+        .group_by(models.Attendance.student_id)
+    ).all()
+    return {student_id: (count, first, last) for student_id, count, first, last in rows}
\ No newline at end of file
@@ -1,16 +1,46 @@
 """
 Database configuration and session management.
+
+Writes always go to the primary. Read-only professor endpoints use
+`get_read_db`, which routes to a replica when one is configured and
+caught up, and falls back to the primary otherwise.
 """
-from sqlalchemy import create_engine
+import itertools
+import logging
+import threading
+import time
+from typing import Optional
+
+from fastapi import Depends, Header
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 from .config import settings
 
+logger = logging.getLogger(__name__)
+
 # Database URL from environment variables
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets check-ins commit while readers (sync, dashboard) hold snapshots
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+def make_engine(url: str, **kwargs):
+    """Engine for `url`; SQLite (edge mode) gets WAL and cross-thread connections."""
+    if url.startswith("sqlite"):
+        kwargs.setdefault("connect_args", {"check_same_thread": False})
+        sqlite_engine = create_engine(url, **kwargs)
+        event.listen(sqlite_engine, "connect", _sqlite_pragmas)
+        return sqlite_engine
+    return create_engine(url, **kwargs)
+
 # Create engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -21,6 +51,86 @@ Base = declarative_base()
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def replica_lag(conn) -> float:
+    """Seconds the replica behind `conn` trails its primary."""
+    if conn.dialect.name != "postgresql":
+        return 0.0
+    lag = conn.execute(text(
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    )).scalar()
+    return float(lag or 0.0)
+
+class ReplicaRouter:
+    """Round-robins reads over replicas that are within the allowed lag."""
+
+    def __init__(self, engines, max_lag: float, check_interval: float):
+        self.engines = engines
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._cycle = itertools.cycle(engines)
+        self._lock = threading.Lock()
+        self._lag = {}  # engine -> (checked_at, lag)
+
+    def lag(self, replica) -> float:
+        """Replica lag, measured at most once per `check_interval`."""
+        now = time.monotonic()
+        checked_at, lag = self._lag.get(replica, (None, None))
+        if checked_at is not None and now - checked_at < self.check_interval:
+            return lag
+        try:
+            with replica.connect() as conn:
+                lag = replica_lag(conn)
+        except Exception as e:
+            logger.warning("Replica %s unavailable: %s", replica.url.host, e)
+            lag = float("inf")
+        self._lag[replica] = (now, lag)
+        return lag
+
+    def pick(self):
+        """Return a usable replica engine, or None to use the primary."""
+        for _ in range(len(self.engines)):
+            with self._lock:
+                replica = next(self._cycle)
+            if self.lag(replica) <= self.max_lag:
+                return replica
+        return None
+
+replica_engines = [
+    create_engine(url.strip())
+    for url in settings.DATABASE_REPLICA_URLS.split(",")
+    if url.strip()
+]
+replica_router = ReplicaRouter(
+    replica_engines,
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.REPLICA_LAG_CHECK_INTERVAL,
+)
+
+# Dependency to get a DB session for read-only queries
+def get_read_db(
+    primary: Session = Depends(get_db),
+    x_read_your_writes: Optional[str] = Header(None)
+):
+    """
+    Yield a session on a caught-up replica, or the primary session.
+
+    Clients that must see their own recent writes send
+    `X-Read-Your-Writes: 1` to pin the read to the primary.
+    """
+    replica = None
+    if replica_engines and not x_read_your_writes:
+        replica = replica_router.pick()
+    if replica is None:
+        yield primary
+        return
+
+    db = SessionLocal(bind=replica)
     try:
         yield db
     finally:
@@ -0,0 +1,228 @@
+"""
+Edge mode: a classroom node that takes check-ins on local SQLite and syncs
+them to the central API in the background.
+
+The node pulls the roster from upstream (so unknown students are still
+rejected locally) and pushes its sessions and attendance rows in batches.
+Progress is kept as watermarks in `sync_state`, advanced only after
+upstream accepted a batch; a push that is interrupted is simply repeated,
+and the central merge on (session_id, student_id) makes that harmless.
+Check-ins upstream could not place (a student it has not seen yet) stay
+pending and are sent again after the next roster pull.
+"""
+import json
+import logging
+import socket
+import threading
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from . import crud, models, schemas
+from .bitmap_index import session_bitmap_index
+from .live import live_feed
+from .roster import roster_filter
+
+logger = logging.getLogger(__name__)
+
+# Central side
+
+def merge_batch(db: Session, batch: schemas.EdgeSyncBatch) -> schemas.EdgeSyncResult:
+    """Merge one edge push. Safe to repeat: known sessions are updated, known check-ins skipped."""
+    sessions = crud.upsert_origin_sessions(db, batch.node_id, [s.model_dump() for s in batch.sessions])
+    unmapped = {a.session_id for a in batch.attendance} - sessions.keys()
+    if unmapped:
+        sessions.update(crud.get_origin_session_ids(db, batch.node_id, unmapped))
+    students = crud.get_existing_student_ids(db, {a.student_id for a in batch.attendance})
+
+    rows, skipped = [], []
+    for a in batch.attendance:
+        if a.session_id not in sessions or a.student_id not in students:
+            skipped.append(a)
+            continue
+        rows.append({
+            "student_id": a.student_id,
+            "session_id": sessions[a.session_id],
+            "device_id": a.device_id,
+            "timestamp": a.timestamp,
+        })
+    merged = crud.insert_ignoring_duplicates(db, models.Attendance, rows, ["session_id", "student_id"])
+    db.commit()
+
+    # Same follow-up as local check-ins and stops
+    touched = {row["session_id"] for row in rows} | {sessions[s.id] for s in batch.sessions}
+    for session_id in touched:
+        session = crud.get_beacon_session(db, session_id)
+        if session is not None and not session.is_active:
+            # Late rows for a closed session: refreeze its bitmap
+            session_bitmap_index.close(db, session_id)
+        live_feed.notify(session_id)
+
+    return schemas.EdgeSyncResult(
+        sessions={s.id: sessions[s.id] for s in batch.sessions},
+        attendance_merged=merged,
+        attendance_skipped=len(skipped),
+        attendance_skipped_ids=[a.id for a in skipped if a.id is not None],
+    )
+
+def roster_page(db: Session, after: int, limit: int) -> schemas.RosterPage:
+    """Students with an ordinal above `after`, for edge nodes mirroring the roster."""
+    crud.assign_missing_student_ordinals(db)
+    page = crud.get_students_after_ordinal(db, after, limit)
+    return schemas.RosterPage(
+        students=[schemas.StudentBase.model_validate(student, from_attributes=True) for _, student in page],
+        next_after=page[-1][0] if page else after,
+    )
+
+# Upstreams
+
+class HttpUpstream:
+    """The central API over HTTP."""
+
+    def __init__(self, base_url: str, token: str, timeout: float = 10.0):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, body: Optional[dict] = None) -> dict:
+        import urllib.request  # Only edge nodes need it
+
+        request = urllib.request.Request(
+            f"{self.base_url}{path}",
+            data=json.dumps(body).encode() if body is not None else None,
+            method=method,
+            headers={"Authorization": f"Bearer {self.token}", "Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def push(self, batch: dict) -> dict:
+        return self._request("POST", "/sync/push", batch)
+
+    def students(self, after: int, limit: int) -> dict:
+        return self._request("GET", f"/sync/students?after={after}&limit={limit}")
+
+class LocalUpstream:
+    """Stand-in for the central API that merges straight into another database."""
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+
+    def push(self, batch: dict) -> dict:
+        with self.session_factory() as db:
+            return merge_batch(db, schemas.EdgeSyncBatch.model_validate(batch)).model_dump(mode="json")
+
+    def students(self, after: int, limit: int) -> dict:
+        with self.session_factory() as db:
+            return roster_page(db, after, limit).model_dump(mode="json")
+
+# Edge side
+
+def _utc_row(row: dict) -> dict:
+    # SQLite returns naive datetimes; upstream must not guess their zone
+    return {key: crud.as_utc(value) if key in ("created_at", "ended_at", "expires_at", "timestamp") else value
+            for key, value in row.items()}
+
+class EdgeSyncer:
+    """Pulls the roster from and pushes check-ins to an upstream, every `interval` seconds."""
+
+    def __init__(self, session_factory: Callable[[], Session], upstream, node_id: str = "",
+                 batch_size: int = 500, interval: float = 5.0):
+        self.session_factory = session_factory
+        self.upstream = upstream
+        self.node_id = node_id or socket.gethostname()
+        self.batch_size = batch_size
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def pull_students(self) -> int:
+        """Copy students added upstream since the last pull; returns how many were new."""
+        total = 0
+        with self.session_factory() as db:
+            after = int(crud.get_sync_state(db, "students_after", "0"))
+            while True:
+                page = self.upstream.students(after, self.batch_size)
+                students = page["students"]
+                # No conflict target: an email already taken locally must not wedge every later pull
+                total += crud.insert_ignoring_duplicates(db, models.Student, students)
+                present = crud.get_existing_student_ids(db, {student["id"] for student in students})
+                missing = [student["id"] for student in students if student["id"] not in present]
+                if missing:
+                    logger.warning("Edge roster: skipped %s students whose email is already used locally: %s",
+                                   len(missing), ", ".join(missing))
+                after = page["next_after"]
+                crud.set_sync_state(db, {"students_after": str(after)})
+                roster_filter.add(present)
+                if len(students) < self.batch_size:
+                    return total
+
+    def push(self) -> int:
+        """Push new check-ins and session changes; returns how many check-ins were sent."""
+        total = 0
+        with self.session_factory() as db:
+            attendance_after = int(crud.get_sync_state(db, "attendance_after", "0"))
+            sessions_after = int(crud.get_sync_state(db, "sessions_after", "0"))
+            open_sessions = json.loads(crud.get_sync_state(db, "open_sessions", "[]"))
+            # Rows skipped by earlier pushes get one retry per push, riding along with the first batch
+            retry = json.loads(crud.get_sync_state(db, "pending_attendance", "[]"))
+            pending = []
+            while True:
+                # Attendance first: every session it references then exists in the session read
+                retried = crud.get_attendance_rows_by_id(db, retry) if retry else []
+                retry = []
+                attendance = crud.get_attendance_rows_after(db, attendance_after, self.batch_size)
+                sessions = crud.get_beacon_session_rows_for_sync(db, sessions_after, open_sessions)
+                batch = schemas.EdgeSyncBatch(
+                    node_id=self.node_id,
+                    sessions=[_utc_row(row) for row in sessions],
+                    attendance=[_utc_row(row) for row in retried + attendance],
+                )
+                result = self.upstream.push(batch.model_dump(mode="json"))
+                skipped = result.get("attendance_skipped_ids", [])
+                if skipped:
+                    logger.warning("Edge sync: upstream skipped %s check-ins; retrying after the next roster pull",
+                                   len(skipped))
+                pending.extend(skipped)
+
+                if attendance:
+                    attendance_after = attendance[-1]["id"]
+                if sessions:
+                    sessions_after = max(sessions_after, sessions[-1]["id"])
+                # Sessions still running must be sent again until upstream has seen them end
+                open_sessions = [row["id"] for row in sessions if row["is_active"]]
+                crud.set_sync_state(db, {
+                    "attendance_after": str(attendance_after),
+                    "sessions_after": str(sessions_after),
+                    "open_sessions": json.dumps(open_sessions),
+                    "pending_attendance": json.dumps(sorted(set(pending))),
+                })
+                total += len(retried) + len(attendance)
+                if len(attendance) < self.batch_size:
+                    return total
+
+    def sync_once(self):
+        return self.pull_students(), self.push()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                pulled, pushed = self.sync_once()
+                if pulled or pushed:
+                    logger.info("Edge sync: %s students pulled, %s check-ins pushed", pulled, pushed)
+            except Exception as e:
+                # Upstream unreachable: keep taking check-ins locally and retry next tick
+                logger.error("Edge sync failed: %s", e)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="edge-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
\ No newline at end of file
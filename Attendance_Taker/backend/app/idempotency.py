@@ -0,0 +1,200 @@
+"""
+Idempotency keys for check-in and session-control requests.
+
+A request carrying an `Idempotency-Key` header runs once; retries with the
+same key get the stored response back without repeating the database work.
+With a single worker (COORDINATOR_BACKEND=local) keys live in a bounded,
+per-process LRU with a TTL. With several workers (COORDINATOR_BACKEND=database)
+a retry may land on a different worker, so keys are claimed in the shared
+`idempotency_keys` table instead: the primary key lets exactly one worker run
+the request, and the others poll the row until its response is stored.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from . import crud
+from .config import settings
+
+def _fingerprint(payload) -> str:
+    return json.dumps(payload, sort_keys=True, default=str)
+
+def _replay(response: Response, status_code: int, body):
+    """Hand back a stored outcome, marked as a replay."""
+    if status_code >= 400:
+        # The injected response is discarded when raising, so the header goes on the error
+        raise HTTPException(status_code=status_code, detail=body, headers={"Idempotent-Replayed": "true"})
+    response.headers["Idempotent-Replayed"] = "true"
+    return body
+
+class _Entry:
+    __slots__ = ("fingerprint", "created_at", "done", "status_code", "body")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.created_at = time.monotonic()
+        self.done = threading.Event()
+        self.status_code = None
+        self.body = None
+
+class IdempotencyStore:
+    """Bounded LRU of idempotency key -> stored response."""
+
+    def __init__(self, max_keys: int, ttl: float, wait_timeout: float):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _claim(self, key: tuple, fingerprint: str):
+        """Return (entry, True) if the caller should run the request, else the existing entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created_at > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                if entry.fingerprint != fingerprint:
+                    raise HTTPException(status_code=422, detail="Idempotency-Key was reused with a different request")
+                self._entries.move_to_end(key)
+                return entry, False
+
+            entry = self._entries[key] = _Entry(fingerprint)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+            return entry, True
+
+    def _abandon(self, key: tuple, entry: _Entry):
+        """Forget a request that failed on our side, so a retry runs it again."""
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def run(self, key: tuple, payload, response: Response, fn: Callable[[], BaseModel]):
+        """Run `fn` once per key; replay its stored outcome for retries."""
+        fingerprint = _fingerprint(payload)
+        while True:
+            entry, owner = self._claim(key, fingerprint)
+            if owner:
+                break
+            # A concurrent duplicate: wait for the original to finish
+            if not entry.done.wait(self.wait_timeout):
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+            if entry.status_code is not None:
+                return _replay(response, entry.status_code, entry.body)
+
+        try:
+            result = fn()
+        except HTTPException as e:
+            if e.status_code >= 500:
+                self._abandon(key, entry)
+                raise
+            entry.status_code, entry.body = e.status_code, e.detail
+            entry.done.set()
+            raise
+        except BaseException:
+            self._abandon(key, entry)
+            raise
+
+        entry.status_code, entry.body = 200, result.model_dump(mode="json")
+        entry.done.set()
+        return result
+
+class DatabaseIdempotencyStore:
+    """Idempotency keys in the shared database, so retries dedupe across workers."""
+
+    def __init__(self, ttl: float, wait_timeout: float, poll_interval: float = 0.05):
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+
+    def purge(self, db: Session) -> int:
+        """Delete expired keys; run periodically by the scheduler."""
+        return crud.delete_idempotency_keys(db, time.time() - self.ttl)
+
+    def _wait_for_claim(self, db: Session, scope: str, key: str, fingerprint: str):
+        """Claim the key, or return the stored (status_code, body) of the original request."""
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            now = time.time()
+            if crud.claim_idempotency_key(db, scope, key, fingerprint, now):
+                return None
+            row = crud.get_idempotency_key(db, scope, key)
+            if row is None:
+                # Abandoned between our claim and read: try again
+                continue
+            if now - row.created_at > self.ttl:
+                crud.delete_idempotency_keys(db, now - self.ttl, scope, key)
+                continue
+            if row.fingerprint != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was reused with a different request")
+            if row.status_code is not None:
+                return row.status_code, json.loads(row.body)
+            # A concurrent duplicate, possibly on another worker: wait for the original to finish
+            if time.monotonic() >= deadline:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+            db.rollback()
+            time.sleep(self.poll_interval)
+
+    def _abandon(self, db: Session, scope: str, key: str):
+        """Forget a request that failed on our side, so a retry runs it again."""
+        db.rollback()
+        crud.delete_idempotency_keys(db, float("inf"), scope, key)
+
+    def run(self, db: Session, key: tuple, payload, response: Response, fn: Callable[[], BaseModel]):
+        """Run `fn` once per key across all workers; replay its stored outcome for retries."""
+        scope, key = key
+        stored = self._wait_for_claim(db, scope, key, _fingerprint(payload))
+        if stored is not None:
+            return _replay(response, *stored)
+
+        try:
+            result = fn()
+        except HTTPException as e:
+            if e.status_code >= 500:
+                self._abandon(db, scope, key)
+                raise
+            db.rollback()
+            crud.finish_idempotency_key(db, scope, key, e.status_code, json.dumps(e.detail, default=str))
+            raise
+        except BaseException:
+            self._abandon(db, scope, key)
+            raise
+
+        crud.finish_idempotency_key(db, scope, key, 200, json.dumps(result.model_dump(mode="json")))
+        return result
+
+idempotency_store = IdempotencyStore(
+    max_keys=settings.IDEMPOTENCY_MAX_KEYS,
+    ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+    wait_timeout=settings.IDEMPOTENCY_WAIT_SECONDS,
+)
+
+shared_idempotency_store = DatabaseIdempotencyStore(
+    ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+    wait_timeout=settings.IDEMPOTENCY_WAIT_SECONDS,
+)
+
+def idempotent(key: Optional[str], scope: str, payload, response: Response, fn: Callable[[], BaseModel],
+               db: Optional[Session] = None):
+    """Run a route body under an optional idempotency key.
+
+    Pass the request's `db` so that, with several workers, keys are shared
+    through the database.
+    """
+    if key is None:
+        return fn()
+    if db is not None and settings.COORDINATOR_BACKEND == "database":
+        return shared_idempotency_store.run(db, (scope, key), payload, response, fn)
+    return idempotency_store.run((scope, key), payload, response, fn)
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""
+Live check-in stream for a running session, as Server-Sent Events.
+
+`mark_attendance` notifies the feed after each commit; every open stream
+wakes up, waits a short coalescing window so a burst of check-ins becomes
+one event, then reads only the rows newer than what it already sent.
+Notifications are per process: check-ins committed by another worker are
+picked up at the next heartbeat. Each read also covers a window of IDs
+below the newest one sent, since a row can commit after one with a higher
+ID; rows already sent are filtered out by ID.
+
+Streams are async generators that idle on the event loop, so open
+dashboards hold no worker thread; each database read borrows one from the
+threadpool only while it runs.
+"""
+import asyncio
+import json
+import threading
+from typing import AsyncIterator, Callable, Dict, List, Set, Tuple
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import crud, models
+from .config import settings
+
+# IDs below the newest sent check-in read again, for rows that committed late
+REREAD_WINDOW_IDS = 100
+
+class LiveFeed:
+    """Per-session change counters that streams can await."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[int, int] = {}
+        self._waiters: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+
+    def version(self, session_id: int) -> int:
+        with self._lock:
+            return self._versions.get(session_id, 0)
+
+    def notify(self, session_id: int):
+        """Bump the session's version and wake its streams; safe to call from any thread."""
+        with self._lock:
+            self._versions[session_id] = self._versions.get(session_id, 0) + 1
+            waiters = list(self._waiters.get(session_id, ()))
+        for loop, changed in waiters:
+            try:
+                loop.call_soon_threadsafe(changed.set)
+            except RuntimeError:
+                # The stream's loop has shut down; its waiter is about to go away
+                pass
+
+    async def wait(self, session_id: int, version: int, timeout: float) -> bool:
+        """Wait until the session changes past `version`; False on timeout."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            if self._versions.get(session_id, 0) != version:
+                return True
+            self._waiters.setdefault(session_id, set()).add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(session_id, set())
+                waiters.discard(waiter)
+                if not waiters:
+                    self._waiters.pop(session_id, None)
+
+live_feed = LiveFeed()
+
+def _event(name: str, data: dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _is_open(db: Session, session_id: int) -> bool:
+    session = crud.get_beacon_session(db, session_id)
+    return session is not None and crud.is_session_open(session)
+
+def _read_snapshot(session_factory: Callable[[], Session], session_id: int) -> Tuple[int, int, Set[int], bool]:
+    """(count, newest ID, IDs within the re-read window, open?); the count covers exactly those IDs and below."""
+    with session_factory() as db:
+        _, newest = crud.get_session_attendance_summary(db, session_id)
+        floor = newest - REREAD_WINDOW_IDS
+        below = crud.count_attendance(db, crud.attendance_filters(session_id=session_id) + [models.Attendance.id <= floor])
+        recent = {row.id for row in crud.get_attendance_since(db, session_id, floor)}
+        return below + len(recent), max(recent, default=newest), recent, _is_open(db, session_id)
+
+def _read_since(
+    session_factory: Callable[[], Session], session_id: int, last_id: int
+) -> Tuple[List[models.Attendance], bool]:
+    with session_factory() as db:
+        return crud.get_attendance_since(db, session_id, last_id), _is_open(db, session_id)
+
+async def session_events(
+    session_factory: Callable[[], Session],
+    session_id: int,
+    coalesce: float = settings.LIVE_COALESCE_SECONDS,
+    heartbeat: float = settings.LIVE_HEARTBEAT_SECONDS,
+) -> AsyncIterator[str]:
+    """
+    SSE stream: a `snapshot` with the current count, one `checkin` event per
+    burst with the new students and running count, and `end` once the
+    session is stopped. Database sessions are opened per wake-up, so an idle
+    stream holds no connection.
+    """
+    version = live_feed.version(session_id)
+    count, last_id, sent, active = await run_in_threadpool(_read_snapshot, session_factory, session_id)
+    yield _event("snapshot", {"session_id": session_id, "count": count})
+
+    while active:
+        woken = await live_feed.wait(session_id, version, heartbeat)
+        if woken and coalesce:
+            await asyncio.sleep(coalesce)
+        version = live_feed.version(session_id)
+
+        rows, active = await run_in_threadpool(_read_since, session_factory, session_id, last_id - REREAD_WINDOW_IDS)
+        rows = [row for row in rows if row.id not in sent]
+        if rows:
+            count += len(rows)
+            last_id = max(last_id, rows[-1].id)
+            sent.update(row.id for row in rows)
+            sent = {attendance_id for attendance_id in sent if attendance_id > last_id - REREAD_WINDOW_IDS}
+            yield _event("checkin", {
+                "session_id": session_id,
+                "count": count,
+                "checkins": [{"student_id": row.student_id, "timestamp": row.timestamp} for row in rows],
+            })
+        if not rows and active:
+            # Keeps proxies from closing an idle stream
+            yield ": keepalive\n\n"
+
+    yield _event("end", {"session_id": session_id, "count": count})
\ No newline at end of file
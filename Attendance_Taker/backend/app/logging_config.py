@@ -0,0 +1,171 @@
+"""
+Logging pipeline for the API.
+
+Request threads only put records on a bounded queue; a listener thread
+formats them (JSON by default) and writes them out, so slow stderr or a
+slow log collector never holds up a request. Every record carries the ID
+of the request it was logged in, taken from X-Request-ID or generated.
+
+High-volume loggers can be sampled by name, e.g.
+LOG_SAMPLING="attendance.checkins=0.1" keeps one in ten accepted
+check-ins. Sampling applies to the named logger and its children, never
+drops WARNING and above, and is decided before the record is queued.
+
+uvicorn's own loggers (including the per-request access log) are stripped
+of the handlers uvicorn gives them and propagate to the root logger, so
+they go through the same queue and format.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Callable, Dict
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Caller-supplied request IDs are echoed into logs and headers, so keep them tame
+VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+# Configured by uvicorn with their own stream handlers and propagate=False
+SERVER_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """"name=rate,name=rate" -> {name: rate}, rates clamped to 0..1."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the records below WARNING from sampled loggers."""
+
+    def __init__(self, rates: Dict[str, float], rng: Callable[[], float] = random.random):
+        super().__init__()
+        self.rates = rates
+        self.rng = rng
+        self._resolved = {}
+
+    def rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            # Nearest configured ancestor wins, as with logger levels
+            rate, probe = 1.0, name
+            while probe:
+                if probe in self.rates:
+                    rate = self.rates[probe]
+                    break
+                probe = probe.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate(record.name)
+        return rate >= 1.0 or self.rng() < rate
+
+class RequestQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records unformatted, stamped with the current request ID.
+
+    A full queue drops the record and counts it in `dropped` rather than
+    blocking the request.
+    """
+
+    def __init__(self, record_queue: queue.Queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The message is built on the listener thread; only the context must be captured here
+        record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging(level: str = "INFO", fmt: str = "json", sampling: str = "",
+                      queue_size: int = 10000, stream=None) -> logging.handlers.QueueListener:
+    """Route the root logger through a queue to a listener thread; returns the started listener."""
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    handler = RequestQueueHandler(queue.Queue(queue_size))
+    rates = parse_sampling(sampling)
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    # Replace the pipeline of an earlier call rather than logging everything twice
+    for existing in [h for h in root.handlers if isinstance(h, RequestQueueHandler)]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name in SERVER_LOGGERS:
+        server_logger = logging.getLogger(name)
+        server_logger.handlers.clear()
+        server_logger.propagate = True
+
+    listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    listener.start()
+    return listener
+
+class RequestIdMiddleware:
+    """ASGI middleware: runs each request under an ID and returns it as X-Request-ID."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if VALID_REQUEST_ID.fullmatch(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex
+        header = (b"x-request-id", request_id.encode())
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), header]
+            await send(message)
+
+        # Sync routes run in the threadpool with a copy of this context, so they see the ID too
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
\ No newline at end of file
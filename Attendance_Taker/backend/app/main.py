@@ -2,25 +2,61 @@
 Main FastAPI application entry point.
 Sets up the API routes and middleware.
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 
 from .api import router as api_router
-from .database import engine, Base
+from .database import engine, SessionLocal
 from .config import settings
+from . import migrations
+from .roster import roster_filter
+from .scheduler import SessionExpiryScheduler
+from .edge import EdgeSyncer, HttpUpstream
+from .reports import report_runner
+from .logging_config import RequestIdMiddleware, configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepare the database and background jobs on startup rather than at import time."""
+    # Queue-based logging first, so startup messages already go through it
+    log_listener = configure_logging(
+        settings.LOG_LEVEL, settings.LOG_FORMAT, settings.LOG_SAMPLING, settings.LOG_QUEUE_SIZE
+    )
+    if settings.AUTO_MIGRATE:
+        migrations.upgrade(engine)
+    with SessionLocal() as db:
+        # Jobs whose worker died never finish; the scheduler repeats this every tick
+        report_runner.clean_up(db)
+    if settings.ROSTER_FILTER_MODE != "off":
+        with SessionLocal() as db:
+            roster_filter.load(db)
+    expiry_scheduler = SessionExpiryScheduler(SessionLocal, settings.SESSION_EXPIRY_CHECK_SECONDS)
+    expiry_scheduler.start()
+    syncer = None
+    if settings.EDGE_MODE:
+        upstream = HttpUpstream(settings.EDGE_UPSTREAM_URL, settings.EDGE_UPSTREAM_TOKEN)
+        syncer = EdgeSyncer(
+            SessionLocal, upstream, settings.EDGE_NODE_ID,
+            batch_size=settings.EDGE_SYNC_BATCH, interval=settings.EDGE_SYNC_INTERVAL
+        )
+        syncer.start()
+    yield
+    if syncer:
+        syncer.stop()
+    expiry_scheduler.stop()
+    report_runner.shutdown()
+    # Flushes whatever is still queued
+    log_listener.stop()
 
 app = FastAPI(
     title="Attendance System API",
     description="API for Bluetooth-based attendance system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -30,8 +66,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Request IDs for log records and responses
+app.add_middleware(RequestIdMiddleware)
+
 # Include API routes
 app.include_router(api_router, prefix="/api/v1")
 
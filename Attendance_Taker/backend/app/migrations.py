@@ -0,0 +1,143 @@
+"""
+Versioned schema migrations.
+
+Applied versions are recorded in `schema_migrations`, so each step runs once
+per database. Run `python -m backend.app.migrations` before deploying, or
+leave AUTO_MIGRATE on to upgrade from the app's lifespan hook.
+"""
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from . import models
+from .database import Base
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for the Postgres advisory lock held while migrating
+MIGRATION_LOCK_KEY = 727001
+
+MIGRATIONS = []
+
+def migration(version: int, description: str):
+    """Register a migration step. Steps must be safe on a fresh database."""
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda step: step[0])
+        return fn
+    return register
+
+@migration(1, "initial schema")
+def _initial_schema(conn: Connection):
+    # Creates every table missing from the database in its current shape;
+    # later steps only need to bring older databases up to date.
+    Base.metadata.create_all(bind=conn)
+
+@migration(2, "student ordinals and session bitmaps")
+def _session_bitmaps(conn: Connection):
+    Base.metadata.create_all(
+        bind=conn,
+        tables=[models.StudentOrdinal.__table__, models.SessionBitmap.__table__]
+    )
+    # Give every known student an ordinal; closed sessions' bitmaps are built on demand
+    conn.execute(text(
+        "INSERT INTO student_ordinals (student_id) "
+        "SELECT id FROM students WHERE id NOT IN (SELECT student_id FROM student_ordinals) "
+        "ORDER BY created_at, id"
+    ))
+
+@migration(3, "session expiry and partial index on active sessions")
+def _session_expiry(conn: Connection):
+    table = models.BeaconSession.__table__
+    if not has_column(conn, "beacon_sessions", "expires_at"):
+        column_type = table.c.expires_at.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE beacon_sessions ADD COLUMN expires_at {column_type}"))
+    for index in table.indexes:
+        if index.name == "ix_beacon_sessions_active" and not has_index(conn, "beacon_sessions", index.name):
+            index.create(bind=conn)
+
+@migration(4, "edge sync: session origins, unique check-ins, sync state")
+def _edge_sync(conn: Connection):
+    for column in ("origin", "origin_session_id"):
+        if not has_column(conn, "beacon_sessions", column):
+            column_type = models.BeaconSession.__table__.c[column].type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE beacon_sessions ADD COLUMN {column} {column_type}"))
+    if not has_index(conn, "attendance", "uq_attendance_session_student"):
+        # Racing check-ins could have slipped duplicates in; keep the earliest
+        conn.execute(text(
+            "DELETE FROM attendance WHERE id NOT IN "
+            "(SELECT MIN(id) FROM attendance GROUP BY session_id, student_id)"
+        ))
+    for table in (models.BeaconSession.__table__, models.Attendance.__table__):
+        for index in table.indexes:
+            if not has_index(conn, table.name, index.name):
+                index.create(bind=conn)
+    Base.metadata.create_all(bind=conn, tables=[models.SyncState.__table__])
+
+@migration(5, "report jobs")
+def _report_jobs(conn: Connection):
+    Base.metadata.create_all(bind=conn, tables=[models.ReportJob.__table__])
+
+@migration(6, "indexes for attendance history, date ranges and report scopes")
+def _query_indexes(conn: Connection):
+    for table in (models.BeaconSession.__table__, models.Attendance.__table__):
+        for index in table.indexes:
+            if not has_index(conn, table.name, index.name):
+                index.create(bind=conn)
+
+@migration(7, "report job heartbeats")
+def _report_job_heartbeats(conn: Connection):
+    if not has_column(conn, "report_jobs", "updated_at"):
+        column_type = models.ReportJob.__table__.c.updated_at.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE report_jobs ADD COLUMN updated_at {column_type}"))
+
+@migration(8, "shared idempotency keys")
+def _idempotency_keys(conn: Connection):
+    Base.metadata.create_all(bind=conn, tables=[models.IdempotencyKey.__table__])
+
+def _ensure_version_table(conn: Connection):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR NOT NULL, "
+        "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    ))
+
+def applied_versions(conn: Connection):
+    _ensure_version_table(conn)
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+def upgrade(engine: Engine):
+    """Apply all pending migrations in one transaction. Returns the versions applied."""
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Workers starting together must not migrate concurrently
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+        done = applied_versions(conn)
+        applied = []
+        for version, description, fn in MIGRATIONS:
+            if version in done:
+                continue
+            logger.info("Applying migration %s: %s", version, description)
+            fn(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+                {"version": version, "description": description}
+            )
+            applied.append(version)
+    return applied
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    return column in {c["name"] for c in inspect(conn).get_columns(table)}
+
+def has_index(conn: Connection, table: str, index: str) -> bool:
+    return index in {i["name"] for i in inspect(conn).get_indexes(table)}
+
+if __name__ == "__main__":
+    from .database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    versions = upgrade(engine)
+    print(f"Applied migrations: {versions}" if versions else "Database is up to date")
\ No newline at end of file
@@ -1,9 +1,10 @@
 """
 SQLAlchemy models for the attendance system.
 """
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Float, LargeBinary, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from datetime import datetime, timezone
 from .database import Base
 
 class Student(Base):
@@ -26,9 +27,24 @@ class BeaconSession(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     ended_at = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True)  # Closed automatically after this
+    origin = Column(String, nullable=True)  # Edge node that created it, if synced from one
+    origin_session_id = Column(Integer, nullable=True)  # Its ID on that node
     
     # Relationships
     attendance = relationship("Attendance", back_populates="session")
+    
+    __table_args__ = (
+        # Only live sessions are indexed, so "what is active now" stays a tiny lookup
+        Index(
+            "ix_beacon_sessions_active", "expires_at",
+            postgresql_where=text("is_active"),
+            sqlite_where=text("is_active = 1")
+        ),
+        Index("ix_beacon_sessions_origin", "origin", "origin_session_id", unique=True),
+        # Reports scope sessions by date
+        Index("ix_beacon_sessions_created_at", "created_at"),
+    )
 
 class Attendance(Base):
     __tablename__ = "attendance"
@@ -37,8 +53,77 @@ class Attendance(Base):
     student_id = Column(String, ForeignKey("students.id"), nullable=False)
     session_id = Column(Integer, ForeignKey("beacon_sessions.id"), nullable=False)
     device_id = Column(String, nullable=False)  # MAC address or hostname
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    # Also set client-side: SQLite's CURRENT_TIMESTAMP drops the fractional seconds bound
+    # values carry, and the mixed text forms would break range and keyset comparisons
+    timestamp = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
     
     # Relationships
     student = relationship("Student", back_populates="attendance")
-    session = relationship("BeaconSession", back_populates="attendance")
\ No newline at end of file
+    session = relationship("BeaconSession", back_populates="attendance")
+    
+    __table_args__ = (
+        # One check-in per student per session; also what edge sync merges on
+        Index("uq_attendance_session_student", "session_id", "student_id", unique=True),
+        # A student's history, optionally within a date range; also per-student report totals
+        Index("ix_attendance_student_timestamp", "student_id", "timestamp"),
+        # Date-range listings across all sessions
+        Index("ix_attendance_timestamp", "timestamp"),
+    )
+
+class BeaconLease(Base):
+    """Ownership of a session's beacon emitter, shared by all workers."""
+    __tablename__ = "beacon_leases"
+    
+    session_id = Column(Integer, ForeignKey("beacon_sessions.id"), primary_key=True)
+    owner = Column(String, nullable=False)  # Token of the claiming emitter
+    expires_at = Column(Float, nullable=False)  # Unix time
+
+class StudentOrdinal(Base):
+    """Dense integer ordinal per student, used as the bit position in bitmaps."""
+    __tablename__ = "student_ordinals"
+    
+    ordinal = Column(Integer, primary_key=True)
+    student_id = Column(String, ForeignKey("students.id"), unique=True, nullable=False)
+
+class SessionBitmap(Base):
+    """Compressed bitmap of the ordinals of a closed session's attendees."""
+    __tablename__ = "session_bitmaps"
+    
+    session_id = Column(Integer, ForeignKey("beacon_sessions.id"), primary_key=True)
+    bitmap = Column(LargeBinary, nullable=False)
+    cardinality = Column(Integer, nullable=False)
+    last_attendance_id = Column(Integer, nullable=False)  # Newest row included
+
+class SyncState(Base):
+    """Edge-mode sync watermarks, so an interrupted sync resumes where it stopped."""
+    __tablename__ = "sync_state"
+    
+    name = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+
+class ReportJob(Base):
+    """A report generated in the background; status is shared by all workers."""
+    __tablename__ = "report_jobs"
+    
+    id = Column(String, primary_key=True)  # uuid4 hex
+    kind = Column(String, nullable=False)
+    format = Column(String, nullable=False)
+    params = Column(String, nullable=False)  # JSON
+    status = Column(String, nullable=False, default="queued")  # queued, running, done, failed, expired
+    progress = Column(Float, nullable=False, default=0.0)  # 0..1
+    error = Column(String, nullable=True)
+    artifact_path = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)  # Last status or progress change
+
+class IdempotencyKey(Base):
+    """A request run under an Idempotency-Key, shared by all workers."""
+    __tablename__ = "idempotency_keys"
+    
+    scope = Column(String, primary_key=True)  # Route name
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)  # The request payload, as JSON
+    created_at = Column(Float, nullable=False)  # Unix time
+    status_code = Column(Integer, nullable=True)  # None while the original is still running
+    body = Column(String, nullable=True)  # Stored response, as JSON
\ No newline at end of file
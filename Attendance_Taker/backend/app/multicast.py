@@ -0,0 +1,82 @@
+"""
+LAN session announcements, the fallback beacon when BLE is unavailable.
+
+The emitter multicasts a small signed datagram for the running session on
+the classroom subnet; student clients listening on the group discover the
+session without asking the backend. Packet layout (big-endian):
+
+    magic "ATTN" | version (1) | session ID (4) | issued at, Unix ms (8) | HMAC-SHA256 tag (16)
+
+The tag covers everything before it. The key is shared with the student
+clients, so it keeps out forged announcements from devices that were never
+given it; announcements older than `max_age` are dropped so captured
+packets cannot be replayed later. The client carries its own copy of the
+codec in client/multicast.py.
+"""
+import hashlib
+import hmac
+import ipaddress
+import socket
+import struct
+import time
+from typing import Optional
+
+MAGIC = b"ATTN"
+VERSION = 1
+HEADER = struct.Struct(">4sBIQ")
+TAG_BYTES = 16
+PACKET_BYTES = HEADER.size + TAG_BYTES
+
+def _tag(key: bytes, header: bytes) -> bytes:
+    return hmac.new(key, header, hashlib.sha256).digest()[:TAG_BYTES]
+
+def encode_announcement(session_id: int, key: bytes, now: Optional[float] = None) -> bytes:
+    issued_at = int((time.time() if now is None else now) * 1000)
+    header = HEADER.pack(MAGIC, VERSION, session_id, issued_at)
+    return header + _tag(key, header)
+
+def decode_announcement(packet: bytes, key: bytes, max_age: float, now: Optional[float] = None) -> Optional[int]:
+    """Session ID of a valid, fresh announcement; None for anything else."""
+    if len(packet) != PACKET_BYTES:
+        return None
+    header, tag = packet[:HEADER.size], packet[HEADER.size:]
+    magic, version, session_id, issued_at = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        return None
+    if not hmac.compare_digest(tag, _tag(key, header)):
+        return None
+    age = (time.time() if now is None else now) - issued_at / 1000
+    # Allow the same skew the other way, for clocks slightly ahead of ours
+    if abs(age) > max_age:
+        return None
+    return session_id
+
+class MulticastAnnouncer:
+    """Sends session announcements to `group`:`port`; the socket is opened on first use."""
+
+    def __init__(self, group: str, port: int, key: str, ttl: int = 1, interface: str = ""):
+        self.address = (group, port)
+        self.key = key.encode()
+        self.ttl = ttl
+        self.interface = interface
+        self._sock = None
+
+    def _socket(self) -> socket.socket:
+        if self._sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            if ipaddress.ip_address(self.address[0]).is_multicast:
+                # TTL 1: announcements never leave the classroom subnet
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.ttl)
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+                if self.interface:
+                    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(self.interface))
+            self._sock = sock
+        return self._sock
+
+    def announce(self, session_id: int):
+        self._socket().sendto(encode_announcement(session_id, self.key), self.address)
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
\ No newline at end of file
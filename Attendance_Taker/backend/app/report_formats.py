@@ -0,0 +1,40 @@
+"""
+Report formatting, run in the report worker processes.
+
+Only the standard library is imported here, so spawning a worker stays
+cheap. Each call formats one chunk of rows; the runner concatenates the
+chunks in order.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import List, Sequence
+
+ATTENDANCE_FIELDS = ["id", "student_id", "session_id", "device_id", "timestamp"]
+TERM_SUMMARY_FIELDS = [
+    "student_id", "name", "email", "sessions_attended", "sessions_held",
+    "attendance_rate", "first_check_in", "last_check_in",
+]
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def format_chunk(fmt: str, fields: List[str], rows: Sequence[tuple], first: bool) -> str:
+    """Format rows; `first` adds the CSV header or opens the JSON array."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if first:
+            writer.writerow(fields)
+        writer.writerows([_value(value) for value in row] for row in rows)
+        return buffer.getvalue()
+    if fmt == "json":
+        items = ",\n".join(json.dumps({field: _value(value) for field, value in zip(fields, row)}) for row in rows)
+        if first:
+            return "[\n" + items
+        return ",\n" + items if items else ""
+    raise ValueError(f"Unknown report format: {fmt}")
+
+def format_end(fmt: str) -> str:
+    return "\n]\n" if fmt == "json" else ""
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Background report jobs.
+
+A job is a row in `report_jobs`, so its status and progress are visible
+from every worker. Each job reads its data in chunks on a runner thread and
+hands the formatting of every chunk to a bounded process pool, so large
+reports never hold the GIL that request threads serving check-ins need.
+Artifacts are written to REPORT_DIR, which must be shared if several hosts
+serve downloads.
+
+Jobs only run in the process that accepted them. `clean_up` runs at startup
+and on every scheduler tick: it fails jobs that stopped making progress
+(their worker is gone), other than the ones this process still holds, and
+deletes artifacts past REPORT_RETENTION_HOURS, marking those jobs expired.
+A job starts only if it can claim its row while still queued, so one
+failed as stale is never brought back.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import crud, schemas
+from .config import settings
+from .report_formats import ATTENDANCE_FIELDS, TERM_SUMMARY_FIELDS, format_chunk, format_end
+
+logger = logging.getLogger(__name__)
+
+def _scope(request: schemas.ReportRequest):
+    return crud.report_session_scope(request.session_ids, request.start, request.end)
+
+def attendance_export(db: Session, request: schemas.ReportRequest, chunk_rows: int) -> Tuple[List[str], int, Iterator[list]]:
+    """Every check-in in the covered sessions."""
+    scope = _scope(request)
+
+    def chunks():
+        after_id = 0
+        while True:
+            rows = crud.get_attendance_export_page(db, scope, after_id, chunk_rows)
+            if not rows:
+                return
+            after_id = rows[-1][0]
+            yield [tuple(row) for row in rows]
+
+    return ATTENDANCE_FIELDS, crud.count_attendance_in_scope(db, scope), chunks()
+
+def term_summary(db: Session, request: schemas.ReportRequest, chunk_rows: int) -> Tuple[List[str], int, Iterator[list]]:
+    """One row per student: attendance over the covered sessions."""
+    scope = _scope(request)
+    held = crud.count_query(db, scope)
+
+    def chunks():
+        after_id = ""
+        while True:
+            students = crud.get_students_page(db, after_id, chunk_rows)
+            if not students:
+                return
+            after_id = students[-1][0]
+            totals = crud.get_attendance_totals(db, scope, [s[0] for s in students])
+            rows = []
+            for student_id, name, email in students:
+                attended, first, last = totals.get(student_id, (0, None, None))
+                rows.append((student_id, name, email, attended, held,
+                             round(attended / held, 4) if held else 0.0, first, last))
+            yield rows
+
+    return TERM_SUMMARY_FIELDS, crud.count_students(db), chunks()
+
+REPORTS = {
+    "term_summary": term_summary,
+    "attendance_export": attendance_export,
+}
+
+class ReportRunner:
+    """Runs report jobs: at most `workers` at once, formatting on `workers` processes."""
+
+    def __init__(self, directory: str, workers: int, chunk_rows: int,
+                 stale_seconds: float = 900.0, retention_hours: float = 24.0):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "attendance-reports")
+        self.workers = max(1, workers)
+        self.chunk_rows = chunk_rows
+        self.stale_seconds = stale_seconds
+        self.retention_hours = retention_hours
+        self._lock = threading.Lock()
+        self._jobs = None
+        self._processes = None
+        self._pending = {}  # future -> job ID, for jobs this process accepted and has not finished
+
+    def _executors(self):
+        # Created on first use, so importing the app starts no processes
+        with self._lock:
+            if self._jobs is None:
+                self._jobs = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="report")
+                # spawn, not fork: forking a threaded server process is unsafe
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._jobs, self._processes
+
+    def submit(self, job_id: str, session_factory: Callable[[], Session]):
+        jobs, _ = self._executors()
+        future = jobs.submit(self._run, job_id, session_factory)
+        with self._lock:
+            self._pending[future] = job_id
+        future.add_done_callback(self._finished)
+
+    def _finished(self, future):
+        with self._lock:
+            self._pending.pop(future, None)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until every job submitted so far has finished; False on timeout."""
+        with self._lock:
+            pending = list(self._pending)
+        return not wait(pending, timeout).not_done
+
+    def _run(self, job_id: str, session_factory: Callable[[], Session]):
+        _, processes = self._executors()
+        with session_factory() as db:
+            try:
+                if not crud.claim_report_job(db, job_id):
+                    # Failed as stale while it waited; the user has already been told
+                    logger.warning("Report %s is no longer queued; not running it", job_id)
+                    return
+                job = crud.get_report_job(db, job_id)
+                request = schemas.ReportRequest(kind=job.kind, format=job.format, **json.loads(job.params))
+                fields, total, chunks = REPORTS[job.kind](db, request, self.chunk_rows)
+
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, f"{job_id}.{job.format}")
+                done = 0
+                index = -1
+                with open(path + ".partial", "w", newline="") as out:
+                    # Bounded look-ahead: enough chunks in flight to keep every process busy
+                    pending = deque()
+                    for index, rows in enumerate(chunks):
+                        pending.append((len(rows), processes.submit(format_chunk, job.format, fields, rows, index == 0)))
+                        if len(pending) >= self.workers * 2:
+                            done += self._write(db, job_id, out, pending.popleft(), done, total)
+                    while pending:
+                        done += self._write(db, job_id, out, pending.popleft(), done, total)
+                    if index < 0:
+                        # No rows at all: still a valid, empty document
+                        out.write(format_chunk(job.format, fields, [], True))
+                    out.write(format_end(job.format))
+                os.replace(path + ".partial", path)
+
+                crud.update_report_job(
+                    db, job_id, status="done", progress=1.0, artifact_path=path,
+                    finished_at=datetime.now(timezone.utc)
+                )
+            except Exception as e:
+                logger.error("Error generating report %s: %s", job_id, e)
+                db.rollback()
+                crud.update_report_job(
+                    db, job_id, status="failed", error=str(e), finished_at=datetime.now(timezone.utc)
+                )
+
+    def _write(self, db: Session, job_id: str, out, item, done: int, total: int) -> int:
+        count, future = item
+        out.write(future.result())
+        crud.update_report_job(db, job_id, progress=min((done + count) / total, 1.0) if total else 0.0)
+        return count
+
+    def clean_up(self, db: Session) -> Tuple[List[str], List[str]]:
+        """Fail jobs whose worker is gone and delete expired artifacts; returns (failed, expired) job IDs."""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            # Waiting in this process's queue is not stale, however long it takes
+            ours = list(self._pending.values())
+        failed = crud.fail_stale_report_jobs(
+            db, now - timedelta(seconds=self.stale_seconds), "Interrupted: the worker running it stopped", ours
+        )
+        for job_id in failed:
+            for extension in ("csv", "json"):
+                self._remove(os.path.join(self.directory, f"{job_id}.{extension}.partial"))
+        expired = crud.expire_report_jobs(db, now - timedelta(hours=self.retention_hours))
+        for _, path in expired:
+            self._remove(path)
+        if failed or expired:
+            logger.info("Report clean-up: %s stale jobs failed, %s artifacts expired", len(failed), len(expired))
+        return failed, [job_id for job_id, _ in expired]
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def shutdown(self):
+        with self._lock:
+            if self._jobs is not None:
+                self._jobs.shutdown(wait=False, cancel_futures=True)
+                self._processes.shutdown(wait=False, cancel_futures=True)
+                self._jobs = self._processes = None
+
+report_runner = ReportRunner(
+    settings.REPORT_DIR, settings.REPORT_WORKERS, settings.REPORT_CHUNK_ROWS,
+    settings.REPORT_STALE_SECONDS, settings.REPORT_RETENTION_HOURS
+)
\ No newline at end of file
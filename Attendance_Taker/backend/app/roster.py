@@ -0,0 +1,187 @@
+"""
+In-memory roster membership check for check-ins.
+
+Unknown student IDs are rejected before any database work. The roster is
+held either as an exact set or, for very large rosters, as a Bloom filter
+whose rare false positives simply fall through to the database.
+"""
+import hashlib
+import logging
+import math
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import models
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """Bloom filter sized for `capacity` items at the target false-positive rate."""
+
+    def __init__(self, capacity: int, fp_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] >> (position & 7) & 1 for position in self._positions(item))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self.bits)
+
+    def false_positive_rate(self) -> float:
+        """Expected false-positive rate at the current fill."""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+class ExactRoster(set):
+    """Exact membership; memory grows with the total size of the IDs."""
+
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self) + sum(sys.getsizeof(student_id) for student_id in self)
+
+    def false_positive_rate(self) -> float:
+        return 0.0
+
+class RosterFilter:
+    """
+    Process-wide roster membership check.
+
+    Reloaded from `students` every `refresh_interval` seconds, on a
+    background thread and one reload at a time; check-ins keep using the
+    current roster meanwhile. A miss is checked against `students` with one
+    primary-key lookup, so students added on another worker are accepted.
+    IDs found missing are remembered per ID for `miss_refresh_interval`, in
+    an LRU of at most `max_misses`, so a client repeating an unknown ID
+    cannot force a query per request and cannot lock out anyone else.
+    """
+
+    def __init__(self, mode: str, fp_rate: float, refresh_interval: float, miss_refresh_interval: float,
+                 max_misses: int = 10000):
+        if mode not in ("exact", "bloom", "off"):
+            raise ValueError(f"Unknown ROSTER_FILTER_MODE: {mode}")
+        self.mode = mode
+        self.fp_rate = fp_rate
+        self.refresh_interval = refresh_interval
+        self.miss_refresh_interval = miss_refresh_interval
+        self.max_misses = max_misses
+        self.members = None
+        self.loaded_at = 0.0
+        self._misses = OrderedDict()  # Student ID -> when it was found missing
+        self.lock = threading.Lock()
+        self._reloading = threading.Lock()  # Held for the duration of a reload
+
+    def _empty(self, capacity: int):
+        if self.mode == "bloom":
+            # Headroom so students added between reloads keep the rate on target
+            return BloomFilter(max(int(capacity * 1.25), 1024), self.fp_rate)
+        return ExactRoster()
+
+    def load(self, db: Session):
+        """Rebuild the roster from the students table."""
+        student_ids = db.execute(select(models.Student.id)).scalars().all()
+        members = self._empty(len(student_ids))
+        for student_id in student_ids:
+            members.add(student_id)
+        with self.lock:
+            self.members = members
+            self.loaded_at = time.monotonic()
+        logger.info(
+            "Loaded roster of %s students (%s, %s bytes, fp rate %.2e)",
+            len(student_ids), self.mode, members.memory_bytes(), members.false_positive_rate()
+        )
+
+    def add(self, student_ids: Iterable[str]):
+        """Record newly created students."""
+        with self.lock:
+            for student_id in student_ids:
+                self._misses.pop(student_id, None)
+                if self.members is not None:
+                    self.members.add(student_id)
+
+    def reload_in_background(self, db: Session) -> bool:
+        """Start a reload on its own thread and DB session, unless one is running."""
+        if not self._reloading.acquire(blocking=False):
+            return False
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+
+        def run():
+            try:
+                with session_factory() as reload_db:
+                    self.load(reload_db)
+            except Exception as e:
+                logger.error("Error reloading roster: %s", e)
+            finally:
+                self._reloading.release()
+
+        threading.Thread(target=run, name="roster-reload", daemon=True).start()
+        return True
+
+    def might_contain(self, db: Session, student_id: str) -> bool:
+        """False only if the student definitely does not exist."""
+        if self.mode == "off":
+            return True
+        if self.members is None:
+            # Nothing to serve yet: the first caller loads, concurrent ones wait for it
+            with self._reloading:
+                if self.members is None:
+                    self.load(db)
+        elif time.monotonic() - self.loaded_at > self.refresh_interval:
+            self.reload_in_background(db)
+        if student_id in self.members:
+            return True
+
+        with self.lock:
+            missed_at = self._misses.get(student_id)
+            if missed_at is not None and time.monotonic() - missed_at < self.miss_refresh_interval:
+                return False
+        # Perhaps added on another worker since the last reload
+        if db.execute(select(models.Student.id).where(models.Student.id == student_id)).scalar() is None:
+            with self.lock:
+                self._misses[student_id] = time.monotonic()
+                self._misses.move_to_end(student_id)
+                while len(self._misses) > self.max_misses:
+                    self._misses.popitem(last=False)
+            return False
+        self.add([student_id])
+        return True
+
+    def stats(self) -> dict:
+        members = self.members
+        return {
+            "mode": self.mode,
+            "students": len(members) if members is not None else 0,
+            "memory_bytes": members.memory_bytes() if members is not None else 0,
+            "false_positive_rate": members.false_positive_rate() if members is not None else 0.0,
+        }
+
+roster_filter = RosterFilter(
+    mode=settings.ROSTER_FILTER_MODE,
+    fp_rate=settings.ROSTER_BLOOM_FP_RATE,
+    refresh_interval=settings.ROSTER_REFRESH_SECONDS,
+    miss_refresh_interval=settings.ROSTER_MISS_REFRESH_SECONDS,
+    max_misses=settings.ROSTER_MISS_CACHE_SIZE,
+)
\ No newline at end of file
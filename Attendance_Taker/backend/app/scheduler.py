@@ -0,0 +1,73 @@
+"""
+Background closing of sessions that have outlived their duration.
+
+Each tick closes every expired session with one bulk update, then does what
+`/stop_attendance` would: ends the beacon lease, freezes the attendee bitmap
+and wakes live streams. It then claims the emitters of open sessions whose
+lease has lapsed, so a crashed worker's sessions keep their beacon (sessions
+synced from edge nodes are left alone: the node runs their beacon), and
+cleans up report jobs and artifacts and expired shared idempotency keys. Every worker may run the scheduler; the
+update only touches sessions that are still active and claims are
+race-free, so overlapping ticks are harmless.
+"""
+import logging
+import threading
+from typing import Callable, List
+
+from sqlalchemy.orm import Session
+
+from . import crud, beacon
+from .bitmap_index import session_bitmap_index
+from .idempotency import shared_idempotency_store
+from .live import live_feed
+from .reports import report_runner
+
+logger = logging.getLogger(__name__)
+
+def close_expired_sessions(db: Session) -> List[int]:
+    """Run one expiry pass; returns the IDs of the sessions it closed."""
+    expired = crud.expire_sessions(db)
+    for session_id in expired:
+        beacon.stop_beacon_emission(db, session_id)
+        session_bitmap_index.close(db, session_id)
+        live_feed.notify(session_id)
+    if expired:
+        logger.info("Closed %s expired sessions: %s", len(expired), expired)
+    return expired
+
+def tick(db: Session):
+    """One scheduler pass: close expired sessions, adopt orphaned emitters, clean up reports and keys."""
+    close_expired_sessions(db)
+    beacon.adopt_orphaned_sessions(db)
+    report_runner.clean_up(db)
+    shared_idempotency_store.purge(db)
+
+class SessionExpiryScheduler:
+    """Daemon thread that runs `close_expired_sessions` every `interval` seconds."""
+
+    def __init__(self, session_factory: Callable[[], Session], interval: float):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                with self.session_factory() as db:
+                    tick(db)
+            except Exception as e:
+                logger.error("Error in session scheduler tick: %s", e)
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="session-expiry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
\ No newline at end of file
@@ -1,9 +1,9 @@
 """
 Pydantic schemas for request/response validation.
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Literal, Optional
 
 # Student schemas
 class StudentBase(BaseModel):
@@ -26,13 +26,14 @@ class BeaconSessionBase(BaseModel):
     description: Optional[str] = None
 
 class BeaconSessionCreate(BeaconSessionBase):
-    pass
+    duration_minutes: Optional[int] = Field(None, gt=0)  # Expire automatically after this
 
 class BeaconSession(BeaconSessionBase):
     id: int
     is_active: bool
     created_at: datetime
     ended_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
@@ -51,4 +52,114 @@ class Attendance(AttendanceBase):
     timestamp: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class AttendancePage(BaseModel):
+    items: List[Attendance]
+    next_cursor: Optional[str] = None  # Pass back as `cursor` for the next page; None on the last
+    total: Optional[int] = None  # Only when requested with include_total
+
+class DailyCount(BaseModel):
+    date: str
+    count: int
+
+class StudentCount(BaseModel):
+    student_id: str
+    count: int
+
+class AttendanceSummary(BaseModel):
+    total: int
+    unique_students: int
+    first_check_in: Optional[datetime] = None
+    latest_check_in: Optional[datetime] = None
+    daily: List[DailyCount]
+    top_students: List[StudentCount]
+
+# Analytics schemas
+class StudentAttendanceStats(BaseModel):
+    student_id: str
+    sessions_attended: int
+    sessions_held: int
+    attendance_rate: float
+    current_absence_streak: int
+    longest_absence_streak: int
+
+# Cohort query schemas
+class CohortExpression(BaseModel):
+    """Either a leaf (`session_id` or `roster`) or `op` applied left to right over `operands`."""
+    session_id: Optional[int] = None
+    roster: bool = False
+    op: Optional[Literal["union", "intersection", "difference"]] = None
+    operands: List["CohortExpression"] = []
+
+class CohortQuery(BaseModel):
+    expression: CohortExpression
+    count_only: bool = False
+
+class CohortResult(BaseModel):
+    count: int
+    student_ids: Optional[List[str]] = None
+
+class RosterStats(BaseModel):
+    mode: str
+    students: int
+    memory_bytes: int
+    false_positive_rate: float
+
+# Edge sync schemas
+class EdgeSession(BeaconSessionBase):
+    id: int  # ID on the edge node
+    is_active: bool
+    created_at: datetime
+    ended_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+
+class EdgeAttendance(BaseModel):
+    id: Optional[int] = None  # ID on the edge node, echoed back if the row is skipped
+    session_id: int  # Edge session ID
+    student_id: str
+    device_id: str
+    timestamp: datetime
+
+class EdgeSyncBatch(BaseModel):
+    node_id: str
+    sessions: List[EdgeSession] = []
+    attendance: List[EdgeAttendance] = []
+
+class EdgeSyncResult(BaseModel):
+    sessions: Dict[int, int]  # Edge session ID -> central session ID
+    attendance_merged: int  # New rows; replays of earlier pushes are not counted
+    attendance_skipped: int  # Unknown student or session
+    attendance_skipped_ids: List[int] = []  # Edge IDs of the skipped rows, to retry later
+
+class RosterPage(BaseModel):
+    students: List[StudentBase]
+    next_after: int  # Pass back as `after` for the next page
+
+# Report job schemas
+class ReportRequest(BaseModel):
+    kind: Literal["term_summary", "attendance_export"]
+    format: Literal["csv", "json"] = "csv"
+    session_ids: Optional[List[int]] = None  # Default: every session in the date range
+    start: Optional[datetime] = None  # Sessions created at or after
+    end: Optional[datetime] = None  # Sessions created before
+
+class ReportJob(BaseModel):
+    id: str
+    kind: str
+    format: str
+    status: str
+    progress: float
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+# Student client schemas
+class ClientConfig(BaseModel):
+    """Beacon settings student clients cache for their next launch."""
+    beacon_service_uuid: str
+    multicast_group: str
+    multicast_port: int
\ No newline at end of file
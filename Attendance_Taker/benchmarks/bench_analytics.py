@@ -0,0 +1,109 @@
+"""
+Benchmark for the attendance-matrix analytics engine.
+
+The vectorised queries run on a synthetic in-memory matrix. Refreshes run
+against a database filled by datagen (in-memory SQLite unless
+--database-url is given; its tables are dropped!): a cold load, a refresh
+with nothing new, and one after a new lecture's check-ins arrived.
+
+Run from the Attendance_Taker directory:
+    python -m benchmarks.bench_analytics [--students 50000] [--sessions 200] [--refresh-students 5000]
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+
+# The app's own engine is never used here, but must be constructible without a Postgres driver
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from backend.app import analytics, crud, models, schemas
+from backend.app.database import Base
+
+from .bench_hot_paths import make_engine
+from .datagen import CampusGenerator, CampusSpec, generate
+
+def timed(label, fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<40} {best * 1000:10.2f} ms")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=50_000)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--attendance-rate", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--refresh-students", type=int, default=5_000, help="campus size for the refresh cases")
+    parser.add_argument("--database-url", help="scratch database for the refresh cases instead of in-memory SQLite")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    matrix = analytics.AttendanceMatrix()
+    student_ids = [f"s{i:07d}" for i in range(args.students)]
+    for student_id in student_ids:
+        matrix.intern_student(student_id)
+    for session_id in range(1, args.sessions + 1):
+        matrix.intern_session(session_id)
+
+    attended = rng.random((args.students, args.sessions)) < args.attendance_rate
+    matrix.present[:args.students, :args.sessions] = attended
+    print(f"{args.students} students x {args.sessions} sessions, "
+          f"{int(attended.sum())} attendance rows, matrix {matrix.present.nbytes / 2**20:.1f} MiB\n")
+
+    present = matrix.view()
+    timed("attendance rates", lambda: analytics.attendance_rates(present))
+    timed("absence streaks (current + longest)", lambda: analytics.absence_streaks(present))
+    timed("at-risk rows (rate < 0.75, streak >= 3)", lambda: analytics.at_risk_rows(matrix, 0.75, 3))
+    timed("at-risk rows, last 10 sessions", lambda: analytics.at_risk_rows(matrix, 0.75, 3, last_n=10))
+    timed("stats for one page of 100 students", lambda: analytics.student_stats(matrix, rows=range(100)))
+
+    # Incremental add, in memory only: one new session checked into by most students
+    new_session = args.sessions + 1
+    pairs = [(student_id, new_session) for student_id in student_ids if rng.random() < args.attendance_rate]
+    timed(f"in-memory add of {len(pairs)} rows", lambda: matrix.add(pairs), repeat=1)
+
+    print()
+    refresh_from_database(args.database_url, args.refresh_students, args.attendance_rate, rng)
+
+def refresh_from_database(database_url, students: int, attendance_rate: float, rng):
+    """Time AttendanceMatrix.refresh(db), the path the analytics routes take."""
+    engine = make_engine(database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    try:
+        spec = CampusSpec(students=students, courses=max(1, students // 100))
+        counts = generate(engine, spec)
+        print(f"database: {counts['students']} students, {counts['sessions']} sessions, "
+              f"{counts['attendance']} attendance rows")
+
+        matrix = analytics.AttendanceMatrix()
+        with SessionLocal() as db:
+            timed("refresh, cold (full load)", lambda: matrix.refresh(db), repeat=1)
+            timed("refresh, nothing new", lambda: matrix.refresh(db))
+
+            # A new lecture, checked into by most of the campus
+            session_id = crud.create_beacon_session(db, schemas.BeaconSessionCreate(name="Bench lecture")).id
+            now = datetime.now(timezone.utc)
+            rows = [
+                {"student_id": student_id, "session_id": session_id, "device_id": "bench", "timestamp": now}
+                for student_id in CampusGenerator(spec).student_ids if rng.random() < attendance_rate
+            ]
+            db.execute(insert(models.Attendance), rows)
+            db.commit()
+            timed(f"refresh after {len(rows)} new check-ins", lambda: matrix.refresh(db), repeat=1)
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
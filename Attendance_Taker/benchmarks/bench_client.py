@@ -0,0 +1,106 @@
+"""
+Student-client detection path under simulated lecture-hall traffic.
+
+Replays synthetic advertisement streams (several session beacons among
+hundreds of foreign devices, with RSSI noise) through the same
+AdvertisementHandler and BeaconDetector the client uses, and reports:
+
+- callback throughput (advertisements per second, as fast as possible)
+- CPU time per advertisement
+- detection latency per session beacon, in simulated time
+- event-loop lag when the same hall is delivered in real time
+
+No Bluetooth hardware is needed. Run from the Attendance_Taker directory:
+    python -m benchmarks.bench_client --devices 0,100,500,2000 --output client.json
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from client.detection import AdvertisementHandler, BeaconDetector
+from client.scanners import BEACON_SERVICE_UUID, SimulatedScanner, hall
+
+from .harness import save_results
+
+# Session ID -> mean RSSI: one near, one at the back of the hall, one next door
+SESSIONS = {101: -60.0, 102: -80.0, 103: -95.0}
+RSSI_THRESHOLD = -85
+
+def replay(devices: int, duration: float, seed: int) -> dict:
+    detections = {}
+    detector = None
+
+    def on_detect(session_id):
+        detections[session_id] = detector.clock()
+
+    scanner = SimulatedScanner(None, hall(SESSIONS, foreign_devices=devices, seed=seed), seed=seed)
+    detector = BeaconDetector(on_detect, rssi_threshold=RSSI_THRESHOLD, clock=scanner.clock)
+    scanner.callback = AdvertisementHandler(detector, BEACON_SERVICE_UUID)
+
+    # Generate first, so only the client's callback path is timed
+    events = list(scanner.events(duration))
+    wall, cpu = time.perf_counter(), time.process_time()
+    count = scanner.replay(events)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    return {
+        "advertisements": count,
+        "throughput_per_s": count / wall if wall else float("inf"),
+        "cpu_us_per_ad": cpu * 1e6 / count if count else 0.0,
+        "detection_latency_s": {str(sid): detections.get(sid) for sid in SESSIONS},
+    }
+
+def realtime_lag(devices: int, seconds: float, seed: int) -> dict:
+    detector = BeaconDetector(lambda session_id: None, rssi_threshold=RSSI_THRESHOLD)
+    scanner = SimulatedScanner(
+        AdvertisementHandler(detector, BEACON_SERVICE_UUID),
+        hall(SESSIONS, foreign_devices=devices, seed=seed), seed=seed, track_lag=True
+    )
+
+    async def run():
+        await scanner.start()
+        await asyncio.sleep(seconds)
+        await scanner.stop()
+
+    asyncio.run(run())
+    lag = sorted(scanner.lag) or [0.0]
+    return {
+        "delivered": scanner.delivered,
+        "lag_p50_ms": statistics.median(lag) * 1000,
+        "lag_p99_ms": lag[min(len(lag) - 1, int(len(lag) * 0.99))] * 1000,
+        "lag_max_ms": lag[-1] * 1000,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", default="0,100,500,2000", help="comma-separated foreign device counts")
+    parser.add_argument("--duration", type=float, default=60.0, help="simulated seconds per replay")
+    parser.add_argument("--realtime", type=float, default=3.0, help="wall seconds of real-time delivery (0 to skip)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'devices':>8}{'ads':>10}{'ads/s':>12}{'cpu us/ad':>11}  latency (s) per session   rt lag p50/p99 ms")
+    for devices in [int(d) for d in args.devices.split(",")]:
+        result = replay(devices, args.duration, args.seed)
+        if args.realtime:
+            result["realtime"] = realtime_lag(devices, args.realtime, args.seed)
+        results[str(devices)] = result
+
+        latency = "  ".join(
+            f"{sid}:{'-' if at is None else f'{at:.2f}'}" for sid, at in result["detection_latency_s"].items()
+        )
+        rt = result.get("realtime")
+        lag = f"{rt['lag_p50_ms']:.2f}/{rt['lag_p99_ms']:.2f}" if rt else "-"
+        print(f"{devices:>8}{result['advertisements']:>10}{result['throughput_per_s']:>12.0f}"
+              f"{result['cpu_us_per_ad']:>11.2f}  {latency:<24}{lag:>18}")
+
+    if args.output:
+        save_results(args.output, results, duration=args.duration, sessions=SESSIONS)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,295 @@
+"""
+Micro/meso benchmarks for every crud function and API route.
+
+Runs against in-memory SQLite with StaticPool (as test.py does), or against
+a scratch database given with --database-url (its tables are dropped!), at
+several attendance-table sizes. Results are stored as JSON baselines and
+`compare` exits non-zero when a hot path regressed beyond the tolerance.
+
+Run from the Attendance_Taker directory:
+    python -m benchmarks.bench_hot_paths run --sizes 1000,100000 --output baseline.json
+    python -m benchmarks.bench_hot_paths run --sizes 1000,100000 --output current.json
+    python -m benchmarks.bench_hot_paths compare baseline.json current.json --tolerance 0.25
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+# The app's own engine is never used here, but must be constructible without a Postgres driver
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.app import crud, schemas
+from backend.app.database import Base, get_db
+from backend.app.main import app
+from backend.app.config import settings
+from backend.app.coordinator import get_coordinator
+from backend.app.reports import report_runner
+
+from .datagen import CampusGenerator, CampusSpec, generate
+from .harness import measure, save_results, load_results, compare
+
+DEFAULT_SIZES = "1000,100000,1000000"
+MAX_RUNS = 50
+# Beyond this many rows, unfiltered full-table reads are skipped
+FULL_SCAN_LIMIT = 100_000
+
+def make_engine(database_url):
+    if database_url:
+        return create_engine(database_url)
+    return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+def seed(engine, rows: int):
+    """Fill a synthetic campus with roughly `rows` attendance rows."""
+    students = max(MAX_RUNS * 2, rows // 50)
+    roster = min(students, 200)
+    spec = CampusSpec(students=students, roster_min=roster, roster_max=roster)
+    # Each course yields about term_sessions * roster * mean propensity * mean decay rows
+    per_course = spec.term_sessions * roster * 0.8 * (1 - spec.term_decay / 2)
+    spec.courses = max(1, round(rows / per_course))
+    counts = generate(engine, spec)
+    return CampusGenerator(spec).student_ids, counts["sessions"]
+
+def crud_cases(SessionLocal, student_ids, sessions, rows):
+    """name -> fn(i), each running one crud call in its own session, like a request."""
+    with SessionLocal() as db:
+        open_session = crud.create_beacon_session(db, schemas.BeaconSessionCreate(name="Bench open"))
+        to_close = [
+            crud.create_beacon_session(db, schemas.BeaconSessionCreate(name=f"Bench close {i}")).id
+            for i in range(MAX_RUNS + 1)
+        ]
+        bitmap = crud.save_session_bitmap(db, 1, b"\0" * 64, 0, 0).session_id
+        open_session_id = open_session.id
+
+    def run(fn):
+        def case(i):
+            with SessionLocal() as db:
+                return fn(db, i)
+        return case
+
+    cases = {
+        "crud.get_student": run(lambda db, i: crud.get_student(db, student_ids[i % len(student_ids)])),
+        "crud.create_student": run(lambda db, i: crud.create_student(db, schemas.StudentCreate(
+            id=f"new{i}", name="New", email=f"new{i}@example.edu"))),
+        "crud.create_students_bulk[100]": run(lambda db, i: crud.create_students_bulk(db, [
+            schemas.StudentCreate(id=f"bulk{i}-{j}", name="Bulk", email=f"bulk{i}-{j}@example.edu")
+            for j in range(100)])),
+        "crud.get_beacon_session": run(lambda db, i: crud.get_beacon_session(db, 1 + i % sessions)),
+        "crud.get_active_beacon_session": run(lambda db, i: crud.get_active_beacon_session(db)),
+        "crud.get_beacon_sessions": run(lambda db, i: crud.get_beacon_sessions(db)),
+        "crud.create_beacon_session": run(lambda db, i: crud.create_beacon_session(
+            db, schemas.BeaconSessionCreate(name=f"Bench {i}"))),
+        "crud.update_beacon_session_status": run(lambda db, i: crud.update_beacon_session_status(
+            db, to_close[i], False)),
+        "crud.get_attendance[session]": run(lambda db, i: crud.get_attendance(db, session_id=1 + i % sessions)),
+        "crud.get_attendance[student]": run(lambda db, i: crud.get_attendance(
+            db, student_id=student_ids[i % len(student_ids)])),
+        "crud.get_attendance_rows[session]": run(lambda db, i: crud.get_attendance_rows(
+            db, session_id=1 + i % sessions)),
+        "crud.get_beacon_session_rows": run(lambda db, i: crud.get_beacon_session_rows(db)),
+        "crud.get_attendance_by_student_and_session": run(lambda db, i: crud.get_attendance_by_student_and_session(
+            db, student_ids[i % len(student_ids)], 1 + i % sessions)),
+        "crud.create_attendance": run(lambda db, i: crud.create_attendance(db, schemas.AttendanceCreate(
+            student_id=student_ids[i], session_id=open_session_id, device_id="bench"))),
+        "crud.get_or_create_student_ordinal": run(lambda db, i: crud.get_or_create_student_ordinal(
+            db, student_ids[i % len(student_ids)])),
+        "crud.get_student_ids_by_ordinal[100]": run(lambda db, i: crud.get_student_ids_by_ordinal(
+            db, range(1, 101))),
+        "crud.assign_missing_student_ordinals": run(lambda db, i: crud.assign_missing_student_ordinals(db)),
+        "crud.get_session_bitmap": run(lambda db, i: crud.get_session_bitmap(db, bitmap)),
+        "crud.save_session_bitmap": run(lambda db, i: crud.save_session_bitmap(db, bitmap, b"\0" * 64, 0, i)),
+        "crud.get_attendance_page[first]": run(lambda db, i: crud.get_attendance_page(db, [])),
+        "crud.get_attendance_page[session]": run(lambda db, i: crud.get_attendance_page(
+            db, crud.attendance_filters(session_id=1 + i % sessions), sort="student_id")),
+        "crud.get_attendance_summary[session]": run(lambda db, i: crud.get_attendance_summary(
+            db, crud.attendance_filters(session_id=1 + i % sessions))),
+    }
+    if rows <= FULL_SCAN_LIMIT:
+        cases["crud.get_attendance[all]"] = run(lambda db, i: crud.get_attendance(db))
+        cases["crud.get_attendance_rows[all]"] = run(lambda db, i: crud.get_attendance_rows(db))
+    return cases
+
+def wait_for_report(client, job_id: str, headers: dict, timeout: float = 60.0) -> dict:
+    # On the runner rather than by polling, so status requests don't pile onto the timing
+    if not report_runner.wait(timeout):
+        raise TimeoutError(f"Report {job_id} still running")
+    return client.get(f"/api/v1/reports/{job_id}", headers=headers).json()
+
+def api_cases(client, student_ids, sessions, rows, background_jobs: bool):
+    """
+    name -> fn(i), each making one request through the full FastAPI stack.
+
+    Every route is covered except the live session stream, which holds its
+    connection open and has no per-request latency to speak of. Report jobs
+    run on their own thread and connection, which in-memory SQLite (one
+    connection shared by every thread) can't give them, so the report routes
+    are only timed against --database-url.
+    """
+    headers = {"Authorization": f"Bearer {settings.PROFESSOR_TOKEN}"}
+    open_session_id = client.post("/api/v1/start_attendance", json={"name": "Bench API"}, headers=headers).json()["id"]
+    to_stop = [
+        client.post("/api/v1/start_attendance", json={"name": f"Stop {i}"}, headers=headers).json()["id"]
+        for i in range(MAX_RUNS + 1)
+    ]
+    next_page = client.get("/api/v1/attendance/page?limit=100", headers=headers).json()["next_cursor"]
+
+    def checked(response):
+        assert response.status_code < 500, response.text
+        return response
+
+    def report_until_done(i):
+        job = checked(client.post("/api/v1/reports", json={
+            "kind": "attendance_export", "session_ids": [1 + i % sessions]}, headers=headers)).json()
+        # Waiting also keeps report threads from overlapping the cases that follow
+        assert wait_for_report(client, job["id"], headers)["status"] == "done"
+
+    def sync_push(i):
+        # One closed edge lecture with 100 check-ins per push, as an edge node sends them
+        now = datetime.now(timezone.utc).isoformat()
+        edge_session = 1000 + i
+        return checked(client.post("/api/v1/sync/push", json={
+            "node_id": "bench-edge",
+            "sessions": [{"id": edge_session, "name": f"Edge {i}", "is_active": False,
+                          "created_at": now, "ended_at": now}],
+            "attendance": [{"session_id": edge_session, "student_id": student_ids[(i * 100 + j) % len(student_ids)],
+                            "device_id": "edge", "timestamp": now} for j in range(100)],
+        }, headers=headers))
+
+    cases = {
+        "api.GET /health": lambda i: checked(client.get("/health")),
+        "api.POST /start_attendance": lambda i: checked(client.post(
+            "/api/v1/start_attendance", json={"name": f"API {i}"}, headers=headers)),
+        "api.POST /stop_attendance": lambda i: checked(client.post(
+            f"/api/v1/stop_attendance?session_id={to_stop[i]}", headers=headers)),
+        "api.POST /mark_attendance": lambda i: checked(client.post("/api/v1/mark_attendance", json={
+            "student_id": student_ids[i], "session_id": open_session_id, "device_id": "bench"})),
+        "api.POST /mark_attendance[unknown student]": lambda i: checked(client.post("/api/v1/mark_attendance", json={
+            "student_id": f"nobody{i}", "session_id": open_session_id, "device_id": "bench"})),
+        "api.GET /attendance[session]": lambda i: checked(client.get(
+            f"/api/v1/attendance?session_id={1 + i % sessions}", headers=headers)),
+        "api.GET /current_session": lambda i: checked(client.get("/api/v1/current_session")),
+        "api.GET /sessions": lambda i: checked(client.get("/api/v1/sessions", headers=headers)),
+        "api.GET /analytics/students": lambda i: checked(client.get("/api/v1/analytics/students", headers=headers)),
+        "api.GET /analytics/at_risk": lambda i: checked(client.get("/api/v1/analytics/at_risk", headers=headers)),
+        "api.POST /cohorts/query": lambda i: checked(client.post("/api/v1/cohorts/query", json={
+            "expression": {"op": "difference", "operands": [{"roster": True}, {"session_id": 1}]},
+            "count_only": True}, headers=headers)),
+        "api.POST /students": lambda i: checked(client.post("/api/v1/students", json={
+            "id": f"api{i}", "name": "API", "email": f"api{i}@example.edu"}, headers=headers)),
+        "api.GET /roster/stats": lambda i: checked(client.get("/api/v1/roster/stats", headers=headers)),
+        "api.GET /analytics/students/{id}": lambda i: checked(client.get(
+            f"/api/v1/analytics/students/{student_ids[i % len(student_ids)]}", headers=headers)),
+        "api.POST /students/bulk[100]": lambda i: checked(client.post("/api/v1/students/bulk", json=[
+            {"id": f"apibulk{i}-{j}", "name": "Bulk", "email": f"apibulk{i}-{j}@example.edu"} for j in range(100)
+        ], headers=headers)),
+        "api.GET /attendance/page[first]": lambda i: checked(client.get(
+            "/api/v1/attendance/page?limit=100", headers=headers)),
+        "api.GET /attendance/page[next]": lambda i: checked(client.get(
+            "/api/v1/attendance/page", params={"limit": 100, "cursor": next_page}, headers=headers)),
+        "api.GET /attendance/page[session, by student]": lambda i: checked(client.get(
+            f"/api/v1/attendance/page?session_id={1 + i % sessions}&sort=student_id&order=asc", headers=headers)),
+        "api.GET /attendance/summary[session]": lambda i: checked(client.get(
+            f"/api/v1/attendance/summary?session_id={1 + i % sessions}", headers=headers)),
+        "api.GET /client_config": lambda i: checked(client.get("/api/v1/client_config")),
+        "api.POST /sync/push[100]": sync_push,
+        "api.GET /sync/students[500]": lambda i: checked(client.get(
+            "/api/v1/sync/students?after=0&limit=500", headers=headers)),
+    }
+    if background_jobs:
+        # A finished report for the status and download routes
+        report_id = client.post("/api/v1/reports", json={"kind": "attendance_export", "session_ids": [1]},
+                                headers=headers).json()["id"]
+        wait_for_report(client, report_id, headers)
+        cases["api.POST /reports[one session, until done]"] = report_until_done
+        cases["api.GET /reports/{id}"] = lambda i: checked(client.get(f"/api/v1/reports/{report_id}", headers=headers))
+        cases["api.GET /reports/{id}/download"] = lambda i: checked(client.get(
+            f"/api/v1/reports/{report_id}/download", headers=headers))
+    if rows <= FULL_SCAN_LIMIT:
+        cases["api.GET /attendance[all]"] = lambda i: checked(client.get("/api/v1/attendance", headers=headers))
+        cases["api.GET /attendance/summary[all]"] = lambda i: checked(client.get(
+            "/api/v1/attendance/summary", headers=headers))
+    return cases
+
+def end_emitters(SessionLocal):
+    """
+    Stop the beacon emitters that started sessions run. Their heartbeats read
+    the database and, on in-memory SQLite, would share the benchmark's one
+    connection from other threads; the sessions themselves stay open.
+    """
+    with SessionLocal() as db:
+        for session_id in crud.get_open_session_ids(db):
+            get_coordinator().end(db, session_id)
+
+def run_size(database_url, rows: int, only=None):
+    engine = make_engine(database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    print(f"Seeding ~{rows} attendance rows...", file=sys.stderr)
+    student_ids, sessions = seed(engine, rows)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        cases = crud_cases(SessionLocal, student_ids, sessions, rows)
+        cases.update(api_cases(TestClient(app), student_ids, sessions, rows, background_jobs=database_url is not None))
+        end_emitters(SessionLocal)
+        results = {}
+        for name, fn in cases.items():
+            if only and only not in name:
+                continue
+            results[name] = measure(fn, max_runs=MAX_RUNS)
+            end_emitters(SessionLocal)
+            print(f"  {rows:>9} {name:<50} {results[name]['median_ms']:10.3f} ms", file=sys.stderr)
+        return results
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run benchmarks and write a JSON result file")
+    run_parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated attendance row counts")
+    run_parser.add_argument("--output", required=True)
+    run_parser.add_argument("--database-url", help="scratch database to use instead of in-memory SQLite")
+    run_parser.add_argument("--only", help="run only benchmarks whose name contains this")
+
+    compare_parser = commands.add_parser("compare", help="fail if current results regressed")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        # Per-request logging would dominate the timings
+        logging.getLogger().setLevel(logging.WARNING)
+        sizes = [int(size) for size in args.sizes.split(",")]
+        results = {str(size): run_size(args.database_url, size, args.only) for size in sizes}
+        save_results(args.output, results, sizes=sizes,
+                     database="sqlite-memory" if not args.database_url else make_engine(args.database_url).dialect.name)
+        return 0
+
+    regressions = compare(load_results(args.baseline), load_results(args.current), args.tolerance)
+    for size, name, before, after in regressions:
+        print(f"REGRESSION {name} @ {size} rows: {before:.3f} ms -> {after:.3f} ms ({after / before - 1:+.0%})")
+    if not regressions:
+        print("No regressions beyond tolerance")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+Check-in latency with logging off, logging inline, and the queued pipeline.
+
+Every accepted check-in logs one record. "inline" is the old setup (a
+StreamHandler on the root logger, written by the request thread);
+"queued" is configure_logging() with every record kept; "queued+sampled"
+keeps one check-in record in ten. `--sink-delay-ms` makes each write to
+the log sink that much slower, as a stalled pipe or a busy log collector
+would.
+
+Run from the Attendance_Taker directory:
+    python -m benchmarks.bench_logging --sink-delay-ms 0,1 --output logging.json
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# The app's own engine is never used here, but must be constructible without a Postgres driver
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.config import settings
+from backend.app.database import Base, get_db
+from backend.app.logging_config import RequestQueueHandler, configure_logging
+from backend.app.main import app
+
+from .bench_hot_paths import make_engine, seed
+from .harness import measure, save_results
+
+MODES = ["off", "inline", "queued", "queued+sampled"]
+
+class SlowSink:
+    """File wrapper whose writes take at least `delay` seconds."""
+
+    def __init__(self, f, delay: float):
+        self.f = f
+        self.delay = delay
+
+    def write(self, text):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.f.write(text)
+
+    def flush(self):
+        self.f.flush()
+
+def use_logging(mode: str, sink):
+    """Install `mode` on the root logger; returns the queue listener, if any."""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, (RequestQueueHandler, logging.StreamHandler)):
+            root.removeHandler(handler)
+    if mode == "off":
+        root.setLevel(logging.WARNING)
+        return None
+    if mode == "inline":
+        handler = logging.StreamHandler(sink)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+        return None
+    sampling = "attendance.checkins=0.1" if mode == "queued+sampled" else ""
+    return configure_logging("INFO", "json", sampling, stream=sink)
+
+def run(runs: int, delays, rows: int) -> dict:
+    engine = make_engine(None)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    student_ids, _ = seed(engine, rows)
+    # Each case checks in distinct students, plus one for the warm-up
+    runs = min(runs, len(student_ids) - 1)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {settings.PROFESSOR_TOKEN}"}
+    results = {}
+    try:
+        with tempfile.TemporaryFile("w+") as log_file:
+            for delay_ms in delays:
+                sink = SlowSink(log_file, delay_ms / 1000)
+                for mode in MODES:
+                    # A fresh session per case, so every student checks in once
+                    session_id = client.post(
+                        "/api/v1/start_attendance", json={"name": f"Bench {mode}"}, headers=headers
+                    ).json()["id"]
+
+                    def check_in(i):
+                        response = client.post("/api/v1/mark_attendance", json={
+                            "student_id": student_ids[i], "session_id": session_id, "device_id": "bench"})
+                        assert response.status_code == 200, response.text
+
+                    listener = use_logging(mode, sink)
+                    try:
+                        result = measure(check_in, max_runs=runs, max_seconds=30.0)
+                    finally:
+                        if listener:
+                            listener.stop()
+                    results.setdefault(f"delay_{delay_ms}ms", {})[mode] = result
+                    print(f"{delay_ms:>8}{mode:>16}{result['median_ms']:>12.3f}{result['p95_ms']:>12.3f}")
+    finally:
+        use_logging("off", None)
+        app.dependency_overrides.pop(get_db, None)
+        engine.dispose()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200, help="check-ins per case")
+    parser.add_argument("--sink-delay-ms", default="0,1", help="comma-separated extra milliseconds per log write")
+    parser.add_argument("--rows", type=int, default=10_000, help="attendance rows to seed")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    delays = [float(d) for d in args.sink_delay_ms.split(",")]
+    print(f"{'sink ms':>8}{'logging':>16}{'median ms':>12}{'p95 ms':>12}")
+    results = run(args.runs, delays, args.rows)
+    if args.output:
+        save_results(args.output, results, runs=args.runs)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
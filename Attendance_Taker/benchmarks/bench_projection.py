@@ -0,0 +1,117 @@
+"""
+ORM hydration vs column projection for the list endpoints.
+
+Compares, per row, the peak memory (tracemalloc) and CPU time of the old
+`/attendance` and `/sessions` read path (ORM instances validated into
+response models, then serialised) with the projected path (column dicts
+serialised directly).
+
+Run from the Attendance_Taker directory:
+    python -m benchmarks.bench_projection --rows 100000 --output projection.json
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import sessionmaker
+
+from backend.app import crud, schemas
+from backend.app.api import _json_response
+from backend.app.database import Base
+
+from .bench_hot_paths import make_engine, seed
+from .harness import measure, save_results
+
+def orm_path(db, crud_fn, adapter: TypeAdapter) -> bytes:
+    """What the routes did before: hydrate, validate from attributes, serialise."""
+    return adapter.dump_json(adapter.validate_python(crud_fn(db), from_attributes=True))
+
+def projected_path(db, crud_fn) -> bytes:
+    return _json_response(crud_fn(db)).body
+
+def peak_bytes(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run(database_url, rows: int, max_runs: int):
+    engine = make_engine(database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    print(f"Seeding ~{rows} attendance rows...", file=sys.stderr)
+    seed(engine, rows)
+
+    listings = {
+        "attendance": (
+            lambda db: crud.get_attendance(db),
+            lambda db: crud.get_attendance_rows(db),
+            TypeAdapter(List[schemas.Attendance]),
+        ),
+        "sessions": (
+            lambda db: crud.get_beacon_sessions(db, limit=rows),
+            lambda db: crud.get_beacon_session_rows(db, limit=rows),
+            TypeAdapter(List[schemas.BeaconSession]),
+        ),
+    }
+
+    results = {}
+    try:
+        for listing, (orm_fn, rows_fn, adapter) in listings.items():
+            with SessionLocal() as db:
+                # Both paths must produce the same document
+                assert json.loads(orm_path(db, orm_fn, adapter)) == json.loads(projected_path(db, rows_fn))
+                count = len(rows_fn(db))
+
+            for name, fn in (
+                ("orm", lambda: orm_path(db, orm_fn, adapter)),
+                ("projection", lambda: projected_path(db, rows_fn)),
+            ):
+                with SessionLocal() as db:
+                    memory = peak_bytes(fn)
+                with SessionLocal() as db:
+                    timing = measure(lambda i: fn(), max_runs=max_runs, max_seconds=10.0)
+                results[f"{listing}.{name}"] = {
+                    **timing,
+                    "rows": count,
+                    "peak_bytes": memory,
+                    "bytes_per_row": memory / max(count, 1),
+                    "us_per_row": timing["median_ms"] * 1000 / max(count, 1),
+                }
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="approximate attendance row count")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--database-url", help="scratch database to use instead of in-memory SQLite")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.database_url, args.rows, args.runs)
+    print(f"{'path':<24}{'rows':>9}{'median ms':>12}{'us/row':>9}{'bytes/row':>11}")
+    for name, result in results.items():
+        print(f"{name:<24}{result['rows']:>9}{result['median_ms']:>12.1f}"
+              f"{result['us_per_row']:>9.2f}{result['bytes_per_row']:>11.0f}")
+    for listing in ("attendance", "sessions"):
+        orm, projection = results[f"{listing}.orm"], results[f"{listing}.projection"]
+        print(f"{listing}: {orm['median_ms'] / projection['median_ms']:.1f}x faster, "
+              f"{orm['peak_bytes'] / projection['peak_bytes']:.1f}x less peak memory")
+    if args.output:
+        save_results(args.output, {str(args.rows): results}, rows=args.rows)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
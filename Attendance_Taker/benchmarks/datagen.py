@@ -0,0 +1,222 @@
+"""
+Synthetic campus-scale data generator.
+
+Fills `students`, `beacon_sessions` and `attendance` with a configurable
+campus: courses with rosters drawn from a student population, a term of
+weekly lectures, per-student attendance propensities that decay over the
+term, and log-normally distributed late arrivals. Output is deterministic
+for a given spec. Postgres is loaded with COPY; other databases with
+chunked executemany inserts. Campuses with different names can be loaded
+into the same database; sessions are numbered after the ones already there.
+
+Run from the Attendance_Taker directory, against a scratch database:
+    python -m benchmarks.datagen --database-url postgresql://... --students 30000 --courses 400
+    python -m benchmarks.datagen --database-url postgresql://... --name spring27 --seed 43
+"""
+import argparse
+import csv
+import io
+import random
+import sys
+import time
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import create_engine, func, insert, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from backend.app import crud, models
+from backend.app.database import Base
+
+CHUNK_ROWS = 50_000
+
+@dataclass
+class CampusSpec:
+    # Prefix of every student ID and session name, so several campuses or
+    # terms can be loaded into one database side by side
+    name: str = "main"
+    seed: int = 42
+    students: int = 5_000
+    courses: int = 50
+    roster_min: int = 30
+    roster_max: int = 300
+    term_weeks: int = 15
+    sessions_per_week: int = 2
+    term_start: str = "2026-01-12"
+    session_minutes: int = 75
+    # Per-student attendance propensity ~ Beta(alpha, beta); mean alpha / (alpha + beta)
+    propensity_alpha: float = 8.0
+    propensity_beta: float = 2.0
+    # Propensity lost linearly by the end of the term (0.2 = 20% lower in the last week)
+    term_decay: float = 0.2
+    # Minutes after the start a student checks in ~ LogNormal(mu, sigma)
+    late_mu: float = 1.0
+    late_sigma: float = 1.0
+
+    @property
+    def term_sessions(self) -> int:
+        return self.term_weeks * self.sessions_per_week
+
+class CampusGenerator:
+    """Deterministic row streams for one CampusSpec."""
+
+    def __init__(self, spec: CampusSpec, first_session_id: int = 1):
+        self.spec = spec
+        self.first_session_id = first_session_id
+        rng = random.Random(spec.seed)
+        self.student_ids = [f"{spec.name}-s{i:07d}" for i in range(spec.students)]
+        self.propensity = [rng.betavariate(spec.propensity_alpha, spec.propensity_beta) for _ in self.student_ids]
+        self.rosters: List[List[int]] = []
+        self.course_offsets: List[Tuple[int, int]] = []  # (weekday offset, hour) per course
+        for _ in range(spec.courses):
+            size = min(rng.randint(spec.roster_min, spec.roster_max), spec.students)
+            self.rosters.append(sorted(rng.sample(range(spec.students), size)))
+            self.course_offsets.append((rng.randrange(2), rng.choice([8, 10, 12, 14, 16])))
+        self.term_start = datetime.fromisoformat(spec.term_start).replace(tzinfo=timezone.utc)
+
+    def students(self) -> Iterator[dict]:
+        for student_id in self.student_ids:
+            yield {"id": student_id, "name": f"Student {student_id}", "email": f"{student_id}@example.edu"}
+
+    def session_start(self, course: int, index: int) -> datetime:
+        weekday, hour = self.course_offsets[course]
+        week, meeting = divmod(index, self.spec.sessions_per_week)
+        day = week * 7 + weekday + meeting * (7 // self.spec.sessions_per_week)
+        return self.term_start + timedelta(days=day, hours=hour)
+
+    def session_id(self, course: int, index: int) -> int:
+        return self.first_session_id + course * self.spec.term_sessions + index
+
+    def sessions(self) -> Iterator[dict]:
+        length = timedelta(minutes=self.spec.session_minutes)
+        for course in range(self.spec.courses):
+            for index in range(self.spec.term_sessions):
+                start = self.session_start(course, index)
+                yield {
+                    "id": self.session_id(course, index),
+                    "name": f"{self.spec.name} course {course:04d} lecture {index + 1}",
+                    "description": f"Week {index // self.spec.sessions_per_week + 1}",
+                    "is_active": False,
+                    "created_at": start,
+                    "ended_at": start + length,
+                }
+
+    def attendance(self) -> Iterator[Tuple[str, int, str, datetime]]:
+        """(student_id, session_id, device_id, timestamp) tuples, course by course."""
+        spec = self.spec
+        sessions = spec.term_sessions
+        for course, roster in enumerate(self.rosters):
+            # Separate stream per course, so the output doesn't depend on iteration details
+            rng = random.Random(spec.seed * 1_000_003 + course)
+            for index in range(sessions):
+                start = self.session_start(course, index)
+                session_id = self.session_id(course, index)
+                decay = 1 - spec.term_decay * index / max(sessions - 1, 1)
+                for student in roster:
+                    if rng.random() < self.propensity[student] * decay:
+                        late = min(rng.lognormvariate(spec.late_mu, spec.late_sigma), spec.session_minutes)
+                        student_id = self.student_ids[student]
+                        yield student_id, session_id, f"dev-{student_id}", start + timedelta(minutes=late)
+
+def _chunks(rows, size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _copy_attendance(engine: Engine, rows) -> int:
+    """Stream rows into Postgres with COPY, via psycopg2 or psycopg 3."""
+    total = 0
+    statement = "COPY attendance (student_id, session_id, device_id, timestamp) FROM STDIN WITH (FORMAT csv)"
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for chunk in _chunks(rows, CHUNK_ROWS):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows((s, sid, d, ts.isoformat()) for s, sid, d, ts in chunk)
+            buffer.seek(0)
+            if hasattr(cursor, "copy_expert"):
+                cursor.copy_expert(statement, buffer)
+            else:
+                with cursor.copy(statement) as copy:
+                    copy.write(buffer.getvalue())
+            total += len(chunk)
+        raw.commit()
+    finally:
+        raw.close()
+    return total
+
+def _insert_attendance(engine: Engine, rows) -> int:
+    total = 0
+    with engine.begin() as conn:
+        for chunk in _chunks(rows, CHUNK_ROWS):
+            conn.execute(insert(models.Attendance), [
+                {"student_id": s, "session_id": sid, "device_id": d, "timestamp": ts} for s, sid, d, ts in chunk
+            ])
+            total += len(chunk)
+    return total
+
+def generate(engine: Engine, spec: CampusSpec, log=None) -> dict:
+    """Load one synthetic campus into the database behind `engine`."""
+    log = log or (lambda message: None)
+    with engine.connect() as conn:
+        first_session_id = (conn.execute(select(func.max(models.BeaconSession.id))).scalar() or 0) + 1
+
+    generator = CampusGenerator(spec, first_session_id)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        for chunk in _chunks(generator.students(), CHUNK_ROWS):
+            conn.execute(insert(models.Student), chunk)
+        for chunk in _chunks(generator.sessions(), CHUNK_ROWS):
+            conn.execute(insert(models.BeaconSession), chunk)
+        if conn.dialect.name == "postgresql":
+            # Explicit IDs bypass the serial sequence; move it past them
+            conn.execute(text(
+                "SELECT setval(pg_get_serial_sequence('beacon_sessions', 'id'), (SELECT MAX(id) FROM beacon_sessions))"
+            ))
+    log(f"students and sessions loaded in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    if engine.dialect.name == "postgresql":
+        attendance = _copy_attendance(engine, generator.attendance())
+    else:
+        attendance = _insert_attendance(engine, generator.attendance())
+    log(f"{attendance} attendance rows loaded in {time.perf_counter() - started:.1f}s")
+
+    with Session(engine) as db:
+        crud.assign_missing_student_ordinals(db)
+
+    return {
+        "students": spec.students,
+        "sessions": spec.courses * spec.term_sessions,
+        "attendance": attendance,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True, help="scratch database to fill")
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    defaults = CampusSpec()
+    for field in fields(CampusSpec):
+        option = "--" + field.name.replace("_", "-")
+        parser.add_argument(option, type=type(getattr(defaults, field.name)), default=getattr(defaults, field.name))
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url)
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    spec = CampusSpec(**{field.name: getattr(args, field.name) for field in fields(CampusSpec)})
+    counts = generate(engine, spec, log=lambda message: print(message, file=sys.stderr))
+    print(counts)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
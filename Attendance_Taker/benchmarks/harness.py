@@ -0,0 +1,73 @@
+"""
+Timing, JSON baselines and regression checks shared by the benchmarks.
+"""
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict
+
+# Differences below this are treated as noise when comparing (milliseconds)
+NOISE_FLOOR_MS = 0.05
+
+def measure(fn: Callable[[int], object], max_runs: int = 50, max_seconds: float = 1.0, warmup: int = 1) -> Dict[str, float]:
+    """
+    Time `fn(i)` for i = 0, 1, ... until `max_runs` runs or `max_seconds`.
+
+    The run index lets write benchmarks use a fresh key on every call.
+    """
+    for i in range(warmup):
+        fn(-1 - i)
+
+    timings = []
+    deadline = time.perf_counter() + max_seconds
+    for i in range(max_runs):
+        start = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - start) * 1000)
+        if time.perf_counter() > deadline:
+            break
+
+    timings.sort()
+    return {
+        "median_ms": statistics.median(timings),
+        "min_ms": timings[0],
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "runs": len(timings),
+    }
+
+def save_results(path: str, results: dict, **meta):
+    """Write results with enough metadata to judge whether a comparison is fair."""
+    document = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            **meta,
+        },
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+
+def load_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)["results"]
+
+def compare(baseline: dict, current: dict, tolerance: float):
+    """
+    Return (size, name, baseline_ms, current_ms) for every benchmark whose
+    median got slower than the baseline by more than `tolerance` (0.2 = 20%).
+    """
+    regressions = []
+    for size, cases in current.items():
+        for name, result in cases.items():
+            before = baseline.get(size, {}).get(name)
+            if before is None:
+                continue
+            limit = before["median_ms"] * (1 + tolerance)
+            if result["median_ms"] > limit and result["median_ms"] - before["median_ms"] > NOISE_FLOOR_MS:
+                regressions.append((size, name, before["median_ms"], result["median_ms"]))
+    return regressions
\ No newline at end of file
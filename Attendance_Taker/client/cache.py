@@ -0,0 +1,54 @@
+"""
+On-disk cache for the student client.
+
+Holds the resolved device ID and the client config last fetched from the
+backend, so a launch needs neither a subprocess nor a network round trip
+before it starts scanning. Lives under $XDG_CACHE_HOME (or ~/.cache) on
+Linux and macOS and under %LOCALAPPDATA% on Windows.
+"""
+import json
+import os
+import sys
+import tempfile
+from typing import Optional
+
+def cache_dir() -> str:
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(os.path.join("~", "AppData", "Local"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(os.path.join("~", ".cache"))
+    return os.path.join(base, "attendance-client")
+
+class ClientCache:
+    """A small JSON document, read once and replaced atomically on update."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(cache_dir(), "client.json")
+        self._data = None
+
+    def load(self) -> dict:
+        if self._data is None:
+            try:
+                with open(self.path) as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                # Missing or corrupt: start over, the values are all re-derivable
+                self._data = {}
+        return self._data
+
+    def get(self, key: str, default=None):
+        return self.load().get(key, default)
+
+    def update(self, **values):
+        data = {**self.load(), **values}
+        self._data = data
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            # Read-only home: the client still works, the next launch is just slower
+            pass
\ No newline at end of file
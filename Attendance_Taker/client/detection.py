@@ -0,0 +1,141 @@
+"""
+Beacon detection state machine for the student client.
+
+Turns the raw advertisement stream into at most one detection per session,
+and decides how long the scanner may sleep between scan windows.
+"""
+import time
+from typing import Callable, Optional
+
+def parse_session_id(payload: Optional[bytes]) -> Optional[int]:
+    """Decode the session ID carried in the beacon's service data, if any."""
+    if not payload:
+        return None
+    return int.from_bytes(payload[:4], "big")
+
+class AdvertisementHandler:
+    """Scanner callback: passes our beacon's advertisements to the detector."""
+    __slots__ = ("detector", "service_uuid")
+
+    def __init__(self, detector: "BeaconDetector", service_uuid: str):
+        self.detector = detector
+        self.service_uuid = service_uuid.lower()
+
+    def __call__(self, device, advertisement_data):
+        # Runs for every advertisement in range, so keep it cheap
+        if self.service_uuid in advertisement_data.service_uuids:
+            session_id = parse_session_id(advertisement_data.service_data.get(self.service_uuid))
+            self.detector.observe(session_id, advertisement_data.rssi)
+
+class _Track:
+    """Per-session detection state."""
+    __slots__ = ("rssi", "samples", "last_seen", "reported")
+
+    def __init__(self, rssi: float, now: float):
+        self.rssi = rssi
+        self.samples = 1
+        self.last_seen = now
+        self.reported = False
+
+class BeaconDetector:
+    """
+    Debounces advertisements into one detection per session.
+
+    A session is reported once its smoothed RSSI has cleared `rssi_threshold`
+    over `min_samples` advertisements, and not again until it has been out of
+    range for `forget_after` seconds. `observe` does a dict lookup and a few
+    float operations, so its cost per advertisement is constant however dense
+    the traffic is.
+    """
+
+    def __init__(
+        self,
+        on_detect: Callable[[Optional[int]], None],
+        rssi_threshold: float = -85.0,
+        smoothing: float = 0.3,
+        min_samples: int = 2,
+        forget_after: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.on_detect = on_detect
+        self.rssi_threshold = rssi_threshold
+        self.smoothing = smoothing
+        self.min_samples = min_samples
+        self.forget_after = forget_after
+        self.clock = clock
+        self.last_activity = None
+        self._tracks = {}
+
+    def observe(self, session_id: Optional[int], rssi: Optional[float] = None, trusted: bool = False) -> bool:
+        """
+        Feed one advertisement. `rssi=None` means the source has no signal
+        strength and counts as in range. `trusted` sightings (see `confirm`)
+        count as `min_samples` on their own.
+
+        Returns True if this advertisement triggered a detection.
+        """
+        now = self.clock()
+        self.last_activity = now
+        if rssi is None:
+            rssi = 0.0
+
+        track = self._tracks.get(session_id)
+        if track is None or now - track.last_seen > self.forget_after:
+            track = self._tracks[session_id] = _Track(rssi, now)
+        else:
+            # Exponentially weighted moving average smooths out RSSI noise
+            track.rssi += self.smoothing * (rssi - track.rssi)
+            track.samples += 1
+            track.last_seen = now
+        if trusted:
+            track.samples = max(track.samples, self.min_samples)
+
+        if track.reported or track.samples < self.min_samples or track.rssi < self.rssi_threshold:
+            return False
+
+        track.reported = True
+        self.on_detect(session_id)
+        return True
+
+    def confirm(self, session_id: Optional[int]) -> bool:
+        """
+        Feed a sighting that needs no debouncing: the backend's own answer to a
+        poll, or a signed LAN announcement. Neither has RSSI noise to smooth,
+        so waiting for a second sample would only add a polling interval.
+        """
+        return self.observe(session_id, trusted=True)
+
+    def expire(self):
+        """Forget sessions that have been out of range for `forget_after` seconds."""
+        now = self.clock()
+        stale = [sid for sid, track in self._tracks.items() if now - track.last_seen > self.forget_after]
+        for session_id in stale:
+            del self._tracks[session_id]
+
+    def seen_since(self, since: float) -> bool:
+        """Whether any beacon advertised since the given clock reading."""
+        return self.last_activity is not None and self.last_activity >= since
+
+class DutyCycle:
+    """
+    Scan schedule: scan for `scan_window` seconds, then idle.
+
+    The idle period starts at `idle` and grows by `backoff` after every window
+    without a beacon, up to `max_idle`, so an empty room costs little battery.
+    Seeing a beacon resets it.
+    """
+
+    def __init__(self, scan_window: float = 5.0, idle: float = 5.0, max_idle: float = 60.0, backoff: float = 2.0):
+        self.scan_window = scan_window
+        self.base_idle = idle
+        self.max_idle = max_idle
+        self.backoff = backoff
+        self.current_idle = idle
+
+    def next_idle(self, beacon_seen: bool) -> float:
+        """Return how long to idle after a scan window."""
+        if beacon_seen:
+            self.current_idle = self.base_idle
+        else:
+            self.current_idle = min(self.current_idle * self.backoff, self.max_idle)
+        return self.current_idle
\ No newline at end of file
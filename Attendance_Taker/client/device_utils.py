@@ -1,15 +1,48 @@
 """
 Device utility functions for getting unique identifiers.
 """
+import os
 import socket
-import uuid
 import subprocess
 import platform
+from typing import Optional
 
-def get_device_id() -> str:
+from .cache import ClientCache
+
+SYS_CLASS_NET = "/sys/class/net"
+
+def linux_mac_address(sys_class_net: str = SYS_CLASS_NET) -> Optional[str]:
+    """
+    MAC address of the first physical network interface, read from sysfs.
+
+    Interfaces are taken in name order; physical NICs (those with a backing
+    `device`) win over bridges, veths and tunnels, which are only used when
+    nothing else has an address.
+    """
+    try:
+        names = sorted(os.listdir(sys_class_net))
+    except OSError:
+        return None
+    virtual = None
+    for name in names:
+        if name == "lo":
+            continue
+        try:
+            with open(os.path.join(sys_class_net, name, "address")) as f:
+                address = f.read().strip().lower()
+        except OSError:
+            continue
+        if not address or address == "00:00:00:00:00:00":
+            continue
+        if os.path.exists(os.path.join(sys_class_net, name, "device")):
+            return address
+        virtual = virtual or address
+    return virtual
+
+def resolve_device_id() -> str:
     """
-    Get a unique device identifier (MAC address or hostname).
-    
+    Work out a unique device identifier (MAC address or hostname).
+
     Returns:
         str: Device identifier
     """
@@ -32,17 +65,34 @@ def get_device_id() -> str:
             if mac_match:
                 return mac_match.group(1)
         else:
-            # Linux
-            with open('/sys/class/net/eth0/address') as f:
-                return f.read().strip()
+            # Linux: sysfs, no subprocess
+            mac = linux_mac_address()
+            if mac:
+                return mac
     except:
         pass
-    
+
     # Fallback to hostname
     try:
         return socket.gethostname()
     except:
         return "unknown_device"
 
+def get_device_id(cache: Optional[ClientCache] = None, refresh: bool = False) -> str:
+    """
+    Device identifier, resolved once and then read from the client cache.
+
+    Caching also keeps the ID stable when interfaces come and go (docks,
+    USB adapters), so attendance keeps being recorded against one device.
+    """
+    cache = cache or ClientCache()
+    if not refresh:
+        device_id = cache.get("device_id")
+        if device_id:
+            return device_id
+    device_id = resolve_device_id()
+    cache.update(device_id=device_id)
+    return device_id
+
 if __name__ == "__main__":
     print(f"Device ID: {get_device_id()}")
\ No newline at end of file
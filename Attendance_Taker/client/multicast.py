@@ -0,0 +1,101 @@
+"""
+Listener for the backend's LAN session announcements.
+
+When the classroom has no BLE beacon, the backend multicasts signed
+session announcements on the subnet instead. Listening is passive, so
+sessions are discovered within one announcement interval and without any
+request to the backend. Mirrors the codec in backend/app/multicast.py; the
+two must stay byte-compatible.
+"""
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import logging
+import socket
+import struct
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ATTN"
+VERSION = 1
+HEADER = struct.Struct(">4sBIQ")
+TAG_BYTES = 16
+PACKET_BYTES = HEADER.size + TAG_BYTES
+
+def decode_announcement(packet: bytes, key: bytes, max_age: float, now: Optional[float] = None) -> Optional[int]:
+    """Session ID of a valid, fresh announcement; None for anything else."""
+    if len(packet) != PACKET_BYTES:
+        return None
+    header, tag = packet[:HEADER.size], packet[HEADER.size:]
+    magic, version, session_id, issued_at = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        return None
+    if not hmac.compare_digest(tag, hmac.new(key, header, hashlib.sha256).digest()[:TAG_BYTES]):
+        return None
+    age = (time.time() if now is None else now) - issued_at / 1000
+    if abs(age) > max_age:
+        return None
+    return session_id
+
+class _Protocol(asyncio.DatagramProtocol):
+    def __init__(self, listener: "MulticastListener"):
+        self.listener = listener
+
+    def datagram_received(self, data, addr):
+        session_id = decode_announcement(data, self.listener.key, self.listener.max_age)
+        if session_id is None:
+            self.listener.rejected += 1
+            return
+        self.listener.received += 1
+        self.listener.callback(session_id)
+
+class MulticastListener:
+    """
+    Calls `callback(session_id)` for every valid announcement on `group`:`port`.
+
+    Has async `start()` and `stop()` like the BLE scanners, and runs on the
+    caller's event loop.
+    """
+
+    def __init__(self, callback: Callable[[int], None], group: str, port: int, key: str,
+                 max_age: float = 60.0, interface: str = ""):
+        self.callback = callback
+        self.group = group
+        self.port = port
+        self.key = key.encode()
+        self.max_age = max_age
+        self.interface = interface
+        self.received = 0
+        self.rejected = 0
+        self._transport = None
+
+    def _socket(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        # Several clients (or a client and a test) may listen on one machine
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if ipaddress.ip_address(self.group).is_multicast:
+            sock.bind(("", self.port))
+            membership = socket.inet_aton(self.group) + socket.inet_aton(self.interface or "0.0.0.0")
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        else:
+            # Unicast or broadcast address, e.g. 127.0.0.1 on hosts without multicast
+            sock.bind((self.group, self.port))
+        sock.setblocking(False)
+        return sock
+
+    async def start(self):
+        if self._transport is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(lambda: _Protocol(self), sock=self._socket())
+        logger.info(f"Listening for session announcements on {self.group}:{self.port}")
+
+    async def stop(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
\ No newline at end of file
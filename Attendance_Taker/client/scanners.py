@@ -0,0 +1,178 @@
+"""
+Pluggable BLE scanner backends for the student client.
+
+A backend is built with a detection callback `(device, advertisement_data)`
+and has async `start()` and `stop()`: the part of BleakScanner the client
+uses. "bleak" is the real radio. "simulated" replays synthetic
+advertisement streams (beacons for several sessions, foreign devices, RSSI
+noise, packet loss), so detection can be tested and profiled without
+Bluetooth hardware.
+"""
+import asyncio
+import heapq
+import random
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+BEACON_SERVICE_UUID = "0000ffff-0000-1000-8000-00805f9b34fb"
+
+# Service UUIDs seen on phones, headphones and watches in a lecture hall
+FOREIGN_SERVICE_UUIDS = [
+    "0000fe9f-0000-1000-8000-00805f9b34fb",  # Google
+    "0000fd6f-0000-1000-8000-00805f9b34fb",  # Exposure notification
+    "0000febe-0000-1000-8000-00805f9b34fb",  # Bose
+    "0000180f-0000-1000-8000-00805f9b34fb",  # Battery service
+    "0000fe2c-0000-1000-8000-00805f9b34fb",  # Fast pair
+]
+
+class SimulatedDevice:
+    __slots__ = ("address", "name")
+
+    def __init__(self, address: str, name: Optional[str] = None):
+        self.address = address
+        self.name = name
+
+class SimulatedAdvertisement:
+    """Same attributes as bleak's AdvertisementData that the client reads."""
+    __slots__ = ("local_name", "service_uuids", "service_data", "manufacturer_data", "rssi", "tx_power")
+
+    def __init__(self, service_uuids: List[str], service_data: Dict[str, bytes], rssi: int,
+                 manufacturer_data: Optional[Dict[int, bytes]] = None, local_name: Optional[str] = None):
+        self.local_name = local_name
+        self.service_uuids = service_uuids
+        self.service_data = service_data
+        self.manufacturer_data = manufacturer_data or {}
+        self.rssi = rssi
+        self.tx_power = None
+
+@dataclass
+class Advertiser:
+    """One simulated transmitter."""
+    address: str
+    interval: float = 0.1  # Mean seconds between advertisements
+    rssi: float = -70.0  # Mean dBm at the student's laptop
+    rssi_noise: float = 4.0  # Standard deviation, dBm
+    session_id: Optional[int] = None  # Session beacon if set, otherwise a foreign device
+    start: float = 0.0  # Seconds after the simulation starts
+    stop: Optional[float] = None
+    loss: float = 0.0  # Probability an advertisement is not received
+
+def hall(sessions: Dict[int, float], foreign_devices: int = 200, beacon_interval: float = 0.1,
+         foreign_interval: float = 0.1, seed: int = 0) -> List[Advertiser]:
+    """A lecture hall: one beacon per session (session ID -> mean RSSI) among foreign devices."""
+    rng = random.Random(seed)
+    advertisers = [
+        Advertiser(address=f"AA:00:00:00:{session_id >> 8 & 0xFF:02X}:{session_id & 0xFF:02X}",
+                   interval=beacon_interval, rssi=rssi, session_id=session_id)
+        for session_id, rssi in sessions.items()
+    ]
+    for i in range(foreign_devices):
+        advertisers.append(Advertiser(
+            address=":".join(f"{rng.randrange(256):02X}" for _ in range(6)),
+            interval=foreign_interval * rng.uniform(0.5, 2.0),
+            rssi=rng.uniform(-95, -45),
+            start=rng.uniform(0, 1),
+        ))
+    return advertisers
+
+class SimulatedScanner:
+    """
+    Replays advertisements from `advertisers` in time order.
+
+    `replay()` delivers them as fast as possible against a virtual clock
+    (pass `scanner.clock` to the detector); `start()`/`stop()` deliver them
+    in real time, like a radio that is switched on and off.
+    """
+
+    def __init__(self, callback: Callable, advertisers: List[Advertiser], seed: int = 0,
+                 service_uuid: str = BEACON_SERVICE_UUID, track_lag: bool = False):
+        self.callback = callback
+        self.advertisers = advertisers
+        self.service_uuid = service_uuid.lower()
+        self.rng = random.Random(seed)
+        self.now = 0.0
+        self.delivered = 0
+        self.lag = [] if track_lag else None  # Real-time mode: seconds each callback ran behind schedule
+        self._devices = [SimulatedDevice(a.address) for a in advertisers]
+        self._heap = [(a.start, i) for i, a in enumerate(advertisers)]
+        heapq.heapify(self._heap)
+        self._task = None
+        self._origin = None
+
+    def clock(self) -> float:
+        return self.now
+
+    def _advertisement(self, index: int) -> SimulatedAdvertisement:
+        advertiser = self.advertisers[index]
+        rssi = round(self.rng.gauss(advertiser.rssi, advertiser.rssi_noise))
+        if advertiser.session_id is not None:
+            return SimulatedAdvertisement(
+                [self.service_uuid], {self.service_uuid: advertiser.session_id.to_bytes(4, "big")}, rssi
+            )
+        service_uuid = FOREIGN_SERVICE_UUIDS[index % len(FOREIGN_SERVICE_UUIDS)]
+        return SimulatedAdvertisement([service_uuid], {}, rssi, manufacturer_data={0x004C: b"\x10\x05\x01"})
+
+    def events(self, until: float) -> Iterator[Tuple[float, SimulatedDevice, SimulatedAdvertisement]]:
+        """Advertisements received up to `until` seconds, in time order."""
+        heap, rng = self._heap, self.rng
+        while heap and heap[0][0] <= until:
+            at, index = heapq.heappop(heap)
+            advertiser = self.advertisers[index]
+            # BLE adds up to 10 ms of random delay to every advertising interval
+            following = at + advertiser.interval * rng.uniform(0.9, 1.1) + rng.uniform(0, 0.01)
+            if advertiser.stop is None or following < advertiser.stop:
+                heapq.heappush(heap, (following, index))
+            if advertiser.loss and rng.random() < advertiser.loss:
+                continue
+            yield at, self._devices[index], self._advertisement(index)
+
+    def replay(self, events) -> int:
+        """Deliver pre-generated events as fast as possible; returns how many."""
+        callback = self.callback
+        count = 0
+        for at, device, advertisement in events:
+            self.now = at
+            callback(device, advertisement)
+            count += 1
+        self.delivered += count
+        return count
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self._origin is None:
+            self._origin = loop.time() - self.now
+        # The radio was off: drop whatever was transmitted meanwhile
+        for _ in self.events(loop.time() - self._origin):
+            pass
+        self._task = asyncio.create_task(self._run(loop))
+
+    async def _run(self, loop):
+        while self._heap:
+            due = self._origin + self._heap[0][0]
+            delay = due - loop.time()
+            # Yield even when behind schedule, so stop() and the rest of the loop still run
+            await asyncio.sleep(max(delay, 0))
+            for at, device, advertisement in self.events(loop.time() - self._origin):
+                self.now = at
+                if self.lag is not None:
+                    self.lag.append(loop.time() - self._origin - at)
+                self.callback(device, advertisement)
+                self.delivered += 1
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+def make_scanner(backend: str, callback: Callable, simulated_session: int = 1, seed: int = 0):
+    """Scanner for the configured backend."""
+    if backend == "bleak":
+        from bleak import BleakScanner  # Loaded only when the real radio is used
+        return BleakScanner(callback)
+    if backend == "simulated":
+        return SimulatedScanner(callback, hall({simulated_session: -60.0}, seed=seed), seed=seed)
+    raise ValueError(f"Unknown scanner backend: {backend}")
\ No newline at end of file
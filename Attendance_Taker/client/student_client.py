@@ -1,113 +1,218 @@
 """
 Student client for detecting BLE beacons and showing attendance popup.
+
+Startup is kept short: the device ID and the backend's client config come
+from the on-disk cache, Tk, requests and bleak are imported only when
+first needed, and scanning starts before the window is built.
 """
 import asyncio
+import os
+import queue
 import threading
 import json
 import time
-import requests
+import uuid
 import logging
-from tkinter import Tk, Label, Button, messagebox
-from bleak import BleakScanner, BleakClient
-from bleak.backends.device import BLEDevice
-from bleak.backends.scanner import AdvertisementData
 
+from .cache import ClientCache
 from .device_utils import get_device_id
+from .detection import AdvertisementHandler, BeaconDetector, DutyCycle
+from .multicast import MulticastListener
+from .scanners import make_scanner
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Configuration
-BACKEND_URL = "http://localhost:8000/api/v1"
-BEACON_SERVICE_UUID = "0000ffff-0000-1000-8000-00805f9b34fb"
+BACKEND_URL = os.getenv("ATTENDANCE_BACKEND_URL", "http://localhost:8000/api/v1")
+BEACON_SERVICE_UUID = "0000ffff-0000-1000-8000-00805f9b34fb"  # Until the backend's is cached
 SCAN_INTERVAL = 10  # seconds
+REQUEST_TIMEOUT = 5  # seconds
+MARK_RETRIES = 3
+
+# "bleak" (Bluetooth radio) or "simulated" (synthetic hall, for trying the client without hardware)
+SCANNER_BACKEND = os.getenv("ATTENDANCE_SCANNER", "bleak")
+SIMULATED_SESSION = int(os.getenv("ATTENDANCE_SIMULATED_SESSION", "1"))
+
+# LAN session announcements, the backend's fallback beacon. Group and port
+# default to the backend's MULTICAST_* settings once cached; the variables override them.
+MULTICAST_ENABLED = os.getenv("ATTENDANCE_MULTICAST", "1") == "1"
+MULTICAST_GROUP = os.getenv("ATTENDANCE_MULTICAST_GROUP", "")
+MULTICAST_PORT = os.getenv("ATTENDANCE_MULTICAST_PORT", "")
+DEFAULT_MULTICAST_GROUP = "239.255.42.99"
+DEFAULT_MULTICAST_PORT = 50999
+MULTICAST_KEY = os.getenv("ATTENDANCE_MULTICAST_KEY", "default_multicast_key_change_in_production")
+MULTICAST_MAX_AGE = 60  # seconds; older announcements are treated as replays
+
+# Detection and scan duty cycle
+RSSI_THRESHOLD = -85  # dBm, smoothed
+SCAN_WINDOW = 5  # seconds of active scanning per cycle
+SCAN_IDLE = 5  # seconds between windows while a beacon is around
+SCAN_MAX_IDLE = 60  # idle ceiling when no beacon has been seen
+
+GUI_POLL_MS = 100  # How often the GUI picks up detections from the scan thread
 
 class AttendanceClient:
-    def __init__(self, student_id: str):
+    def __init__(self, student_id: str, cache: ClientCache = None):
         self.student_id = student_id
-        self.device_id = get_device_id()
+        self.cache = cache or ClientCache()
+        self.device_id = get_device_id(self.cache)
+        config = self.cache.get("config", {})
+        self.service_uuid = config.get("beacon_service_uuid", BEACON_SERVICE_UUID)
+        self.multicast_group = MULTICAST_GROUP or config.get("multicast_group", DEFAULT_MULTICAST_GROUP)
+        self.multicast_port = int(MULTICAST_PORT or config.get("multicast_port", DEFAULT_MULTICAST_PORT))
         self.beacon_detected = False
         self.current_session_id = None
         self.scanning = False
+        self.scan_started = threading.Event()
+        self.popup_open = False
+        self.root = None
+        # Detections from the scan thread, drained by the GUI; scanning may start before the GUI exists
+        self.detections = queue.SimpleQueue()
+        self.detector = BeaconDetector(self.on_beacon_detected, rssi_threshold=RSSI_THRESHOLD)
+        self.duty_cycle = DutyCycle(scan_window=SCAN_WINDOW, idle=SCAN_IDLE, max_idle=SCAN_MAX_IDLE)
+    
+    def on_beacon_detected(self, session_id):
+        """Called once per session by the detector; hands over to the GUI thread."""
+        logger.info(f"Detected beacon for session {session_id}")
+        self.detections.put(session_id)
+    
+    def poll_detections(self):
+        """GUI thread: show the popup for detections queued by the scan thread."""
+        while not self.detections.empty():
+            self.beacon_detected = True
+            self.current_session_id = self.detections.get()
+            self.show_attendance_popup()
+        self.root.after(GUI_POLL_MS, self.poll_detections)
         
+    async def start_multicast_listener(self):
+        """Listen for LAN session announcements; None if disabled or the socket can't be opened."""
+        if not MULTICAST_ENABLED:
+            return None
+        listener = MulticastListener(
+            self.detector.confirm, self.multicast_group, self.multicast_port, MULTICAST_KEY,
+            max_age=MULTICAST_MAX_AGE
+        )
+        try:
+            await listener.start()
+            return listener
+        except OSError as e:
+            logger.error(f"Error listening for session announcements: {e}")
+            return None
+    
     async def scan_for_beacons(self):
-        """Scan for BLE beacons."""
-        def detection_callback(device: BLEDevice, advertisement_data: AdvertisementData):
-            if BEACON_SERVICE_UUID.lower() in advertisement_data.service_uuids:
-                logger.info(f"Detected beacon from {device.name}")
-                self.beacon_detected = True
-                # Extract session ID from beacon data (simplified)
-                # In a real implementation, you'd parse the beacon data properly
-                self.current_session_id = 1  # Placeholder
-                
-                # Show popup in main thread
-                self.root.after(0, self.show_attendance_popup)
-        
+        """Scan for BLE beacons in duty-cycled windows, and for LAN announcements throughout."""
         self.scanning = True
-        scanner = BleakScanner(detection_callback)
+        # Announcements feed the same detector, so a session heard both ways is reported once
+        listener = await self.start_multicast_listener()
         
         try:
-            await scanner.start()
+            handler = AdvertisementHandler(self.detector, self.service_uuid)
+            scanner = make_scanner(SCANNER_BACKEND, handler, simulated_session=SIMULATED_SESSION)
             while self.scanning:
-                await asyncio.sleep(1)
-            await scanner.stop()
+                window_start = self.detector.clock()
+                await scanner.start()
+                self.scan_started.set()
+                await asyncio.sleep(self.duty_cycle.scan_window)
+                await scanner.stop()
+                
+                self.detector.expire()
+                idle = self.duty_cycle.next_idle(self.detector.seen_since(window_start))
+                await asyncio.sleep(idle)
         except Exception as e:
             logger.error(f"Error scanning for beacons: {e}")
-            self.fallback_to_polling()
+            if listener is None:
+                self.fallback_to_polling()
+            else:
+                logger.info("BLE unavailable; relying on LAN session announcements")
+                self.scan_started.set()
+                while self.scanning:
+                    await asyncio.sleep(1)
+        finally:
+            if listener is not None:
+                await listener.stop()
     
     def fallback_to_polling(self):
         """Fallback to HTTP polling if BLE is not available."""
+        import requests
+        
         logger.info("Falling back to HTTP polling")
+        self.scan_started.set()
         while self.scanning:
             try:
-                response = requests.get(f"{BACKEND_URL}/current_session")
+                response = requests.get(f"{BACKEND_URL}/current_session", timeout=REQUEST_TIMEOUT)
                 if response.status_code == 200 and response.json():
-                    session = response.json()
-                    self.current_session_id = session["id"]
-                    self.beacon_detected = True
-                    self.root.after(0, self.show_attendance_popup)
-                    # Wait a while after detection
-                    time.sleep(60)
-                else:
-                    time.sleep(SCAN_INTERVAL)
+                    # The server's answer is authoritative: detected on the first poll, then debounced
+                    self.detector.confirm(response.json()["id"])
+                time.sleep(SCAN_INTERVAL)
             except requests.RequestException as e:
                 logger.error(f"HTTP polling error: {e}")
                 time.sleep(SCAN_INTERVAL)
     
     def show_attendance_popup(self):
         """Show attendance confirmation popup."""
-        if not self.beacon_detected:
+        from tkinter import messagebox
+        
+        if not self.beacon_detected or self.popup_open:
             return
-            
-        result = messagebox.askyesno(
-            "Attendance Confirmation",
-            "You are in class. Mark attendance?",
-            icon="question"
-        )
         
-        if result:
-            self.mark_attendance()
+        self.popup_open = True
+        try:
+            result = messagebox.askyesno(
+                "Attendance Confirmation",
+                "You are in class. Mark attendance?",
+                icon="question"
+            )
+            
+            if result:
+                self.mark_attendance()
+        finally:
+            self.popup_open = False
         
         self.beacon_detected = False
     
     def mark_attendance(self):
         """Mark attendance on the backend."""
+        import requests
+        from tkinter import messagebox
+        
         try:
+            if self.current_session_id is None:
+                # Beacon carried no session ID; ask the backend which one is live
+                response = requests.get(f"{BACKEND_URL}/current_session")
+                session = response.json() if response.status_code == 200 else None
+                if not session:
+                    messagebox.showwarning("Notice", "No active session found")
+                    return
+                self.current_session_id = session["id"]
+            
             data = {
                 "student_id": self.student_id,
                 "session_id": self.current_session_id,
                 "device_id": self.device_id
             }
             
-            response = requests.post(
-                f"{BACKEND_URL}/mark_attendance",
-                json=data
-            )
+            # Same key on every retry, so a lost response can't double-mark
+            headers = {"Idempotency-Key": uuid.uuid4().hex}
+            for attempt in range(MARK_RETRIES):
+                try:
+                    response = requests.post(
+                        f"{BACKEND_URL}/mark_attendance",
+                        json=data,
+                        headers=headers,
+                        timeout=REQUEST_TIMEOUT
+                    )
+                    break
+                except (requests.Timeout, requests.ConnectionError) as e:
+                    if attempt == MARK_RETRIES - 1:
+                        raise
+                    logger.warning(f"Retrying attendance after error: {e}")
+                    time.sleep(2 ** attempt)
             
             if response.status_code == 200:
                 messagebox.showinfo("Success", "Attendance marked successfully!")
-            elif response.status_code == 400:
+            elif response.status_code in (400, 404):
                 messagebox.showwarning("Notice", response.json().get("detail", "Attendance already marked"))
             else:
                 messagebox.showerror("Error", "Failed to mark attendance")
@@ -116,8 +221,36 @@ class AttendanceClient:
             logger.error(f"Error marking attendance: {e}")
             messagebox.showerror("Error", "Could not connect to attendance server")
     
+    def start_scanning(self) -> threading.Thread:
+        """Start beacon scanning in a background thread."""
+        def scan():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.scan_for_beacons())
+        
+        scan_thread = threading.Thread(target=scan, name="beacon-scan")
+        scan_thread.daemon = True
+        scan_thread.start()
+        return scan_thread
+    
+    def refresh_config(self):
+        """Cache the backend's client config for the next launch; also loads requests before it is needed."""
+        import requests
+        
+        try:
+            response = requests.get(f"{BACKEND_URL}/client_config", timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                self.cache.update(config=response.json())
+        except requests.RequestException as e:
+            logger.warning(f"Could not refresh client config: {e}")
+    
     def run(self):
         """Run the client application."""
+        # Scan first: the first window is already open while Tk loads and the GUI is built
+        self.start_scanning()
+        
+        from tkinter import Tk, Label
+        
         # Create GUI
         self.root = Tk()
         self.root.title("Attendance Client")
@@ -126,16 +259,9 @@ class AttendanceClient:
         Label(self.root, text="Attendance Client", font=("Arial", 16)).pack(pady=10)
         Label(self.root, text=f"Student ID: {self.student_id}").pack(pady=5)
         Label(self.root, text="Waiting for class beacon...").pack(pady=5)
+        self.root.after(GUI_POLL_MS, self.poll_detections)
         
-        # Start beacon scanning in background thread
-        def start_scanning():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(self.scan_for_beacons())
-        
-        scan_thread = threading.Thread(target=start_scanning)
-        scan_thread.daemon = True
-        scan_thread.start()
+        threading.Thread(target=self.refresh_config, name="config-refresh", daemon=True).start()
         
         # Run GUI
         self.root.mainloop()
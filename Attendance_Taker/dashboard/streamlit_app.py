@@ -7,6 +7,11 @@ import requests
 import plotly.express as px
 from datetime import datetime, timedelta
 import os
+import json
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -15,6 +20,8 @@ load_dotenv()
 # Configuration
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000/api/v1")
 PROFESSOR_TOKEN = os.getenv("PROFESSOR_TOKEN", "default_professor_token")
+PAGE_SIZES = [25, 50, 100, 250]
+SORT_LABELS = {"timestamp": "Time", "student_id": "Student", "session_id": "Session"}
 
 # Set page config
 st.set_page_config(
@@ -40,7 +47,7 @@ def make_api_call(endpoint, method="GET", data=None):
         else:
             return None
         
-        if response.status_code == 200:
+        if response.status_code in (200, 202):
             return response.json()
         else:
             st.error(f"API Error: {response.status_code} - {response.text}")
@@ -49,6 +56,59 @@ def make_api_call(endpoint, method="GET", data=None):
         st.error(f"Connection Error: {e}")
         return None
 
+def fetch_json(endpoint):
+    """GET without any Streamlit calls, so it can run off the script thread; raises on failure."""
+    headers = {"Authorization": f"Bearer {PROFESSOR_TOKEN}"}
+    response = requests.get(f"{BACKEND_URL}/{endpoint}", headers=headers, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+@st.cache_resource
+def prefetch_pool():
+    # Shared by every viewer; each keeps at most one next page in flight
+    return ThreadPoolExecutor(max_workers=4)
+
+def load_page(paging, params, cursor):
+    """The page at `cursor`, taken from the prefetch when it was the one fetched ahead."""
+    prefetched = paging.pop("prefetch", None)
+    if prefetched and prefetched[0] == cursor:
+        try:
+            return prefetched[1].result()
+        except requests.exceptions.RequestException:
+            pass  # Fetch it again below, which reports the error
+    query = {**params, "cursor": cursor} if cursor else params
+    return make_api_call(f"attendance/page?{urlencode(query)}")
+
+def prefetch_page(paging, params, cursor):
+    query = urlencode({**params, "cursor": cursor})
+    paging["prefetch"] = (cursor, prefetch_pool().submit(fetch_json, f"attendance/page?{query}"))
+
+def download_report(job_id):
+    """The finished artifact as a file, streamed to disk rather than held in memory; raises on failure."""
+    headers = {"Authorization": f"Bearer {PROFESSOR_TOKEN}"}
+    url = f"{BACKEND_URL}/reports/{job_id}/download"
+    artifact = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+    with requests.get(url, headers=headers, stream=True, timeout=(5, 60)) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=1 << 16):
+            artifact.write(chunk)
+    artifact.seek(0)
+    return artifact
+
+def stream_session_events(session_id):
+    """Yield (event, data) pairs from a session's live check-in stream."""
+    headers = {"Authorization": f"Bearer {PROFESSOR_TOKEN}"}
+    url = f"{BACKEND_URL}/sessions/{session_id}/stream"
+    with requests.get(url, headers=headers, stream=True, timeout=(5, 60)) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event:
+                yield event, json.loads(line[len("data: "):])
+                event = None
+
 # Sidebar filters
 st.sidebar.header("Filters")
 sessions_data = make_api_call("sessions")
@@ -68,50 +128,81 @@ date_range = st.sidebar.date_input(
     max_value=datetime.now()
 )
 
-# Fetch attendance data
-attendance_data = make_api_call(f"attendance?session_id={selected_session}" if selected_session else "attendance")
+# Only aggregates and one page of records come from the server, however many rows match
+attendance_params = {}
+if selected_session:
+    attendance_params["session_id"] = selected_session
+if len(date_range) == 2:
+    attendance_params["start"] = datetime.combine(date_range[0], datetime.min.time()).isoformat()
+    attendance_params["end"] = datetime.combine(date_range[1] + timedelta(days=1), datetime.min.time()).isoformat()
+summary = make_api_call(f"attendance/summary?{urlencode(attendance_params)}" if attendance_params else "attendance/summary")
 
-if attendance_data:
-    # Convert to DataFrame
-    df = pd.DataFrame(attendance_data)
-    
-    # Convert timestamp to datetime
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    
-    # Apply date filter
-    if len(date_range) == 2:
-        start_date, end_date = date_range
-        df = df[(df["timestamp"].dt.date >= start_date) & (df["timestamp"].dt.date <= end_date)]
-    
-    # Display data
-    st.subheader("Attendance Records")
-    st.dataframe(df)
-    
+if summary and summary["total"]:
     # Statistics
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total Records", len(df))
+        st.metric("Total Records", summary["total"])
     with col2:
-        st.metric("Unique Students", df["student_id"].nunique())
+        st.metric("Unique Students", summary["unique_students"])
     with col3:
-        st.metric("Latest Record", df["timestamp"].max().strftime("%Y-%m-%d %H:%M"))
+        st.metric("Latest Record", pd.to_datetime(summary["latest_check_in"]).strftime("%Y-%m-%d %H:%M"))
+    
+    # Display data, one server-sorted page at a time
+    st.subheader("Attendance Records")
+    col_sort, col_order, col_size = st.columns(3)
+    with col_sort:
+        sort = st.selectbox("Sort by", options=list(SORT_LABELS), format_func=SORT_LABELS.get)
+    with col_order:
+        order = st.radio("Order", options=["desc", "asc"], horizontal=True,
+                         format_func=lambda o: "Newest first" if o == "desc" else "Oldest first")
+    with col_size:
+        page_size = st.selectbox("Rows per page", options=PAGE_SIZES, index=2)
+    page_params = {**attendance_params, "sort": sort, "order": order, "limit": page_size}
+    
+    # Cursors of the pages before this one; any change of filter or sort starts over
+    view = tuple(sorted(page_params.items()))
+    paging = st.session_state.get("attendance_paging")
+    if not paging or paging["view"] != view:
+        paging = st.session_state["attendance_paging"] = {"view": view, "cursors": [None]}
+    page = load_page(paging, page_params, paging["cursors"][-1])
+    
+    if page:
+        df = pd.DataFrame(page["items"])
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        st.dataframe(df)
+        
+        next_cursor = page["next_cursor"]
+        if next_cursor:
+            # Fetched while the current page is being read, so "Next" rarely waits
+            prefetch_page(paging, page_params, next_cursor)
+        page_count = -(-summary["total"] // page_size)
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            st.button("Previous", disabled=len(paging["cursors"]) == 1,
+                      on_click=lambda: paging["cursors"].pop())
+        with col_page:
+            st.caption(f"Page {len(paging['cursors'])} of {page_count}")
+        with col_next:
+            st.button("Next", disabled=not next_cursor,
+                      on_click=lambda: paging["cursors"].append(next_cursor))
     
     # Visualization
     st.subheader("Visualization")
     
     # Daily attendance count
-    daily_count = df.groupby(df["timestamp"].dt.date).size().reset_index(name="count")
-    fig_daily = px.bar(daily_count, x="timestamp", y="count", title="Daily Attendance")
+    daily_count = pd.DataFrame(summary["daily"], columns=["date", "count"])
+    fig_daily = px.bar(daily_count, x="date", y="count", title="Daily Attendance")
     st.plotly_chart(fig_daily)
     
     # Student attendance count
-    student_count = df.groupby("student_id").size().reset_index(name="count")
-    fig_student = px.bar(student_count, x="student_id", y="count", title="Attendance by Student")
+    student_count = pd.DataFrame(summary["top_students"], columns=["student_id", "count"])
+    fig_student = px.bar(student_count, x="student_id", y="count", title="Attendance by Student (most frequent)")
     st.plotly_chart(fig_student)
     
     # Export functionality
     st.subheader("Export Data")
-    if st.button("Export to CSV"):
+    st.caption("Exports the page shown above; use Reports below for every matching record.")
+    if page and st.button("Export to CSV"):
         csv = df.to_csv(index=False)
         st.download_button(
             label="Download CSV",
@@ -119,6 +210,40 @@ if attendance_data:
             file_name="attendance_records.csv",
             mime="text/csv"
         )
+    
+    # Large reports are built by the backend's report workers, not in this process
+    st.subheader("Reports")
+    report_kind = st.selectbox(
+        "Report",
+        options=["term_summary", "attendance_export"],
+        format_func=lambda kind: {"term_summary": "Term summary per student", "attendance_export": "All check-ins"}[kind]
+    )
+    report_format = st.radio("Format", options=["csv", "json"], horizontal=True)
+    if st.button("Generate Report"):
+        request = {"kind": report_kind, "format": report_format}
+        if len(date_range) == 2:
+            request["start"] = datetime.combine(date_range[0], datetime.min.time()).isoformat()
+            request["end"] = datetime.combine(date_range[1] + timedelta(days=1), datetime.min.time()).isoformat()
+        job = make_api_call("reports", method="POST", data=request)
+        if job:
+            progress = st.progress(0.0, text="Queued")
+            while job and job["status"] in ("queued", "running"):
+                time.sleep(0.5)
+                job = make_api_call(f"reports/{job['id']}")
+                if job:
+                    progress.progress(job["progress"], text=job["status"].capitalize())
+            if job and job["status"] == "done":
+                try:
+                    st.download_button(
+                        label="Download Report",
+                        data=download_report(job["id"]),
+                        file_name=f"{report_kind}.{report_format}",
+                        mime="text/csv" if report_format == "csv" else "application/json"
+                    )
+                except requests.exceptions.RequestException as e:
+                    st.error(f"Report download failed: {e}")
+            elif job:
+                st.error(f"Report failed: {job['error']}")
 else:
     st.warning("No attendance data available or unable to connect to server.")
 
@@ -143,6 +268,23 @@ if st.sidebar.button("Start New Session"):
 # Stop active session
 active_session = make_api_call("current_session")
 if active_session:
+    # Live roll call: one streaming connection instead of rerunning the page
+    st.subheader(f"Live Roll Call: {active_session['name']}")
+    if st.button("Watch Check-ins Live"):
+        headcount = st.empty()
+        recent = st.empty()
+        arrivals = []
+        try:
+            for event, data in stream_session_events(active_session["id"]):
+                headcount.metric("Checked In", data["count"])
+                if event == "checkin":
+                    arrivals = [c["student_id"] for c in reversed(data["checkins"])] + arrivals
+                    recent.write(pd.DataFrame({"student_id": arrivals[:20]}))
+                elif event == "end":
+                    st.info("Session ended")
+        except requests.exceptions.RequestException as e:
+            st.error(f"Live stream interrupted: {e}")
+    
     if st.sidebar.button("Stop Current Session"):
         result = make_api_call("stop_attendance", method="POST", data={"session_id": active_session["id"]})
         if result:
@@ -1,15 +1,52 @@
 """
 Tests for the FastAPI endpoints.
 """
+import asyncio
+import concurrent.futures
+import csv
+import io
+import json
+import logging
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+import anyio
+import httpx
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from backend.app.main import app
-from backend.app.database import Base, get_db
+from backend.app.database import Base, get_db, get_read_db, make_engine, ReplicaRouter
 from backend.app.config import settings
+from backend.app.coordinator import DatabaseCoordinator
+from backend.app.bitmap import RoaringBitmap
+from backend.app.bitmap_index import session_bitmap_index
+from backend.app.roster import BloomFilter, RosterFilter
+from backend.app.live import session_events
+from backend.app.scheduler import close_expired_sessions, tick as scheduler_tick
+from backend.app.edge import EdgeSyncer, LocalUpstream, merge_batch
+from backend.app.reports import ReportRunner
+from backend.app.beacon import adopt_orphaned_sessions, emit_fallback_beacon
+from backend.app.coordinator import get_coordinator
+from backend.app import multicast
+from backend.app.logging_config import RequestQueueHandler, configure_logging
+from backend.app import crud, idempotency, models, schemas
+from client.detection import AdvertisementHandler, BeaconDetector, DutyCycle
+from client.scanners import BEACON_SERVICE_UUID, SimulatedScanner, hall
+from client.multicast import MulticastListener, decode_announcement
+from client.device_utils import linux_mac_address
+from benchmarks.datagen import CampusGenerator, CampusSpec, generate
 
 # Test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -34,6 +71,12 @@ app.dependency_overrides[get_db] = override_get_db
 # Test client
 client = TestClient(app)
 
+# Import-time budget for `backend.app.main` (microseconds), and what it must not load
+IMPORT_TOTAL_BUDGET_US = 3_000_000
+IMPORT_FORBIDDEN_MODULES = ("bleak", "numpy", "pandas", "tkinter", "plotly", "streamlit", "urllib.request")
+# Student client launch to first scan window, with a warm cache (milliseconds)
+CLIENT_STARTUP_BUDGET_MS = 300
+
 # Test data
 TEST_PROFESSOR_TOKEN = "test_professor_token"
 TEST_STUDENT_ID = "test_student_123"
@@ -44,7 +87,21 @@ def test_db():
     """Create test database and tables."""
     Base.metadata.create_all(bind=engine)
     yield
+    # Emitter threads check the session on every heartbeat; stop them before the tables go
+    with TestingSessionLocal() as db:
+        for session_id in crud.get_open_session_ids(db):
+            get_coordinator().end(db, session_id)
     Base.metadata.drop_all(bind=engine)
+    session_bitmap_index.reset()
+
+def create_student(student_id=TEST_STUDENT_ID):
+    """Add a student to the roster."""
+    response = client.post(
+        "/api/v1/students",
+        json={"id": student_id, "name": student_id, "email": f"{student_id}@example.edu"},
+        headers={"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    )
+    assert response.status_code == 200
 
 def test_health_check():
     """Test health check endpoint."""
@@ -73,6 +130,7 @@ def test_start_attendance_with_token(test_db):
 
 def test_mark_attendance(test_db):
     """Test marking attendance."""
+    create_student()
     # First create a session
     session_response = client.post(
         "/api/v1/start_attendance",
@@ -96,6 +154,7 @@ def test_mark_attendance(test_db):
 
 def test_mark_duplicate_attendance(test_db):
     """Test marking duplicate attendance."""
+    create_student()
     # First create a session
     session_response = client.post(
         "/api/v1/start_attendance",
@@ -118,8 +177,40 @@ def test_mark_duplicate_attendance(test_db):
     assert response2.status_code == 400
     assert "already marked" in response2.json()["detail"]
 
+def test_mark_attendance_maps_constraint_errors(test_db, monkeypatch):
+    """A check-in that loses a race is a duplicate only if the unique index fired; a missing row is a 404."""
+    create_student()
+    session_id = client.post(
+        "/api/v1/start_attendance", json={"name": "Lecture"},
+        headers={"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    ).json()["id"]
+    attendance_data = {"student_id": TEST_STUDENT_ID, "session_id": session_id, "device_id": TEST_DEVICE_ID}
+    assert client.post("/api/v1/mark_attendance", json=attendance_data).status_code == 200
+    
+    # Skip the pre-check, as if a concurrent request committed in between
+    monkeypatch.setattr(crud, "get_attendance_by_student_and_session", lambda db, student_id, session_id: None)
+    response = client.post("/api/v1/mark_attendance", json=attendance_data)
+    assert response.status_code == 400
+    assert "already marked" in response.json()["detail"]
+    
+    strict_engine = create_engine("sqlite://")
+    event.listen(strict_engine, "connect", lambda conn, record: conn.execute("PRAGMA foreign_keys=ON"))
+    Base.metadata.create_all(bind=strict_engine)
+    with sessionmaker(bind=strict_engine)() as db, pytest.raises(IntegrityError) as foreign_key_error:
+        crud.create_attendance(db, schemas.AttendanceCreate(**attendance_data))
+    strict_engine.dispose()
+    assert crud.is_foreign_key_violation(foreign_key_error.value)
+    assert not crud.is_duplicate_attendance(foreign_key_error.value)
+    
+    def deleted_meanwhile(db, attendance):
+        raise foreign_key_error.value
+    monkeypatch.setattr(crud, "create_attendance", deleted_meanwhile)
+    response = client.post("/api/v1/mark_attendance", json=dict(attendance_data, student_id="ghost"))
+    assert response.status_code == 404
+
 def test_get_attendance(test_db):
     """Test getting attendance records."""
+    create_student()
     # First create a session and mark attendance
     session_response = client.post(
         "/api/v1/start_attendance",
@@ -162,4 +253,1021 @@ def test_get_current_session(test_db):
     response = client.get("/api/v1/current_session")
     assert response.status_code == 200
     assert response.json() is not None
-    assert response.json()["is_active"] == True
\ No newline at end of file
+    assert response.json()["is_active"] == True
+
+def test_database_coordinator_single_emitter(test_db):
+    """Only one worker may hold a session's emitter until it is ended."""
+    session_id = client.post(
+        "/api/v1/start_attendance",
+        json={"name": "Test Session", "description": "Test Description"},
+        headers={"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    ).json()["id"]
+    
+    db = TestingSessionLocal()
+    try:
+        worker_a = DatabaseCoordinator(ttl=30)
+        worker_b = DatabaseCoordinator(ttl=30)
+        
+        token = worker_a.claim(db, session_id)
+        assert token is not None
+        assert worker_b.claim(db, session_id) is None
+        assert worker_a.renew(db, session_id, token)
+        
+        # Stopping from any worker revokes the lease
+        worker_b.end(db, session_id)
+        assert not worker_a.renew(db, session_id, token)
+        assert worker_b.claim(db, session_id) is not None
+    finally:
+        db.close()
+
+def test_lapsed_lease_is_taken_over(test_db, monkeypatch):
+    """A crashed worker's session gets a new emitter instead of going silent."""
+    session_id = client.post(
+        "/api/v1/start_attendance",
+        json={"name": "Test Session"},
+        headers={"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    ).json()["id"]
+    
+    db = TestingSessionLocal()
+    try:
+        crashed = DatabaseCoordinator(ttl=30)
+        survivor = DatabaseCoordinator(ttl=30)
+        token = crashed.claim(db, session_id)
+        db.query(models.BeaconLease).update({"expires_at": time.time() - 1})
+        db.commit()
+        assert not survivor.is_emitting(db, session_id)
+        assert survivor.claim(db, session_id) is not None
+        assert not crashed.renew(db, session_id, token)
+        
+        # The scheduler tick does the same for the configured coordinator
+        get_coordinator().end(db, session_id)
+        assert adopt_orphaned_sessions(db) == [session_id]
+        assert get_coordinator().is_emitting(db, session_id)
+        assert adopt_orphaned_sessions(db) == []
+        
+        # Stopped sessions are neither renewed nor adopted; the session is closed before
+        # its lease goes, so no other worker's tick sees it open and unowned in between
+        coordinator = get_coordinator()
+        active_at_end = []
+        
+        def end(end_db, ended_id):
+            with TestingSessionLocal() as check_db:
+                active_at_end.append(crud.get_beacon_session(check_db, ended_id).is_active)
+            type(coordinator).end(coordinator, end_db, ended_id)
+        monkeypatch.setattr(coordinator, "end", end)
+        client.post(
+            f"/api/v1/stop_attendance?session_id={session_id}",
+            headers={"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+        )
+        assert active_at_end == [False]
+        assert adopt_orphaned_sessions(db) == []
+    finally:
+        db.close()
+
+def test_scheduler_leaves_edge_sessions_to_their_node(test_db):
+    """A running session synced from an edge node keeps the node's beacon; the server starts none."""
+    with TestingSessionLocal() as db:
+        result = merge_batch(db, schemas.EdgeSyncBatch(node_id="room-101", sessions=[schemas.EdgeSession(
+            id=1, name="Lecture", is_active=True, created_at=datetime.now(timezone.utc)
+        )]))
+        central_id = result.sessions[1]
+        assert crud.get_beacon_session(db, central_id).is_active
+        
+        scheduler_tick(db)
+        assert not get_coordinator().is_emitting(db, central_id)
+
+def test_backend_import_is_fast_and_side_effect_free():
+    """Importing the app must not touch the database or load the BLE stack or other heavy modules."""
+    env = dict(os.environ, DATABASE_URL="sqlite:////nonexistent/attendance.db")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         "import json, sys, backend.app.main; print(json.dumps(sorted(sys.modules)))"],
+        capture_output=True, text=True, env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    assert result.returncode == 0, result.stderr
+    
+    timings = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "self [us]" not in line:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            timings[name.strip()] = (int(self_us), int(cumulative_us))
+    
+    # Which modules load is stable across machines; their timings are not, so only the total is timed
+    loaded = set(json.loads(result.stdout))
+    assert "backend.app.main" in loaded
+    assert loaded.isdisjoint(IMPORT_FORBIDDEN_MODULES), loaded & set(IMPORT_FORBIDDEN_MODULES)
+    assert timings["backend.app.main"][1] < IMPORT_TOTAL_BUDGET_US
+
+def test_beacon_detector_debounces_per_session():
+    """A burst of advertisements yields one detection per session."""
+    now = [0.0]
+    detected = []
+    detector = BeaconDetector(detected.append, rssi_threshold=-80, min_samples=2,
+                              forget_after=60, clock=lambda: now[0])
+    
+    for _ in range(1000):
+        now[0] += 0.01
+        detector.observe(7, -60)
+        detector.observe(9, -95)  # Too far away to count
+    assert detected == [7]
+    
+    # Reported again only after the session was out of range for a while
+    now[0] += 61
+    detector.observe(7, -60)
+    detector.observe(7, -60)
+    assert detected == [7, 7]
+    
+    # Server-confirmed sessions (HTTP polling, signed announcements) need a single sighting
+    assert detector.confirm(11)
+    assert not detector.confirm(11)
+    assert detected == [7, 7, 11]
+
+def test_duty_cycle_backs_off_without_beacons():
+    """Idle time grows while the room is empty and resets on a beacon."""
+    duty = DutyCycle(scan_window=5, idle=5, max_idle=30, backoff=2)
+    assert [duty.next_idle(False) for _ in range(4)] == [10, 20, 30, 30]
+    assert duty.next_idle(True) == 5
+
+def test_replica_router_falls_back_when_lagging():
+    """Replicas beyond the allowed lag are skipped in favour of the primary."""
+    replica = create_engine("sqlite://")
+    assert ReplicaRouter([replica], max_lag=5, check_interval=60).pick() is replica
+    assert ReplicaRouter([replica], max_lag=-1, check_interval=60).pick() is None
+    assert ReplicaRouter([], max_lag=5, check_interval=60).pick() is None
+
+def test_analytics_rates_and_at_risk(test_db, tmp_path):
+    """Rates and absence streaks reflect attendance across sessions."""
+    headers = {"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    create_student("regular")
+    create_student()
+    for attended in [True, False, False, False]:
+        session_id = client.post(
+            "/api/v1/start_attendance", json={"name": "Lecture"}, headers=headers
+        ).json()["id"]
+        client.post("/api/v1/mark_attendance", json={
+            "student_id": "regular", "session_id": session_id, "device_id": TEST_DEVICE_ID
+        })
+        if attended:
+            client.post("/api/v1/mark_attendance", json={
+                "student_id": TEST_STUDENT_ID, "session_id": session_id, "device_id": TEST_DEVICE_ID
+            })
+    
+    response = client.get(f"/api/v1/analytics/students/{TEST_STUDENT_ID}", headers=headers)
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["sessions_held"] == 4
+    assert stats["attendance_rate"] == 0.25
+    assert stats["current_absence_streak"] == 3
+    
+    response = client.get("/api/v1/analytics/at_risk?min_rate=0.5", headers=headers)
+    assert [s["student_id"] for s in response.json()] == [TEST_STUDENT_ID]
+    assert client.get("/api/v1/analytics/students?skip=-5", headers=headers).status_code == 422
+    
+    # A row that commits after one with a higher ID was read is still counted
+    create_student("late")
+    with TestingSessionLocal() as db:
+        session_ids = [row["id"] for row in crud.get_beacon_session_rows(db, limit=4)]
+        db.add(models.Attendance(id=100, student_id="late", session_id=session_ids[0], device_id=TEST_DEVICE_ID))
+        db.commit()
+    assert client.get("/api/v1/analytics/students/late", headers=headers).json()["attendance_rate"] == 0.25
+    with TestingSessionLocal() as db:
+        db.add(models.Attendance(id=90, student_id="late", session_id=session_ids[1], device_id=TEST_DEVICE_ID))
+        db.commit()
+    assert client.get("/api/v1/analytics/students/late", headers=headers).json()["attendance_rate"] == 0.5
+    
+    # A replica that trails the primary is not mistaken for rebuilt tables
+    from backend.app.analytics import attendance_matrix
+    replica = create_engine(f"sqlite:///{tmp_path}/replica.db")
+    Base.metadata.create_all(bind=replica)
+    with sessionmaker(bind=replica)() as db, attendance_matrix.lock:
+        attendance_matrix.refresh(db)
+    replica.dispose()
+    assert attendance_matrix.last_attendance_id == 100
+    assert client.get("/api/v1/analytics/students/late", headers=headers).json()["attendance_rate"] == 0.5
+
+def test_roaring_bitmap_set_algebra_and_serialisation():
+    """Bitmaps behave like sets and survive a round trip through bytes."""
+    a = RoaringBitmap(range(0, 200000, 2))
+    b = RoaringBitmap([1, 2, 4, 70000, 199999])
+    assert set(a & b) == {2, 4, 70000}
+    assert len(a | b) == 100002
+    assert list(b - a) == [1, 199999]
+    assert RoaringBitmap.from_bytes(a.to_bytes()) == a
+    assert RoaringBitmap.from_bytes(b.to_bytes()) == b
+
+def test_cohort_query(test_db):
+    """Attended the first session but not the second."""
+    headers = {"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    for student_id in ["alice", "bob", "carol"]:
+        create_student(student_id)
+    attendees = [["alice", "bob", "carol"], ["bob"]]
+    session_ids = []
+    for students in attendees:
+        session_id = client.post(
+            "/api/v1/start_attendance", json={"name": "Lecture"}, headers=headers
+        ).json()["id"]
+        session_ids.append(session_id)
+        for student_id in students:
+            client.post("/api/v1/mark_attendance", json={
+                "student_id": student_id, "session_id": session_id, "device_id": TEST_DEVICE_ID
+            })
+    # Close the first session; the second is still open
+    client.post(f"/api/v1/stop_attendance?session_id={session_ids[0]}", headers=headers)
+    
+    query = {"expression": {"op": "difference", "operands": [
+        {"session_id": session_ids[0]}, {"session_id": session_ids[1]}
+    ]}}
+    response = client.post("/api/v1/cohorts/query", json=query, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"count": 2, "student_ids": ["alice", "carol"]}
+    
+    query = {"expression": {"op": "difference", "operands": [
+        {"roster": True}, {"session_id": session_ids[1]}
+    ]}, "count_only": True}
+    response = client.post("/api/v1/cohorts/query", json=query, headers=headers)
+    assert response.json()["count"] == 2
+    
+    # Queries run on read sessions, which may be a hot standby: a session closed
+    # without a stored bitmap is answered from memory, never written from there
+    with TestingSessionLocal() as db:
+        db.query(models.SessionBitmap).delete()
+        db.commit()
+    session_bitmap_index.reset()
+    
+    def standby_db():
+        db = TestingSessionLocal()
+        db.connection().exec_driver_sql("PRAGMA query_only = ON")
+        try:
+            yield db
+        finally:
+            db.rollback()
+            db.connection().exec_driver_sql("PRAGMA query_only = OFF")
+            db.close()
+    
+    app.dependency_overrides[get_read_db] = standby_db
+    try:
+        query = {"expression": {"session_id": session_ids[0]}}
+        response = client.post("/api/v1/cohorts/query", json=query, headers=headers)
+    finally:
+        del app.dependency_overrides[get_read_db]
+    assert response.status_code == 200
+    assert response.json() == {"count": 3, "student_ids": ["alice", "bob", "carol"]}
+    with TestingSessionLocal() as db:
+        assert crud.get_session_bitmap(db, session_ids[0]) is None
+    
+    # The index never queries the database while holding the lock check-ins take
+    def assert_unlocked(*args):
+        assert not session_bitmap_index.lock.locked()
+    event.listen(engine, "before_cursor_execute", assert_unlocked)
+    try:
+        with TestingSessionLocal() as db:
+            # Open sessions are handed out as snapshots
+            snapshot = session_bitmap_index.session(db, session_ids[1])
+            client.post("/api/v1/mark_attendance", json={
+                "student_id": "carol", "session_id": session_ids[1], "device_id": TEST_DEVICE_ID
+            })
+            assert len(snapshot) == 1
+            assert len(session_bitmap_index.session(db, session_ids[1])) == 2
+            assert len(session_bitmap_index.roster(db)) == 3
+    finally:
+        event.remove(engine, "before_cursor_execute", assert_unlocked)
+
+def test_mark_attendance_unknown_student(test_db):
+    """Check-ins for students not on the roster are rejected."""
+    session_id = client.post(
+        "/api/v1/start_attendance",
+        json={"name": "Test Session", "description": "Test Description"},
+        headers={"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    ).json()["id"]
+    response = client.post("/api/v1/mark_attendance", json={
+        "student_id": "nobody", "session_id": session_id, "device_id": TEST_DEVICE_ID
+    })
+    assert response.status_code == 404
+
+def test_bloom_roster_filter():
+    """The Bloom filter never misses a member and stays near its target rate."""
+    bloom = BloomFilter(capacity=10000, fp_rate=0.01)
+    for i in range(10000):
+        bloom.add(f"student{i}")
+    assert all(f"student{i}" in bloom for i in range(10000))
+    false_positives = sum(f"stranger{i}" in bloom for i in range(10000))
+    assert false_positives < 200
+    assert bloom.false_positive_rate() < 0.02
+
+def test_roster_filter_never_reloads_inline(test_db):
+    """Misses cost one lookup, remembered per ID; stale rosters reload in the background."""
+    create_student("alice")
+    roster = RosterFilter("exact", 0.01, refresh_interval=3600, miss_refresh_interval=3600)
+    with TestingSessionLocal() as db:
+        assert roster.might_contain(db, "alice")
+        loaded_at = roster.loaded_at
+        
+        # Added on "another worker": found by the miss lookup, without a reload
+        crud.create_student(db, schemas.StudentCreate(id="bob", name="Bob", email="bob@example.edu"))
+        assert roster.might_contain(db, "bob")
+        assert roster.loaded_at == loaded_at
+        # A miss is remembered for that ID only: other new students are still looked up
+        assert not roster.might_contain(db, "dave")
+        crud.create_student(db, schemas.StudentCreate(id="carol", name="Carol", email="carol@example.edu"))
+        assert roster.might_contain(db, "carol")
+        crud.create_student(db, schemas.StudentCreate(id="dave", name="Dave", email="dave@example.edu"))
+        assert not roster.might_contain(db, "dave")
+        roster.add(["dave"])
+        assert roster.might_contain(db, "dave")
+        assert len(roster._misses) == 0
+        
+        # A stale roster keeps answering while the reload runs
+        crud.create_student(db, schemas.StudentCreate(id="erin", name="Erin", email="erin@example.edu"))
+        stale = roster.loaded_at = time.monotonic() - 3601
+        assert roster.might_contain(db, "alice")
+        deadline = time.monotonic() + 5
+        while roster.loaded_at == stale and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert "erin" in roster.members
+
+def test_idempotent_retries(test_db):
+    """Retries with the same Idempotency-Key replay the original response."""
+    headers = {"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}", "Idempotency-Key": "start-1"}
+    first = client.post("/api/v1/start_attendance", json={"name": "Lecture"}, headers=headers)
+    retry = client.post("/api/v1/start_attendance", json={"name": "Lecture"}, headers=headers)
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    sessions = client.get("/api/v1/sessions", headers={"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"})
+    assert len(sessions.json()) == 1
+    
+    create_student()
+    attendance_data = {
+        "student_id": TEST_STUDENT_ID,
+        "session_id": first.json()["id"],
+        "device_id": TEST_DEVICE_ID
+    }
+    first = client.post("/api/v1/mark_attendance", json=attendance_data, headers={"Idempotency-Key": "mark-1"})
+    retry = client.post("/api/v1/mark_attendance", json=attendance_data, headers={"Idempotency-Key": "mark-1"})
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    
+    # Client errors are replayed too, marked as such
+    stop = "/api/v1/stop_attendance?session_id=9999"
+    first = client.post(stop, headers=headers | {"Idempotency-Key": "stop-1"})
+    retry = client.post(stop, headers=headers | {"Idempotency-Key": "stop-1"})
+    assert first.status_code == retry.status_code == 404
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    
+    # Reusing a key for a different request is an error
+    other = dict(attendance_data, device_id="other_device")
+    response = client.post("/api/v1/mark_attendance", json=other, headers={"Idempotency-Key": "mark-1"})
+    assert response.status_code == 422
+
+def test_idempotent_retries_across_workers(test_db, monkeypatch):
+    """With a shared coordinator, a retry reaching another worker replays the original too."""
+    monkeypatch.setattr(settings, "COORDINATOR_BACKEND", "database")
+    headers = {"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}", "Idempotency-Key": "start-1"}
+    first = client.post("/api/v1/start_attendance", json={"name": "Lecture"}, headers=headers)
+    stop = "/api/v1/stop_attendance?session_id=9999"
+    lost = client.post(stop, headers=headers | {"Idempotency-Key": "stop-1"})
+    
+    # The retries reach a worker with its own, empty, in-process state
+    shared_store = idempotency.shared_idempotency_store
+    monkeypatch.setattr(idempotency, "idempotency_store", idempotency.IdempotencyStore(100, 60, 1))
+    monkeypatch.setattr(idempotency, "shared_idempotency_store", idempotency.DatabaseIdempotencyStore(60, 1))
+    retry = client.post("/api/v1/start_attendance", json={"name": "Lecture"}, headers=headers)
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    sessions = client.get("/api/v1/sessions", headers={"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"})
+    assert len(sessions.json()) == 1
+    
+    retry = client.post(stop, headers=headers | {"Idempotency-Key": "stop-1"})
+    assert lost.status_code == retry.status_code == 404
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    response = client.post("/api/v1/start_attendance", json={"name": "Other"}, headers=headers)
+    assert response.status_code == 422
+    assert len(idempotency.idempotency_store) == 0
+    
+    # Expired keys are purged by the scheduler
+    db = TestingSessionLocal()
+    try:
+        monkeypatch.setattr(shared_store, "ttl", -1)
+        scheduler_tick(db)
+        assert db.query(models.IdempotencyKey).count() == 0
+    finally:
+        db.close()
+
+def test_session_stream_reports_checkins_and_end(test_db):
+    """The live stream sends a snapshot, the new check-ins (even ones that commit late) and an end event."""
+    headers = {"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    for student_id in ["alice", "bob", "carol"]:
+        create_student(student_id)
+    session_id = client.post("/api/v1/start_attendance", json={"name": "Lecture"}, headers=headers).json()["id"]
+    client.post("/api/v1/mark_attendance", json={
+        "student_id": "alice", "session_id": session_id, "device_id": TEST_DEVICE_ID
+    })
+    
+    def parse(chunks):
+        events = []
+        for chunk in chunks:
+            if chunk.startswith("event: "):
+                name, data = chunk.split("\n")[:2]
+                events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+        return events
+    
+    def check_in(student_id, attendance_id):
+        with TestingSessionLocal() as db:
+            db.add(models.Attendance(
+                id=attendance_id, student_id=student_id, session_id=session_id, device_id=TEST_DEVICE_ID
+            ))
+            db.commit()
+    
+    async def follow():
+        stream = session_events(TestingSessionLocal, session_id, coalesce=0, heartbeat=0.1)
+        assert parse([await stream.__anext__()]) == [("snapshot", {"session_id": session_id, "count": 1})]
+        
+        async def next_event():
+            while True:
+                # Keepalives parse to nothing
+                for parsed in parse([await stream.__anext__()]):
+                    return parsed
+        
+        events = []
+        # Carol's row has the lower ID but commits after bob's was sent
+        for student_id, attendance_id in [("bob", 20), ("carol", 15)]:
+            check_in(student_id, attendance_id)
+            events.append(await asyncio.wait_for(next_event(), timeout=5))
+        client.post(f"/api/v1/stop_attendance?session_id={session_id}", headers=headers)
+        return events + parse([chunk async for chunk in stream])
+    
+    events = asyncio.run(follow())
+    assert [name for name, _ in events] == ["checkin", "checkin", "end"]
+    assert [[c["student_id"] for c in data["checkins"]] for _, data in events[:2]] == [["bob"], ["carol"]]
+    assert events[2][1]["count"] == 3
+    
+    # Over HTTP, a stopped session's stream ends right after the snapshot
+    response = client.get(f"/api/v1/sessions/{session_id}/stream", headers=headers)
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert [name for name, _ in parse(response.text.split("\n\n"))] == ["snapshot", "end"]
+
+def test_open_streams_do_not_starve_checkins(test_db):
+    """More open live streams than the threadpool has workers still leave room for check-ins."""
+    headers = {"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    create_student()
+    session_id = client.post("/api/v1/start_attendance", json={"name": "Lecture"}, headers=headers).json()["id"]
+    
+    def open_stream(chunks, disconnected):
+        # Driven over raw ASGI: the test clients buffer the whole body, and these streams never finish on their own
+        path = f"/api/v1/sessions/{session_id}/stream"
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+            "headers": [(b"authorization", f"Bearer {TEST_PROFESSOR_TOKEN}".encode())],
+            "server": ("testserver", 80), "client": ("testclient", 50000),
+        }
+        requested = False
+        
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+        
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                chunks.append(message["body"])
+        
+        return asyncio.create_task(app(scope, receive, send))
+    
+    async def until(condition, timeout):
+        async def poll():
+            while not condition():
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(poll(), timeout)
+    
+    async def run():
+        stream_count = anyio.to_thread.current_default_thread_limiter().total_tokens + 10
+        received = [[] for _ in range(stream_count)]
+        disconnected = asyncio.Event()
+        streams = [open_stream(chunks, disconnected) for chunks in received]
+        try:
+            await until(lambda: all(received), timeout=10)
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as api:
+                response = await asyncio.wait_for(api.post("/api/v1/mark_attendance", json={
+                    "student_id": TEST_STUDENT_ID, "session_id": session_id, "device_id": TEST_DEVICE_ID
+                }), timeout=2)
+                assert response.status_code == 200
+                await until(lambda: all(b"event: checkin" in b"".join(chunks) for chunks in received), timeout=10)
+                await api.post(f"/api/v1/stop_attendance?session_id={session_id}", headers=headers)
+            await asyncio.wait_for(asyncio.gather(*streams), timeout=10)
+        finally:
+            disconnected.set()
+            for stream in streams:
+                stream.cancel()
+        return received
+    
+    for chunks in asyncio.run(run()):
+        assert b"".join(chunks).endswith(f'event: end\ndata: {{"session_id": {session_id}, "count": 1}}\n\n'.encode())
+
+def test_expired_sessions_are_closed(test_db):
+    """Sessions past their duration stop accepting check-ins and are closed in bulk."""
+    headers = {"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    create_student()
+    session = client.post(
+        "/api/v1/start_attendance", json={"name": "Lecture", "duration_minutes": 50}, headers=headers
+    ).json()
+    assert session["expires_at"] is not None
+    
+    with TestingSessionLocal() as db:
+        db_session = crud.get_beacon_session(db, session["id"])
+        db_session.expires_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+        db.commit()
+    
+    # Expired but not yet swept: already treated as inactive
+    assert client.get("/api/v1/current_session").json() is None
+    response = client.post("/api/v1/mark_attendance", json={
+        "student_id": TEST_STUDENT_ID, "session_id": session["id"], "device_id": TEST_DEVICE_ID
+    })
+    assert response.status_code == 400
+    
+    with TestingSessionLocal() as db:
+        assert close_expired_sessions(db) == [session["id"]]
+        assert close_expired_sessions(db) == []
+        db_session = crud.get_beacon_session(db, session["id"])
+        assert not db_session.is_active
+        assert db_session.ended_at == db_session.expires_at
+
+def test_active_session_lookup_uses_partial_index(test_db):
+    """Finding the live session reads the partial index, not the whole table."""
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM beacon_sessions WHERE is_active = 1"
+        ).fetchall()
+    assert "ix_beacon_sessions_active" in " ".join(str(row) for row in plan)
+
+def test_projected_listings_match_response_models(test_db):
+    """Column-projected listings serialise exactly like the ORM + response model path."""
+    headers = {"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    create_student()
+    session_id = client.post(
+        "/api/v1/start_attendance", json={"name": "Lecture", "duration_minutes": 50}, headers=headers
+    ).json()["id"]
+    client.post("/api/v1/mark_attendance", json={
+        "student_id": TEST_STUDENT_ID, "session_id": session_id, "device_id": TEST_DEVICE_ID
+    })
+    
+    with TestingSessionLocal() as db:
+        expected_attendance = [
+            schemas.Attendance.model_validate(a).model_dump(mode="json") for a in crud.get_attendance(db)
+        ]
+        expected_sessions = [
+            schemas.BeaconSession.model_validate(s).model_dump(mode="json") for s in crud.get_beacon_sessions(db)
+        ]
+    assert client.get("/api/v1/attendance", headers=headers).json() == expected_attendance
+    assert client.get("/api/v1/sessions", headers=headers).json() == expected_sessions
+
+def test_edge_sync_is_idempotent_and_resumable(test_db, tmp_path):
+    """An edge node mirrors the roster and its check-ins merge once upstream, even when replayed."""
+    for student_id in ["alice", "bob", "carol"]:
+        create_student(student_id)
+    edge_engine = make_engine(f"sqlite:///{tmp_path}/edge.db")
+    with edge_engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+    Base.metadata.create_all(bind=edge_engine)
+    EdgeSession = sessionmaker(autocommit=False, autoflush=False, bind=edge_engine)
+    syncer = EdgeSyncer(EdgeSession, LocalUpstream(TestingSessionLocal), "room-101", batch_size=2)
+    
+    assert syncer.pull_students() == 3
+    assert syncer.pull_students() == 0
+    
+    with EdgeSession() as db:
+        edge_session = crud.create_beacon_session(db, schemas.BeaconSessionCreate(name="Lecture"))
+        for student_id in ["alice", "bob", "carol"]:
+            crud.create_attendance(db, schemas.AttendanceCreate(
+                student_id=student_id, session_id=edge_session.id, device_id=TEST_DEVICE_ID
+            ))
+        edge_session_id = edge_session.id
+    assert syncer.push() == 3
+    
+    with TestingSessionLocal() as db:
+        central_id = crud.get_origin_session_ids(db, "room-101", [edge_session_id])[edge_session_id]
+        assert len(crud.get_attendance(db, session_id=central_id)) == 3
+        assert crud.get_beacon_session(db, central_id).is_active
+    
+    # Lose the watermarks, as if the node crashed before saving them: the replay merges nothing new
+    with EdgeSession() as db:
+        crud.set_sync_state(db, {"attendance_after": "0", "sessions_after": "0", "open_sessions": "[]"})
+        crud.update_beacon_session_status(db, edge_session_id, False)
+    assert syncer.push() == 3
+    with TestingSessionLocal() as db:
+        assert len(crud.get_attendance(db, session_id=central_id)) == 3
+        assert not crud.get_beacon_session(db, central_id).is_active
+    
+    # A local student whose email upstream gives to someone else is skipped, not a wedged pull
+    with EdgeSession() as db:
+        crud.create_student(db, schemas.StudentCreate(id="erin", name="erin", email="frank@example.edu"))
+    create_student("frank")
+    assert syncer.pull_students() == 0
+    assert syncer.pull_students() == 0
+    
+    # A check-in for a student upstream has not seen yet waits for the roster to catch up
+    with EdgeSession() as db:
+        crud.create_student(db, schemas.StudentCreate(id="dave", name="dave", email="dave@example.edu"))
+        crud.create_attendance(db, schemas.AttendanceCreate(
+            student_id="dave", session_id=edge_session_id, device_id=TEST_DEVICE_ID
+        ))
+    assert syncer.push() == 1
+    with EdgeSession() as db:
+        assert len(json.loads(crud.get_sync_state(db, "pending_attendance", "[]"))) == 1
+    create_student("dave")
+    syncer.sync_once()
+    with TestingSessionLocal() as db:
+        assert len(crud.get_attendance(db, session_id=central_id)) == 4
+    with EdgeSession() as db:
+        assert json.loads(crud.get_sync_state(db, "pending_attendance", "[]")) == []
+    edge_engine.dispose()
+
+def test_report_job_runs_in_background(test_db):
+    """A submitted report is generated off the request path and can be downloaded."""
+    headers = {"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    for student_id in ["alice", "bob"]:
+        create_student(student_id)
+    session_id = client.post("/api/v1/start_attendance", json={"name": "Lecture"}, headers=headers).json()["id"]
+    client.post("/api/v1/mark_attendance", json={
+        "student_id": "alice", "session_id": session_id, "device_id": TEST_DEVICE_ID
+    })
+    
+    response = client.post("/api/v1/reports", json={"kind": "term_summary"}, headers=headers)
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    deadline = time.monotonic() + 60
+    while client.get(f"/api/v1/reports/{job_id}", headers=headers).json()["status"] in ("queued", "running"):
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+    job = client.get(f"/api/v1/reports/{job_id}", headers=headers).json()
+    assert job["status"] == "done", job["error"]
+    assert job["progress"] == 1.0
+    
+    rows = list(csv.DictReader(io.StringIO(client.get(f"/api/v1/reports/{job_id}/download", headers=headers).text)))
+    assert {row["student_id"]: row["sessions_attended"] for row in rows} == {"alice": "1", "bob": "0"}
+    assert all(row["sessions_held"] == "1" for row in rows)
+    assert client.get("/api/v1/reports/missing", headers=headers).status_code == 404
+
+def test_report_clean_up_fails_orphaned_jobs_and_expires_artifacts(test_db, tmp_path):
+    """Jobs nobody is running any more are failed, and artifacts past their retention are deleted."""
+    headers = {"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    runner = ReportRunner(str(tmp_path), workers=1, chunk_rows=100, stale_seconds=60, retention_hours=1)
+    long_ago = datetime.now(timezone.utc) - timedelta(hours=2)
+    jobs = ("orphaned", "lost", "waiting", "running", "old", "recent")
+    with TestingSessionLocal() as db:
+        for job_id in jobs:
+            crud.create_report_job(db, job_id, schemas.ReportRequest(kind="term_summary"))
+        for job_id in ("orphaned", "running"):
+            crud.update_report_job(db, job_id, status="running")
+        # Queued long ago: "lost" by a worker that died, "waiting" still in this runner's queue
+        db.query(models.ReportJob).filter(models.ReportJob.id.in_(["orphaned", "lost", "waiting"])).update(
+            {"updated_at": long_ago}
+        )
+        db.commit()
+        runner._pending[concurrent.futures.Future()] = "waiting"
+        (tmp_path / "orphaned.csv.partial").write_text("student_id\n")
+        for job_id, finished_at in (("old", long_ago), ("recent", datetime.now(timezone.utc))):
+            (tmp_path / f"{job_id}.csv").write_text("student_id\n")
+            crud.update_report_job(
+                db, job_id, status="done", artifact_path=str(tmp_path / f"{job_id}.csv"), finished_at=finished_at
+            )
+        
+        failed, expired = runner.clean_up(db)
+        assert (sorted(failed), expired) == (["lost", "orphaned"], ["old"])
+        assert runner.clean_up(db) == ([], [])
+    
+    # A job failed as stale is never brought back by a late start
+    runner._run("lost", TestingSessionLocal)
+    runner.shutdown()
+    
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["recent.csv"]
+    statuses = {job_id: client.get(f"/api/v1/reports/{job_id}", headers=headers).json()["status"] for job_id in jobs}
+    assert statuses == {
+        "orphaned": "failed", "lost": "failed", "waiting": "queued", "running": "running",
+        "old": "expired", "recent": "done"
+    }
+    assert client.get("/api/v1/reports/old/download", headers=headers).status_code == 410
+
+def test_simulated_hall_detects_only_nearby_sessions():
+    """Replayed hall traffic: near beacons are detected once each, foreign devices and far beacons never."""
+    detected = []
+    scanner = SimulatedScanner(None, hall({7: -60.0, 8: -98.0}, foreign_devices=300, seed=1), seed=1)
+    detector = BeaconDetector(detected.append, rssi_threshold=-85, clock=scanner.clock)
+    scanner.callback = AdvertisementHandler(detector, BEACON_SERVICE_UUID)
+    
+    assert scanner.replay(scanner.events(10.0)) > 20000
+    assert detected == [7]
+
+# Query plans: every crud query on a large table must be served by an index
+# SQLite before 3.36 writes "SCAN TABLE attendance", later versions "SCAN attendance"
+SQLITE_ACCESS = re.compile(r"(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+))?")
+SQLITE_INDEXES = {index.name for table in Base.metadata.tables.values() for index in table.indexes}
+PARTIAL_INDEXES = {
+    index.name for table in Base.metadata.tables.values() for index in table.indexes
+    if index.dialect_options["sqlite"]["where"] is not None
+}
+
+@contextmanager
+def captured_selects(bind):
+    """Collect the SELECT statements, with their parameters, executed on `bind`."""
+    statements = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+    
+    event.listen(bind, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", capture)
+
+def sequential_scans(conn, statement, parameters):
+    """Tables the planner would read in full to run `statement`."""
+    if conn.dialect.name == "postgresql":
+        plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        nodes, scans = [plan[0]["Plan"]], []
+        while nodes:
+            node = nodes.pop()
+            if node["Node Type"] == "Seq Scan":
+                scans.append(node["Relation Name"])
+            nodes.extend(node.get("Plans", []))
+        return scans
+    scans, accessed = [], []
+    for *_, detail in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters):
+        match = SQLITE_ACCESS.match(detail)
+        if not match or match.group(2).isupper():
+            continue  # Temp b-trees, constant rows, subqueries
+        operation, table, index = match.groups()
+        # A plan format the pattern misreads must fail here, not pass as "no scans"
+        assert table in Base.metadata.tables, detail
+        assert index is None or index in SQLITE_INDEXES or index.startswith("sqlite_autoindex_"), detail
+        accessed.append(table)
+        # Walking a partial index reads only the rows it covers
+        if operation == "SCAN" and index not in PARTIAL_INDEXES:
+            scans.append(table)
+    assert accessed, f"No table in the plan of {statement}"
+    return scans
+
+def test_attendance_queries_use_indexes_at_scale(test_db):
+    """On a term of generated data, no attendance or session lookup falls back to a full table scan."""
+    # Both plan spellings, whichever SQLite this runs on
+    assert SQLITE_ACCESS.match("SCAN TABLE attendance").groups() == ("SCAN", "attendance", None)
+    assert SQLITE_ACCESS.match("SEARCH attendance USING INDEX ix_x (session_id=?)").groups() == ("SEARCH", "attendance", "ix_x")
+    generate(engine, CampusSpec(students=1000, courses=10, term_weeks=6))
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")  # Plan with real statistics, as production would
+    
+    day = datetime(2026, 1, 20)
+    week = (day, day + timedelta(days=7))
+    with TestingSessionLocal() as db:
+        student_id = crud.get_students_page(db, "", 1)[0][0]
+        session_id = crud.get_beacon_session_rows(db, limit=1)[0]["id"]
+        scope = crud.report_session_scope(None, *week)
+        queries = {
+            "by session": lambda: crud.get_attendance_rows(db, session_id=session_id),
+            "by student": lambda: crud.get_attendance_rows(db, student_id=student_id),
+            "by date": lambda: crud.get_attendance_rows(db, start=day, end=day + timedelta(days=1)),
+            "by student and date": lambda: crud.get_attendance_rows(db, student_id=student_id, start=week[0], end=week[1]),
+            "duplicate check": lambda: crud.get_attendance_by_student_and_session(db, student_id, session_id),
+            "session summary": lambda: crud.get_session_attendance_summary(db, session_id),
+            "live feed": lambda: crud.get_attendance_since(db, session_id, 0),
+            "active session": lambda: crud.get_active_beacon_session(db),
+            "edge sync": lambda: crud.get_attendance_rows_after(db, 100, 50),
+            "report count": lambda: crud.count_attendance_in_scope(db, scope),
+            "report export": lambda: crud.get_attendance_export_page(db, scope, 0, 100),
+            "report totals": lambda: crud.get_attendance_totals(db, scope, [student_id]),
+            "page by time": lambda: crud.get_attendance_page(db, [], "timestamp", True, [week[1], 10 ** 9]),
+            "page by student": lambda: crud.get_attendance_page(db, [], "student_id", False, [student_id, day, 0]),
+            "page by session": lambda: crud.get_attendance_page(db, [], "session_id", False, [session_id, ""]),
+            "page of a session": lambda: crud.get_attendance_page(db, crud.attendance_filters(session_id=session_id)),
+            "page count": lambda: crud.count_attendance(db, crud.attendance_filters(start=week[0], end=week[1])),
+            "summary": lambda: crud.get_attendance_summary(db, crud.attendance_filters(start=day, end=day + timedelta(days=1))),
+        }
+        for name, query in queries.items():
+            with captured_selects(engine) as statements:
+                query()
+            assert statements, name
+            for statement, parameters in statements:
+                assert sequential_scans(db.connection(), statement, parameters) == [], f"{name}: {statement}"
+        
+        in_week = [row for row in crud.get_attendance_rows(db) if week[0] <= row["timestamp"] < week[1]]
+    
+    response = client.get(
+        "/api/v1/attendance", params={"start": week[0].isoformat(), "end": week[1].isoformat()},
+        headers={"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    )
+    assert len(response.json()) == len(in_week) > 0
+
+def test_datagen_is_deterministic_and_campuses_coexist():
+    """The same spec always yields the same rows, and differently named campuses share a database."""
+    spec = CampusSpec(name="north", students=200, courses=3, roster_min=20, roster_max=50, term_weeks=2)
+    first, again = CampusGenerator(spec), CampusGenerator(replace(spec))
+    assert list(first.students()) == list(again.students())
+    assert list(first.sessions()) == list(again.sessions())
+    assert list(first.attendance()) == list(again.attendance())
+    assert list(CampusGenerator(replace(spec, seed=7)).attendance()) != list(first.attendance())
+
+    campus_engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=campus_engine)
+    try:
+        north = generate(campus_engine, spec)
+        south = generate(campus_engine, replace(spec, name="south"))
+        with campus_engine.connect() as conn:
+            assert conn.execute(select(func.count()).select_from(models.Student)).scalar() == 400
+            assert conn.execute(select(func.count()).select_from(models.Attendance)).scalar() == \
+                north["attendance"] + south["attendance"]
+    finally:
+        campus_engine.dispose()
+
+def test_fallback_beacon_announces_session_over_loopback(test_db, monkeypatch):
+    """The fallback emitter multicasts signed announcements the client hears, until the session ends."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    monkeypatch.setattr(settings, "MULTICAST_PORT", port)
+    monkeypatch.setattr(settings, "MULTICAST_INTERFACE", "127.0.0.1")
+    monkeypatch.setattr(settings, "MULTICAST_INTERVAL", 0.05)
+    session_factory = TestingSessionLocal
+    with session_factory() as db:
+        session_id = crud.create_beacon_session(db, schemas.BeaconSessionCreate(name="Lecture")).id
+        # IDs restart with every test database; drop any emitter an earlier test left on this one
+        get_coordinator().end(db, session_id)
+        token = get_coordinator().claim(db, session_id)
+    
+    async def run():
+        detected = asyncio.Event()
+        detector = BeaconDetector(lambda session_id: detected.set())
+        listener = MulticastListener(
+            detector.observe, settings.MULTICAST_GROUP, port, settings.MULTICAST_KEY, interface="127.0.0.1"
+        )
+        await listener.start()
+        # A device without the key is ignored
+        multicast.MulticastAnnouncer(settings.MULTICAST_GROUP, port, "forged", interface="127.0.0.1").announce(99)
+        emitter = asyncio.create_task(emit_fallback_beacon(session_id, token, session_factory))
+        await asyncio.wait_for(detected.wait(), timeout=5)
+        with session_factory() as db:
+            get_coordinator().end(db, session_id)
+        await asyncio.wait_for(emitter, timeout=5)
+        await listener.stop()
+        return detector, listener
+    
+    detector, listener = asyncio.run(run())
+    assert detector.seen_since(0) and listener.received >= 2 and listener.rejected >= 1
+    
+    # Client and backend codecs agree; stale announcements are replays
+    key = settings.MULTICAST_KEY.encode()
+    packet = multicast.encode_announcement(42, key, now=1000.0)
+    assert decode_announcement(packet, key, max_age=60, now=1010.0) == 42
+    assert decode_announcement(packet, key, max_age=60, now=1100.0) is None
+    assert decode_announcement(packet[:-1] + bytes([packet[-1] ^ 1]), key, max_age=60, now=1010.0) is None
+
+def test_queued_json_logging_with_request_ids_and_sampling(test_db):
+    """Records go through the queue as JSON tagged with the request ID; sampled loggers are thinned."""
+    headers = {"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    create_student()
+    output = io.StringIO()
+    root = logging.getLogger()
+    level = root.level
+    listener = configure_logging("INFO", "json", "attendance.checkins=0", stream=output)
+    try:
+        response = client.post(
+            "/api/v1/start_attendance", json={"name": "Lecture"}, headers={**headers, "X-Request-ID": "req-42"}
+        )
+        assert response.headers["X-Request-ID"] == "req-42"
+        response = client.post("/api/v1/mark_attendance", json={
+            "student_id": TEST_STUDENT_ID, "session_id": response.json()["id"], "device_id": TEST_DEVICE_ID
+        })
+        assert response.status_code == 200
+        # Unusable IDs are replaced by a generated one
+        assert client.get("/health", headers={"X-Request-ID": "bad id\n"}).headers["X-Request-ID"] != "bad id\n"
+    finally:
+        listener.stop()
+        root.handlers = [h for h in root.handlers if not isinstance(h, RequestQueueHandler)]
+        root.setLevel(level)
+    
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    started = [r for r in records if r["message"].startswith("Started beacon emission")]
+    assert started and started[0]["request_id"] == "req-42" and started[0]["level"] == "INFO"
+    assert not [r for r in records if r["logger"] == "attendance.checkins"]
+
+def test_server_logs_go_through_the_queue():
+    """uvicorn's access and error logs lose their own handlers and share the queued JSON output."""
+    access, direct, output = logging.getLogger("uvicorn.access"), io.StringIO(), io.StringIO()
+    saved = {name: (logging.getLogger(name).handlers[:], logging.getLogger(name).propagate)
+             for name in ("uvicorn", "uvicorn.error", "uvicorn.access")}
+    access.addHandler(logging.StreamHandler(direct))
+    access.propagate = False
+    root = logging.getLogger()
+    level = root.level
+    listener = configure_logging("INFO", "json", stream=output)
+    try:
+        access.info('%s - "%s %s HTTP/%s" %d', "127.0.0.1", "GET", "/health", "1.1", 200)
+        logging.getLogger("uvicorn.error").info("Application startup complete.")
+    finally:
+        listener.stop()
+        root.handlers = [h for h in root.handlers if not isinstance(h, RequestQueueHandler)]
+        root.setLevel(level)
+        for name, (handlers, propagate) in saved.items():
+            logging.getLogger(name).handlers[:] = handlers
+            logging.getLogger(name).propagate = propagate
+    
+    assert direct.getvalue() == ""
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert {r["logger"] for r in records} >= {"uvicorn.access", "uvicorn.error"}
+
+CLIENT_STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from client.student_client import AttendanceClient
+client = AttendanceClient("student")
+client.start_scanning()
+assert client.scan_started.wait(10)
+print(json.dumps({
+    "ms": (time.perf_counter() - started) * 1000,
+    "device_id": client.device_id,
+    "loaded": [m for m in ("tkinter", "requests", "bleak") if m in sys.modules],
+}))
+"""
+
+def test_student_client_starts_scanning_within_budget(tmp_path):
+    """A warm launch reads the device ID from the cache and is scanning before Tk or requests load."""
+    env = dict(
+        os.environ, XDG_CACHE_HOME=str(tmp_path), ATTENDANCE_SCANNER="simulated", ATTENDANCE_MULTICAST="0"
+    )
+    
+    def launch():
+        result = subprocess.run(
+            [sys.executable, "-c", CLIENT_STARTUP_SCRIPT], capture_output=True, text=True, env=env,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=60
+        )
+        assert result.returncode == 0, result.stderr
+        return json.loads(result.stdout.splitlines()[-1])
+    
+    cold = launch()
+    with open(tmp_path / "attendance-client" / "client.json") as f:
+        assert json.load(f)["device_id"] == cold["device_id"]
+    warm = launch()
+    assert warm["device_id"] == cold["device_id"]
+    assert warm["loaded"] == []
+    assert warm["ms"] < CLIENT_STARTUP_BUDGET_MS, f"client took {warm['ms']:.0f} ms to start scanning"
+
+def test_linux_mac_address_prefers_physical_interfaces(tmp_path):
+    """sysfs enumeration skips loopback and empty addresses, and prefers NICs over virtual interfaces."""
+    interfaces = {
+        "lo": ("00:00:00:00:00:00", False),
+        "docker0": ("02:42:ac:11:00:01", False),
+        "wlp2s0": ("A4:C3:F0:12:34:56", True),
+        "wwan0": ("", True),
+    }
+    for name, (address, physical) in interfaces.items():
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "address").write_text(address + "\n")
+        if physical:
+            (tmp_path / name / "device").mkdir()
+    assert linux_mac_address(str(tmp_path)) == "a4:c3:f0:12:34:56"
+    (tmp_path / "wlp2s0" / "device").rmdir()
+    assert linux_mac_address(str(tmp_path)) == "02:42:ac:11:00:01"
+    assert linux_mac_address(str(tmp_path / "missing")) is None
+
+def test_attendance_pages_and_summary(test_db):
+    """Keyset pages cover every check-in exactly once in each sort order; the summary matches."""
+    headers = {"Authorization": f"Bearer {TEST_PROFESSOR_TOKEN}"}
+    students = [f"student{i}" for i in range(5)]
+    for student_id in students:
+        create_student(student_id)
+    for name in ["Monday", "Wednesday"]:
+        session_id = client.post("/api/v1/start_attendance", json={"name": name}, headers=headers).json()["id"]
+        for student_id in students[:4]:
+            client.post("/api/v1/mark_attendance", json={
+                "student_id": student_id, "session_id": session_id, "device_id": TEST_DEVICE_ID
+            })
+    
+    for sort in ["timestamp", "student_id", "session_id"]:
+        for order in ["asc", "desc"]:
+            items, params = [], {"sort": sort, "order": order, "limit": 3, "include_total": True}
+            while True:
+                page = client.get("/api/v1/attendance/page", params=params, headers=headers).json()
+                items += page["items"]
+                if not page["next_cursor"]:
+                    break
+                params = {"sort": sort, "order": order, "limit": 3, "cursor": page["next_cursor"]}
+            keys = [tuple(item[name] for name in crud.ATTENDANCE_SORT_KEYS[sort]) for item in items]
+            assert keys == sorted(keys, reverse=order == "desc")
+            assert len({item["id"] for item in items}) == len(items) == 8
+    
+    first = client.get("/api/v1/attendance/page", params={"limit": 3, "include_total": True}, headers=headers).json()
+    assert first["total"] == 8
+    # A cursor only continues the sort it came from
+    response = client.get(
+        "/api/v1/attendance/page", params={"sort": "student_id", "cursor": first["next_cursor"]}, headers=headers
+    )
+    assert response.status_code == 400
+    
+    summary = client.get("/api/v1/attendance/summary", params={"session_id": session_id}, headers=headers).json()
+    assert summary["total"] == 4 and summary["unique_students"] == 4
+    assert sum(day["count"] for day in summary["daily"]) == 4
\ No newline at end of file